@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from cut import (DEFAULT_WEIGHTS, PARITY_CHECK_FRAMES, _sample_frames, check_backend_parity, detect_and_save_segments,
+                 export_weights, generate_summary_report, get_model, get_next_output_folder)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.ts')
+
+def discover_videos(source):
+    """\
+    @description 解析批量输入：目录（不递归，按文件名排序）或清单文件（每行一个视频路径，# 开头为注释）。
+    @param {str} source - 视频目录或清单文件路径。
+    @returns {list} 视频路径列表
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, f) for f in os.listdir(source)
+            if f.lower().endswith(VIDEO_EXTENSIONS) and os.path.isfile(os.path.join(source, f))
+        )
+
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"输入目录或清单不存在: {source}")
+    manifest_dir = os.path.dirname(os.path.abspath(source))
+    videos = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            # 清单中的相对路径相对于清单文件所在目录
+            videos.append(line if os.path.isabs(line) else os.path.join(manifest_dir, line))
+    return videos
+
+
+def _init_worker(weights, device, imgsz, backend, num_threads):
+    # 多个进程同时推理时均分 CPU 线程，避免 torch 线程数超额订阅
+    import torch
+    torch.set_num_threads(num_threads)
+    # 在进程启动时加载并预热模型，之后 detect_and_save_segments 从进程内的模型缓存中取用
+    get_model(weights, device, imgsz, warmup=True, backend=backend)
+
+
+def _process_video(video_path, base_output_folder, target_classes, detect_kwargs):
+    """在工作进程中处理单个视频，返回索引记录（失败时记录错误而不抛出）"""
+    record = {
+        'input': video_path,
+        'output_folder': None,
+        'status': 'ok',
+        'total_duration': 0.0,
+        'video_duration': None,
+        'num_segments': 0,
+        'classes': {},
+        'summary_path': None,
+        'elapsed_sec': 0.0,
+        'error': None,
+    }
+    start_time = time.time()
+    try:
+        output_folder = get_next_output_folder(base_output_folder)
+        record['output_folder'] = output_folder
+        total_duration, saved_segments, duration, details = detect_and_save_segments(
+            video_path, output_folder, target_classes, return_details=True, **detect_kwargs)
+        record['total_duration'] = total_duration
+        record['video_duration'] = duration
+        record['num_segments'] = len(saved_segments)
+        record['classes'] = {
+            name: {k: v for k, v in cls_stats.items() if k != 'segments'}
+            for name, cls_stats in details['classes'].items()
+        }
+        if saved_segments:
+            record['summary_path'] = generate_summary_report(
+                target_classes, total_duration, saved_segments, output_folder, duration, details)
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = str(e)
+    record['elapsed_sec'] = time.time() - start_time
+    return record
+
+
+def run_batch(videos, base_output_folder, target_classes, weights=DEFAULT_WEIGHTS,
+              device=None, imgsz=None, backend="pytorch", workers=2, parity_check=True, detect_kwargs=None):
+    """\
+    @description 用进程池并行处理多个视频，每个工作进程只加载一次模型，结束后写出汇总索引。
+    @param {list} videos - 视频路径列表。
+    @param {str} base_output_folder - 基础输出目录，每个视频分配一个 outputN 子目录。
+    @param {list} target_classes - 目标类别。
+    @param {str} weights - 模型权重路径或版本名（如 su-v4、xiaomi-v1）。
+    @param {str|None} device - 推理设备，如 cpu、0。
+    @param {int|None} imgsz - 推理尺寸。
+    @param {str} backend - 推理后端：pytorch / onnx / openvino。
+    @param {int} workers - 工作进程数。
+    @param {bool} parity_check - 非 PyTorch 后端时是否在主进程中抽取首个视频的若干帧与 PyTorch 结果对比一次。
+    @param {dict|None} detect_kwargs - 透传给 detect_and_save_segments 的其他参数。
+    @returns {str} 汇总索引 JSON 路径
+    """
+    # 一致性检查只在主进程中做一次，工作进程不再各自加载 PyTorch 原模型重复对比
+    detect_kwargs = dict(detect_kwargs or {}, weights=weights, device=device, imgsz=imgsz, backend=backend,
+                         parity_check=False)
+    if backend != "pytorch":
+        # 先在主进程中导出一次，避免多个工作进程同时导出同一份文件
+        export_weights(weights, backend, imgsz)
+        if parity_check and videos:
+            frames = _sample_frames(videos[0], PARITY_CHECK_FRAMES)
+            if frames:
+                check_backend_parity(weights, backend, frames, device, imgsz,
+                                     detect_kwargs.get('conf_threshold', 0.25))
+    os.makedirs(base_output_folder, exist_ok=True)
+    print(f"批量处理 {len(videos)} 个视频，工作进程数: {workers}")
+
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    records = []
+    # spawn 避免 fork 后共享 torch/OpenCV 内部线程状态
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(weights, device, imgsz, backend, num_threads)) as pool:
+        futures = {
+            pool.submit(_process_video, video, base_output_folder, target_classes, detect_kwargs): video
+            for video in videos
+        }
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            if record['status'] == 'ok':
+                print(f"[{len(records)}/{len(videos)}] 完成: {record['input']} -> {record['output_folder']} "
+                      f"({record['elapsed_sec']:.1f}秒)")
+            else:
+                print(f"[{len(records)}/{len(videos)}] 失败: {record['input']} ({record['error']})")
+
+    # 索引按输入顺序排列，便于与清单对照
+    order = {video: i for i, video in enumerate(videos)}
+    records.sort(key=lambda r: order[r['input']])
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    index_path = os.path.join(base_output_folder, f"batch_index_{timestamp}.json")
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'target_classes': target_classes,
+            'weights': weights,
+            'videos': records,
+        }, f, ensure_ascii=False, indent=2)
+
+    failed = sum(1 for r in records if r['status'] != 'ok')
+    print(f"批量处理完成: 成功 {len(records) - failed} 个，失败 {failed} 个，索引: {index_path}")
+    return index_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量检测多个视频并导出片段与摘要")
+    parser.add_argument("source", help="视频目录，或每行一个视频路径的清单文件")
+    parser.add_argument("--output", default="output", help="基础输出目录（默认 output）")
+    parser.add_argument("--classes", nargs="+", default=["Billboard", "drinks"], help="目标类别")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="模型权重路径或版本名（su-v1..su-v4、xiaomi-v1）")
+    parser.add_argument("--device", default=None, help="推理设备，如 cpu、0")
+    parser.add_argument("--imgsz", type=int, default=None, help="推理尺寸")
+    parser.add_argument("--backend", choices=["pytorch", "onnx", "openvino"], default="pytorch", help="推理后端")
+    parser.add_argument("--workers", type=int, default=2, help="工作进程数")
+    parser.add_argument("--no-parity-check", action="store_true", help="非 PyTorch 后端时跳过与 PyTorch 结果的一致性检查")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--detect-every-n", type=int, default=1)
+    parser.add_argument("--visualize", choices=["full", "preview", "none"], default="full")
+    parser.add_argument("--export-mode", choices=["copy", "reencode"], default="copy")
+    parser.add_argument("--min-segment-duration", type=float, default=0.5)
+    parser.add_argument("--track", action="store_true", help="启用目标跟踪，按实例统计（需 --detect-every-n 1）")
+    parser.add_argument("--preprocess", action="store_true", help="推理前显式 letterbox 到推理尺寸")
+    parser.add_argument("--scene-gate", type=float, default=None, help="场景变化门控阈值，画面变化低于该值时沿用上一帧检测")
+    parser.add_argument("--roi", default=None, help="只检测该区域 x1,y1,x2,y2（原图像素），自动启用 --preprocess")
+    parser.add_argument("--frame-source", choices=["opencv", "ffmpeg"], default="opencv",
+                        help="帧源：opencv 或 ffmpeg 子进程多线程解码")
+    parser.add_argument("--decode-width", type=int, default=None, help="ffmpeg 帧源在解码时缩小到该宽度")
+    args = parser.parse_args()
+
+    run_batch(
+        discover_videos(args.source),
+        args.output,
+        args.classes,
+        weights=args.weights,
+        device=args.device,
+        imgsz=args.imgsz,
+        backend=args.backend,
+        workers=args.workers,
+        parity_check=not args.no_parity_check,
+        detect_kwargs={
+            'pre_buffer_sec': 2,
+            'post_buffer_sec': 3,
+            'min_segment_duration': args.min_segment_duration,
+            'batch_size': args.batch_size,
+            'detect_every_n': args.detect_every_n,
+            'visualize': args.visualize,
+            'export_mode': args.export_mode,
+            'track': args.track,
+            'preprocess': args.preprocess,
+            'roi': args.roi,
+            'scene_gate': args.scene_gate,
+            'frame_source': args.frame_source,
+            'decode_width': args.decode_width,
+        },
+    )
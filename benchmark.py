@@ -0,0 +1,393 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import subprocess
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# 合成视频中的目标按类别使用固定纯色绘制（BGR），替身模型据此给出检测框
+TARGET_COLORS = {
+    'Billboard': (255, 0, 255),
+    'drinks': (255, 255, 0),
+}
+
+# 合成视频规格：名称 -> (宽, 高, fps, 时长秒, 同时存在的目标数)
+VIDEO_SPECS = {
+    '360p25_10s_d2': (640, 360, 25, 10, 2),
+    '360p25_10s_d0': (640, 360, 25, 10, 0),
+    '720p25_20s_d2': (1280, 720, 25, 20, 2),
+    '720p50_10s_d4': (1280, 720, 50, 10, 4),
+    '1080p25_20s_d8': (1920, 1080, 25, 20, 8),
+}
+
+# 运行模式：名称 -> 透传给 detect_and_save_segments 的参数
+MODE_SPECS = {
+    'baseline': {'batch_size': 1},
+    'batch4': {'batch_size': 4},
+    'batch8': {'batch_size': 8},
+    'stride3': {'batch_size': 4, 'detect_every_n': 3},
+    'pipeline': {'batch_size': 4, 'pipeline': True},
+    'letterbox': {'batch_size': 4, 'preprocess': True},
+    'scene_gate': {'batch_size': 4, 'scene_gate': 8},
+    'ffmpeg_decode': {'batch_size': 4, 'frame_source': 'ffmpeg'},
+    'vis_preview': {'batch_size': 4, 'visualize': 'preview'},
+    'vis_none': {'batch_size': 4, 'visualize': 'none'},
+    'reencode': {'batch_size': 4, 'export_mode': 'reencode'},
+}
+
+PRESETS = {
+    'quick': (['360p25_10s_d2'], ['baseline', 'batch4', 'stride3', 'vis_none']),
+    'standard': (['360p25_10s_d2', '360p25_10s_d0', '720p25_20s_d2', '720p50_10s_d4'], list(MODE_SPECS)),
+    'full': (list(VIDEO_SPECS), list(MODE_SPECS)),
+}
+
+DEFAULT_BENCH_DIR = 'benchmark_runs'
+
+
+def synth_video_path(video_dir, name):
+    return os.path.join(video_dir, f"synth_{name}.mp4")
+
+
+def generate_synthetic_video(path, width, height, fps, duration_sec, density, seed=0):
+    """\
+    @description 生成确定性的合成测试视频：缓慢平移的渐变背景、灰色干扰块，以及 density 个
+                 按 TARGET_COLORS 着色、沿直线移动并周期性出现/消失的目标。
+    @param {str} path - 输出 mp4 路径。
+    @param {int} width - 宽度。
+    @param {int} height - 高度。
+    @param {int} fps - 帧率。
+    @param {float} duration_sec - 时长（秒）。
+    @param {int} density - 同时调度的目标数，0 表示没有目标。
+    @param {int} seed - 随机种子，相同参数生成的视频逐帧一致。
+    @returns {str} 视频路径
+    """
+    rng = np.random.default_rng(seed)
+    num_frames = int(round(fps * duration_sec))
+    class_names = list(TARGET_COLORS)
+
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)
+    gradient = ((xs[None, :] * 0.6 + ys[:, None] * 0.4) * 0.5 + 40).astype(np.uint8)
+    background = np.stack([gradient, np.roll(gradient, width // 3, axis=1), gradient[::-1]], axis=-1)
+    distractors = [
+        (int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40)),
+         int(rng.integers(20, max(21, width // 8))), int(rng.integers(20, max(21, height // 8))))
+        for _ in range(6)
+    ]
+
+    objects = []
+    for i in range(density):
+        w = int(rng.integers(width // 12, width // 5))
+        h = int(rng.integers(height // 12, height // 5))
+        objects.append({
+            'color': TARGET_COLORS[class_names[i % len(class_names)]],
+            'size': (w, h),
+            'pos': rng.uniform([0, 0], [width - w, height - h]),
+            'vel': rng.uniform(-3, 3, size=2) * width / 640,
+            # 每个目标以不同的周期出现与消失，产生多个片段
+            'period': int(rng.integers(fps * 2, fps * 5)),
+            'phase': int(rng.integers(0, fps * 5)),
+        })
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for frame_idx in range(num_frames):
+            frame = np.roll(background, frame_idx * 2, axis=1)
+            for x, y, w, h in distractors:
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (128, 128, 128), -1)
+            for obj in objects:
+                w, h = obj['size']
+                pos = obj['pos'] + obj['vel'] * frame_idx
+                # 在画面内往返移动
+                x = int(abs((pos[0] % (2 * (width - w))) - (width - w)))
+                y = int(abs((pos[1] % (2 * (height - h))) - (height - h)))
+                if (frame_idx + obj['phase']) % obj['period'] < obj['period'] * 0.6:
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), obj['color'], -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def ensure_synthetic_video(video_dir, name):
+    """生成（或复用已生成的）指定规格的合成视频"""
+    path = synth_video_path(video_dir, name)
+    if not os.path.exists(path):
+        width, height, fps, duration_sec, density = VIDEO_SPECS[name]
+        print(f"生成合成视频: {path}")
+        generate_synthetic_video(path, width, height, fps, duration_sec, density,
+                                 seed=sum(map(ord, name)))
+    return path
+
+
+class StandInDetector:
+    """\
+    离线基准测试用的替身模型：随机初始化的小型 YOLOv8 检测网络（不需要下载权重）
+    承担真实的预处理/推理/NMS 开销，检测框则按合成视频中 TARGET_COLORS 的纯色区域给出，
+    使片段状态机、画框与片段导出也按真实的目标出现情况运行。
+    """
+
+    def __init__(self, imgsz=320, cfg='yolov8n.yaml', seed=0):
+        import torch
+        from ultralytics import YOLO
+        from ultralytics.nn.tasks import DetectionModel
+
+        torch.manual_seed(seed)
+        self._yolo = YOLO(cfg, task='detect')
+        network = DetectionModel(cfg, nc=len(TARGET_COLORS), verbose=False)
+        network.names = dict(enumerate(TARGET_COLORS))
+        self._yolo.model = network
+        self.imgsz = imgsz
+        self._colors = np.array(list(TARGET_COLORS.values()), dtype=np.int16)
+
+    @property
+    def names(self):
+        return self._yolo.names
+
+    @property
+    def predictor(self):
+        return self._yolo.predictor
+
+    @property
+    def overrides(self):
+        return {'imgsz': self.imgsz}
+
+    def _color_boxes(self, frame):
+        import torch
+
+        # 在 1/4 分辨率上找纯色区域，框坐标再映射回原图
+        small = frame[::4, ::4].astype(np.int16)
+        rows = []
+        for cls_id, color in enumerate(self._colors):
+            mask = (np.abs(small - color).max(axis=-1) < 60).astype(np.uint8)
+            num, _, comp_stats, _ = cv2.connectedComponentsWithStats(mask)
+            for x, y, w, h, area in comp_stats[1:num]:
+                if area >= 4:
+                    rows.append([x * 4, y * 4, (x + w) * 4, (y + h) * 4, 0.9, cls_id])
+        return torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+
+    def predict(self, source, conf=0.25, verbose=False, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        results = self._yolo.predict(frames, conf=conf, imgsz=self.imgsz, device='cpu', verbose=verbose, **kwargs)
+        for frame, result in zip(frames, results):
+            result.update(boxes=self._color_boxes(frame))
+        return results
+
+    def warmup(self):
+        self.predict(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8))
+
+
+def _git_revision():
+    try:
+        root = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def _host_info():
+    import torch
+    import ultralytics
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'ultralytics': ultralytics.__version__,
+        'opencv': cv2.__version__,
+    }
+
+
+def _run_case(video_path, output_folder, mode_kwargs, weights, imgsz):
+    """在独立进程中执行一次检测，返回结果记录；每次运行单独起进程，内存峰值互不影响"""
+    from cut import detect_and_save_segments, get_model
+
+    if weights is None:
+        model = StandInDetector(imgsz=imgsz)
+        model.warmup()
+    else:
+        model = get_model(weights, device='cpu', imgsz=imgsz, warmup=True)
+
+    total_duration, saved_segments, duration, details = detect_and_save_segments(
+        video_path, output_folder, list(TARGET_COLORS), model=model, return_details=True,
+        detection_log=None, timing_report=True, **mode_kwargs)
+    with open(details['timing'], 'r', encoding='utf-8') as f:
+        timing = json.load(f)
+
+    stages = timing['stages']
+    frames = timing['frames']
+    return {
+        'wall_sec': timing['wall_sec'],
+        'frames': frames,
+        'inferred_frames': timing['inferred_frames'],
+        'fps': timing['fps'],
+        'latency_ms': {
+            'mean_per_frame': round(timing['wall_sec'] * 1000 / frames, 3) if frames else None,
+            'inference_p50': stages.get('inference', {}).get('p50_ms'),
+            'inference_p99': stages.get('inference', {}).get('p99_ms'),
+        },
+        'peak_rss_mb': timing['peak_rss_mb'],
+        'bottleneck': timing['bottleneck'],
+        'stages': {stage: {k: s[k] for k in ('total_sec', 'share_percent', 'mean_ms', 'p50_ms', 'p99_ms')}
+                   for stage, s in stages.items()},
+        'num_segments': len(saved_segments),
+        'total_duration': total_duration,
+        'host': _host_info(),
+    }
+
+
+def run_benchmark(video_names, mode_names, results_path, bench_dir=DEFAULT_BENCH_DIR, repeat=1,
+                  weights=None, imgsz=320, keep_outputs=False):
+    """\
+    @description 对每个 (合成视频, 运行模式) 组合执行 repeat 次检测，并把结果逐条追加到结果文件。
+    @param {list} video_names - VIDEO_SPECS 中的视频名称。
+    @param {list} mode_names - MODE_SPECS 中的模式名称。
+    @param {str} results_path - 结果文件（jsonl，每行一次运行），可跨提交累积后用 compare_results 对比。
+    @param {str} bench_dir - 合成视频与临时输出所在目录。
+    @param {int} repeat - 每个组合的运行次数。
+    @param {str|None} weights - 模型权重；None 时使用离线替身模型 StandInDetector。
+    @param {int} imgsz - 推理尺寸。
+    @param {bool} keep_outputs - 是否保留每次运行的输出目录。
+    @returns {list} 本次写入的结果记录
+    """
+    unknown = [n for n in video_names if n not in VIDEO_SPECS] + [m for m in mode_names if m not in MODE_SPECS]
+    if unknown:
+        raise ValueError(f"未知的视频或模式: {unknown}")
+
+    # 只用 CPU，结果在有无 GPU 的机器之间可比
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    os.environ.setdefault('YOLO_OFFLINE', '1')
+    commit, dirty = _git_revision()
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    video_dir = os.path.join(bench_dir, 'videos')
+    os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+
+    records = []
+    ctx = multiprocessing.get_context('spawn')
+    for video_name in video_names:
+        video_path = ensure_synthetic_video(video_dir, video_name)
+        width, height, fps, duration_sec, density = VIDEO_SPECS[video_name]
+        for mode_name in mode_names:
+            for i in range(repeat):
+                output_folder = os.path.join(bench_dir, 'outputs', run_id, f"{video_name}_{mode_name}_{i}")
+                print(f"[基准] {video_name} / {mode_name} ({i + 1}/{repeat})")
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    result = pool.submit(_run_case, video_path, output_folder, MODE_SPECS[mode_name],
+                                         weights, imgsz).result()
+                record = {
+                    'run_id': run_id,
+                    'commit': commit,
+                    'dirty': dirty,
+                    'created_at': datetime.now().isoformat(timespec='seconds'),
+                    'case': f"{video_name}/{mode_name}",
+                    'video': {'name': video_name, 'width': width, 'height': height, 'fps': fps,
+                              'duration_sec': duration_sec, 'density': density},
+                    'mode': {'name': mode_name, **MODE_SPECS[mode_name]},
+                    'model': weights or 'stand-in',
+                    'imgsz': imgsz,
+                    'repeat_index': i,
+                    **result,
+                }
+                with open(results_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                records.append(record)
+                print(f"        {record['fps']:.1f} FPS, 单帧 {record['latency_ms']['mean_per_frame']} ms, "
+                      f"内存峰值 {record['peak_rss_mb']} MB, 瓶颈 {record['bottleneck']}")
+                if not keep_outputs:
+                    shutil.rmtree(output_folder, ignore_errors=True)
+    print(f"结果已追加到: {results_path}")
+    return records
+
+
+def _load_results(results_path):
+    with open(results_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_results(results_path, base=None, head=None):
+    """\
+    @description 对比结果文件中两次基准运行（按提交或 run_id）各组合的中位 FPS 与内存峰值。
+    @param {str} results_path - run_benchmark 写出的结果文件。
+    @param {str|None} base - 基准的提交号或 run_id，默认取倒数第二次运行。
+    @param {str|None} head - 对比的提交号或 run_id，默认取最后一次运行。
+    @returns {list} 每个组合的对比行
+    """
+    records = _load_results(results_path)
+    run_ids = list(dict.fromkeys(r['run_id'] for r in records))
+
+    def select(ref, default_index):
+        if ref is None:
+            if len(run_ids) < abs(default_index):
+                raise ValueError(f"结果文件中的运行次数不足: {results_path}")
+            ref = run_ids[default_index]
+        selected = [r for r in records if ref in (r['run_id'], r['commit'])]
+        if not selected:
+            raise ValueError(f"结果文件中没有 {ref} 的记录")
+        by_case = {}
+        for r in selected:
+            by_case.setdefault(r['case'], []).append(r)
+        return ref, by_case
+
+    base, base_cases = select(base, -2)
+    head, head_cases = select(head, -1)
+    rows = []
+    print(f"{'组合':<32}{'FPS(' + str(base) + ')':>22}{'FPS(' + str(head) + ')':>22}{'变化':>10}{'内存峰值 MB':>20}")
+    for case in [c for c in base_cases if c in head_cases]:
+        base_fps = statistics.median(r['fps'] for r in base_cases[case])
+        head_fps = statistics.median(r['fps'] for r in head_cases[case])
+        base_rss = max((r['peak_rss_mb'] or 0) for r in base_cases[case])
+        head_rss = max((r['peak_rss_mb'] or 0) for r in head_cases[case])
+        change = (head_fps / base_fps - 1) * 100 if base_fps else 0.0
+        rows.append({'case': case, 'base_fps': base_fps, 'head_fps': head_fps, 'change_percent': change,
+                     'base_peak_rss_mb': base_rss, 'head_peak_rss_mb': head_rss})
+        print(f"{case:<32}{base_fps:>22.1f}{head_fps:>22.1f}{change:>+9.1f}%{base_rss:>10.0f} -> {head_rss:<8.0f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cut.py 性能基准：合成视频 × 运行模式，仅 CPU、离线运行")
+    parser.add_argument("--preset", choices=list(PRESETS), default="quick", help="预设的视频与模式组合")
+    parser.add_argument("--videos", nargs="+", default=None, help=f"视频规格，覆盖预设: {', '.join(VIDEO_SPECS)}")
+    parser.add_argument("--modes", nargs="+", default=None, help=f"运行模式，覆盖预设: {', '.join(MODE_SPECS)}")
+    parser.add_argument("--repeat", type=int, default=1, help="每个组合的运行次数")
+    parser.add_argument("--weights", default=None, help="使用真实模型权重（默认使用离线替身模型）")
+    parser.add_argument("--imgsz", type=int, default=320, help="推理尺寸（默认 320）")
+    parser.add_argument("--bench-dir", default=DEFAULT_BENCH_DIR, help="合成视频与临时输出目录")
+    parser.add_argument("--results", default=os.path.join(DEFAULT_BENCH_DIR, "results.jsonl"), help="结果文件")
+    parser.add_argument("--keep-outputs", action="store_true", help="保留每次运行的输出目录")
+    parser.add_argument("--compare", nargs="*", default=None, metavar="REF",
+                        help="不运行基准，对比结果文件中的两次运行（提交号或 run_id；省略时为最后两次，只给一个时与最后一次对比）")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        if len(args.compare) > 2:
+            parser.error("--compare 最多接受两个提交号或 run_id")
+        refs = args.compare + [None] * (2 - len(args.compare))
+        compare_results(args.results, *refs)
+        sys.exit(0)
+
+    preset_videos, preset_modes = PRESETS[args.preset]
+    run_benchmark(
+        args.videos or preset_videos,
+        args.modes or preset_modes,
+        args.results,
+        bench_dir=args.bench_dir,
+        repeat=args.repeat,
+        weights=args.weights,
+        imgsz=args.imgsz,
+        keep_outputs=args.keep_outputs,
+    )
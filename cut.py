@@ -1,25 +1,411 @@
 import cv2
+import hashlib
+from stage_timing import StageTimer, measure
+from preprocess import LetterboxPreprocessor, parse_roi
+from scene_gate import SceneChangeGate
+from frame_source import FRAME_SOURCES, FFmpegFrameSource, OpenCVFrameSource
+from detection_log import (
+    DETECTION_CACHE_CONF_FLOOR, DetectionLogWriter, detection_cache_key, detection_log_path,
+    file_sha256, find_detection_cache, load_detection_log, merge_detection_logs, resolve_log_format,
+)
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 from ultralytics import YOLO
-from moviepy import VideoFileClip
 import os
 import time
 import shutil
+import threading
+import queue
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
 from datetime import datetime
 import re
+import json
+from functools import lru_cache
 
-def cv2AddChineseText(img, text, position, textColor, textSize):
-    if (isinstance(img, np.ndarray)):  # 判断是否OpenCV图片类型
-        img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    draw = ImageDraw.Draw(img)
-    fontStyle = ImageFont.truetype(
-        "DejaVuSerif-Bold.ttf", textSize, encoding="utf-8")
-    # 绘制文本
-    draw.text(position, text, textColor, font=fontStyle)
-    # 转换回OpenCV格式
-    return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+@lru_cache(maxsize=None)
+def _load_font(font_path, text_size):
+    """字体只从磁盘加载一次"""
+    return ImageFont.truetype(font_path, text_size, encoding="utf-8")
+
+class OverlayRenderer:
+    """\
+    逐帧绘制左上角的统计信息（HUD）。
+
+    字体只加载一次，静态的标签文字预先渲染到一块 RGBA 底图上；每帧只在底图副本上
+    写入数值，再用 NumPy 将这一小块区域按 alpha 混合到帧上，不再对整帧做
+    BGR→RGB→PIL→BGR 的往返转换。
+    """
+
+    def __init__(self, labels, origin=(10, 50), line_spacing=50,
+                 text_color=(255, 0, 0), text_size=40, font_path="DejaVuSerif-Bold.ttf",
+                 value_template="00000000.00%"):
+        self.origin = origin
+        self.text_color = text_color
+        self.font = _load_font(font_path, text_size)
+        self.value_offsets = [
+            (int(np.ceil(self.font.getlength(label))), i * line_spacing)
+            for i, label in enumerate(labels)
+        ]
+        width = max(x for x, _ in self.value_offsets) + int(np.ceil(self.font.getlength(value_template)))
+        height = (len(labels) - 1) * line_spacing + self.font.getbbox("Ag")[3]
+
+        self.base = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(self.base)
+        for label, (_, y) in zip(labels, self.value_offsets):
+            draw.text((0, y), label, self.text_color, font=self.font)
+
+    def draw(self, frame, values):
+        """在 BGR 帧上原地绘制各行数值，返回该帧"""
+        x0, y0 = self.origin
+        frame_h, frame_w = frame.shape[:2]
+        w = min(self.base.width, frame_w - x0)
+        h = min(self.base.height, frame_h - y0)
+        if w <= 0 or h <= 0:
+            return frame
+
+        patch = self.base.copy()
+        draw = ImageDraw.Draw(patch)
+        for value, (x, y) in zip(values, self.value_offsets):
+            draw.text((x, y), value, self.text_color, font=self.font)
+
+        rgba = np.asarray(patch)[:h, :w]
+        alpha = rgba[..., 3:4].astype(np.uint16)
+        roi = frame[y0:y0 + h, x0:x0 + w]
+        # RGB → BGR 后按 alpha 混合：out = (src * a + dst * (255 - a)) / 255
+        blended = (rgba[..., 2::-1] * alpha + roi * (255 - alpha) + 127) // 255
+        roi[...] = blended.astype(np.uint8)
+        return frame
+
+_STATS_OVERLAY_LABELS = [
+    "广告出现次数(Segments): ",
+    "广告出现时长(Time): ",
+    "广告出现时长占比(Time Ratio): ",
+    "广告面积占比: ",
+]
+
+def _read_frame_batch(source, batch_size):
+    """连续解码至多 batch_size 帧，视频结束时返回的帧数可能不足"""
+    frames = []
+    while len(frames) < batch_size:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    return frames
+
+def _iter_frame_batches(source, batch_size, total_frames, timer=None):
+    """按批解码视频，逐批产出 (起始帧序号, 帧列表)；给出 timer 时记录 decode 阶段耗时"""
+    frame_idx = 0
+    while frame_idx < total_frames:
+        start = time.perf_counter()
+        frames = _read_frame_batch(source, min(batch_size, total_frames - frame_idx))
+        if not frames:
+            return
+        if timer is not None:
+            timer.add("decode", time.perf_counter() - start, len(frames))
+        yield frame_idx, frames
+        frame_idx += len(frames)
+
+def _open_frame_source(input_video_path, frame_source="opencv", decode_width=None, decode_threads=0, num_buffers=0):
+    """按名称打开帧源（见 frame_source.py），decode_width 等参数仅 ffmpeg 帧源支持"""
+    if frame_source not in FRAME_SOURCES:
+        raise ValueError(f"不支持的帧源: {frame_source}，可选: {', '.join(FRAME_SOURCES)}")
+    if frame_source == "opencv":
+        if decode_width is not None:
+            raise ValueError("decode_width 需要 ffmpeg 帧源（frame_source=\"ffmpeg\"）")
+        return OpenCVFrameSource(input_video_path)
+    if decode_width is not None and decode_width < 2:
+        raise ValueError(f"decode_width 必须 >= 2: {decode_width}")
+    return FFmpegFrameSource(input_video_path, _get_ffmpeg_exe(), decode_width=decode_width,
+                             threads=decode_threads, num_buffers=num_buffers)
+
+class _BackgroundIterator:
+    """在后台线程中消费一个迭代器，经有界队列按原顺序交给调用方。
+
+    队列满时生产线程阻塞（背压），避免解码远快于推理时帧在内存中无限堆积；
+    生产线程中的异常会在调用方迭代时重新抛出。
+    """
+
+    _END = object()
+
+    def __init__(self, iterable, maxsize):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(iterable,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(self._END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+class _BackgroundWorker:
+    """在后台线程中按提交顺序逐项执行 fn，队列满时 submit 阻塞（背压）"""
+
+    _END = object()
+
+    def __init__(self, fn, maxsize):
+        self._fn = fn
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if self._error is not None:
+                continue  # 出错后只排空队列，不再处理
+            try:
+                self._fn(item)
+            except Exception as e:
+                self._error = e
+
+    def submit(self, item):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def close(self):
+        """等待已提交的任务全部完成"""
+        self._queue.put(self._END)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+class _FrameBroadcaster:
+    """在后台线程中只解码一次，把每批帧按原顺序分发给多个订阅者（各自一个有界队列）。
+
+    最慢的订阅者决定解码速度（背压）；订阅者提前结束时调用 close，之后不再向其分发，
+    避免其队列写满后阻塞其他订阅者。帧数组被所有订阅者共享，只能读取。
+    """
+
+    _END = object()
+
+    def __init__(self, iterable, num_subscribers, maxsize):
+        self._queues = [queue.Queue(maxsize=maxsize) for _ in range(num_subscribers)]
+        self._closed = [threading.Event() for _ in range(num_subscribers)]
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(iterable,), daemon=True)
+        self._thread.start()
+
+    def _put(self, index, item):
+        while not self._closed[index].is_set():
+            try:
+                self._queues[index].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if all(closed.is_set() for closed in self._closed):
+                    return
+                for index in range(len(self._queues)):
+                    self._put(index, item)
+        except Exception as e:
+            self._error = e
+        finally:
+            for index in range(len(self._queues)):
+                self._put(index, self._END)
+
+    def subscribe(self, index):
+        """第 index 个订阅者的批次迭代器"""
+        while True:
+            item = self._queues[index].get()
+            if item is self._END:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def close(self, index):
+        self._closed[index].set()
+
+    def join(self):
+        self._thread.join()
+
+def _filter_target_boxes(result, target_class_ids, preprocessor=None):
+    """\
+    从单帧推理结果中筛出目标类别，返回 (has_target, 面积, 框列表)，筛选与面积计算在 NumPy 中完成。
+
+    框列表每行为 [x1, y1, x2, y2, 类别 ID, 跟踪 ID, 置信度]，未启用跟踪时跟踪 ID 为 -1。
+    给出 preprocessor 时推理输入是 letterbox 后的图像，框先映射回原图坐标。
+    """
+    detections = result.boxes.data.cpu().numpy()
+    if detections.ndim != 2 or detections.shape[1] < 6 or not len(detections):
+        return False, 0, []
+    if preprocessor is not None:
+        detections = preprocessor.map_boxes(detections)
+    # 检测结果列为 xyxy, conf, cls；跟踪结果列为 xyxy, id, conf, cls，类别与置信度总在最后两列
+    class_ids = detections[:, -1].astype(int)
+    mask = np.isin(class_ids, target_class_ids)
+    if not mask.any():
+        return False, 0, []
+    xyxy = detections[mask, :4].astype(int)  # 与 int() 一致，向零取整
+    area = int(((xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])).sum())
+    if detections.shape[1] >= 7:
+        track_ids = detections[:, 4].astype(int)
+    else:
+        track_ids = np.full(len(detections), -1)
+    rows = np.column_stack([xyxy, class_ids[mask], track_ids[mask]]).tolist()
+    boxes = [row + [conf] for row, conf in zip(rows, detections[mask, -2].tolist())]
+    return True, area, boxes
+
+def _select_target_boxes(boxes, target_class_ids, conf_threshold):
+    """从低阈值检测结果中按目标类别与置信度阈值重新筛选，返回 (has_target, 面积, 框列表)"""
+    target_class_ids = set(target_class_ids)
+    # 与 Ultralytics 的置信度过滤一致（严格大于阈值）
+    boxes = [box for box in boxes if box[4] in target_class_ids and box[6] > conf_threshold]
+    area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2, *_ in boxes)
+    return bool(boxes), area, boxes
+
+def _present_classes(det):
+    """一帧检测结果中出现的目标类别集合"""
+    return {box[4] for box in det[2]}
+
+def _record_inference_timing(timer, results, call_sec, filter_sec, num_frames, prepare_sec=0.0):
+    """\
+    记录一次推理调用的分阶段耗时：优先使用 Ultralytics 结果中的 speed（预处理/推理/后处理，
+    单位 ms，批量推理时为每帧均摊值），显式 letterbox 计入预处理，目标框筛选计入后处理；
+    没有 speed 时整次调用计为推理。
+    """
+    speeds = [getattr(result, "speed", None) for result in results]
+    if prepare_sec:
+        timer.add("preprocess", prepare_sec, num_frames)
+    if results and all(speeds):
+        timer.add("preprocess", sum(sp.get("preprocess") or 0 for sp in speeds) / 1000, num_frames)
+        timer.add("inference", sum(sp.get("inference") or 0 for sp in speeds) / 1000, num_frames)
+        timer.add("postprocess", sum(sp.get("postprocess") or 0 for sp in speeds) / 1000 + filter_sec, num_frames)
+    else:
+        timer.add("inference", call_sec, num_frames)
+        timer.add("postprocess", filter_sec, num_frames)
+
+def _detect_batch(model, frames, conf_threshold, target_class_ids, detect_every_n, last_det, track=False,
+                  timer=None, preprocessor=None, gate=None):
+    """\
+    对一批帧做（可稀疏采样的）检测，返回 (逐帧检测结果列表, 最后一个采样帧的结果, 推理帧数)。
+
+    每 detect_every_n 帧只对最后一帧（采样帧）推理；若采样帧出现的目标类别与上一个
+    采样帧相同，区间内的帧沿用上一次的检测结果，否则对区间内其余帧补做稠密推理，
+    使（各类别的）片段边界仍精确到帧。批内所有采样帧合并为一次推理调用，补推理的帧
+    合并为另一次。track=True 时改用 model.track 逐帧关联目标实例（要求 detect_every_n=1）。
+    给出 timer 时记录预处理/推理/后处理耗时；给出 preprocessor（LetterboxPreprocessor）时
+    先在本地完成 ROI 裁剪与 letterbox，再把框映射回原图坐标。给出 gate（SceneChangeGate，
+    要求 detect_every_n=1）时只推理画面有变化的帧，其余帧沿用前一帧的结果。
+    """
+    if track:
+        def infer(batch):
+            return model.track(batch, conf=conf_threshold, persist=True, verbose=False)
+    else:
+        def infer(batch):
+            return model.predict(batch, conf=conf_threshold, verbose=False)
+
+    def detect(frame_ids):
+        batch = [frames[i] for i in frame_ids]
+        prepare_sec = 0.0
+        if preprocessor is not None:
+            start = time.perf_counter()
+            batch = preprocessor.prepare(batch)
+            prepare_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        results = infer(batch)
+        call_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        dets = [_filter_target_boxes(result, target_class_ids, preprocessor) for result in results]
+        if timer is not None:
+            _record_inference_timing(timer, results, call_sec, time.perf_counter() - start, len(frame_ids),
+                                     prepare_sec)
+        return dets
+
+    num_frames = len(frames)
+    if gate is not None:
+        with measure(timer, "gate", num_frames):
+            infer_ids = [i for i in range(num_frames) if gate.should_infer(frames[i])]
+        inferred = dict(zip(infer_ids, detect(infer_ids))) if infer_ids else {}
+        frame_dets = []
+        for i in range(num_frames):
+            last_det = inferred.get(i, last_det)
+            frame_dets.append(last_det)
+        return frame_dets, last_det, len(infer_ids)
+
+    sample_ids = [i for i in range(num_frames) if (i + 1) % detect_every_n == 0]
+    if num_frames % detect_every_n:
+        sample_ids.append(num_frames - 1)  # 视频末尾不足一个步长的部分也要覆盖
+
+    frame_dets = [None] * num_frames
+    dense_ids = []
+    prev_sample = -1
+    for i, det in zip(sample_ids, detect(sample_ids)):
+        frame_dets[i] = det
+        between = range(prev_sample + 1, i)
+        if _present_classes(det) != _present_classes(last_det):
+            dense_ids.extend(between)  # 状态翻转，区间内逐帧确定边界
+        else:
+            for j in between:
+                frame_dets[j] = last_det
+        last_det = det
+        prev_sample = i
+
+    if dense_ids:
+        for i, det in zip(dense_ids, detect(dense_ids)):
+            frame_dets[i] = det
+
+    return frame_dets, last_det, len(sample_ids) + len(dense_ids)
+
+def _draw_frame(frame, boxes, class_names, overlay, overlay_stats, scale=1.0):
+    """在帧上绘制检测框与实时统计信息，scale < 1 时先缩小帧再绘制（预览视频）"""
+    if scale != 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        boxes = [(int(x1 * scale), int(y1 * scale), int(x2 * scale), int(y2 * scale), cls_id, track_id, conf)
+                 for x1, y1, x2, y2, cls_id, track_id, conf in boxes]
+    for x1, y1, x2, y2, cls_id, track_id, _ in boxes:
+        label = class_names[cls_id] if track_id < 0 else f"{class_names[cls_id]} #{track_id}"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # 改为绿色框
+        cv2.putText(frame, label, (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    segment_count, target_duration, duration_ratio, area_ratio = overlay_stats
+    return overlay.draw(frame, [
+        f"{segment_count}",
+        f"{target_duration:.1f}s",
+        f"{duration_ratio:.2f}%",
+        f"{area_ratio:.1f}%",
+    ])
 
 # 新增函数：获取下一个输出文件夹路径
 def get_next_output_folder(base_path):
@@ -41,13 +427,589 @@ def get_next_output_folder(base_path):
         except:
             continue
     
-    # 创建新的输出文件夹
+    # 创建新的输出文件夹：os.mkdir 是原子操作，多个进程同时分配时
+    # 抢到同一序号的一方会得到 FileExistsError，继续尝试下一个序号
     next_num = max_num + 1
-    new_folder = os.path.join(base_path, f"output{next_num}")
-    os.makedirs(new_folder, exist_ok=True)
+    while True:
+        new_folder = os.path.join(base_path, f"output{next_num}")
+        try:
+            os.mkdir(new_folder)
+            break
+        except FileExistsError:
+            next_num += 1
     print(f"创建新的输出文件夹: {new_folder}")
     return new_folder
 
+# 重编码模式下每次 ffmpeg 调用同时输出的片段数上限（每个输出各占一个 x264 编码器）
+_REENCODE_GROUP_SIZE = 8
+
+def _get_ffmpeg_exe():
+    """优先使用系统 ffmpeg，否则回退到 imageio-ffmpeg 自带的可执行文件"""
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception as e:
+        raise RuntimeError("未找到 ffmpeg，请安装系统 ffmpeg 或 imageio-ffmpeg") from e
+
+def _export_segments_copy(ffmpeg_exe, input_video_path, segments):
+    """流拷贝导出：不解码不编码，起点对齐到 expanded_start 之前最近的关键帧"""
+    for i, seg in enumerate(segments):
+        cmd = [
+            ffmpeg_exe, "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", f"{seg['expanded_start']:.3f}", "-i", input_video_path,
+            "-t", f"{seg['expanded_end'] - seg['expanded_start']:.3f}",
+            "-map", "0:v:0", "-c", "copy", "-an",
+            "-avoid_negative_ts", "make_zero",
+            seg["path"],
+        ]
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            yield i, None
+        except subprocess.CalledProcessError as e:
+            yield i, e.stderr.decode("utf-8", errors="ignore").strip() or str(e)
+
+def _export_segments_reencode(ffmpeg_exe, input_video_path, segments):
+    """重编码导出：每组片段只解码一次源视频，用 split+trim 精确到帧地切出各片段"""
+    for group_start in range(0, len(segments), _REENCODE_GROUP_SIZE):
+        group = segments[group_start:group_start + _REENCODE_GROUP_SIZE]
+        seek = min(seg["expanded_start"] for seg in group)
+        read_duration = max(seg["expanded_end"] for seg in group) - seek
+
+        labels = "".join(f"[s{k}]" for k in range(len(group)))
+        graph = [f"[0:v]split={len(group)}{labels}"]
+        for k, seg in enumerate(group):
+            graph.append(
+                f"[s{k}]trim=start={seg['expanded_start'] - seek:.3f}:end={seg['expanded_end'] - seek:.3f},"
+                f"setpts=PTS-STARTPTS[o{k}]"
+            )
+
+        cmd = [
+            ffmpeg_exe, "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", f"{seek:.3f}", "-t", f"{read_duration:.3f}", "-i", input_video_path,
+            "-filter_complex", ";".join(graph),
+        ]
+        for k, seg in enumerate(group):
+            cmd += ["-map", f"[o{k}]", "-c:v", "libx264", "-an", seg["path"]]
+
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            error = None
+        except subprocess.CalledProcessError as e:
+            error = e.stderr.decode("utf-8", errors="ignore").strip() or str(e)
+        for k in range(len(group)):
+            yield group_start + k, error
+
+def export_segments(input_video_path, segments, seg_output_folder, name_prefix, export_mode="copy"):
+    """\
+    将片段从源视频中导出为独立的 mp4（无音轨）。
+
+    export_mode:
+      - "copy": ffmpeg 流拷贝，速度最快；起点会对齐到前一个关键帧，片段可能略长
+      - "reencode": 精确到帧的重编码（libx264），每组片段共用一次解码
+    segments 为包含 expanded_start/expanded_end 的字典列表，导出成功的片段会补充
+    path 与 duration 字段并返回。
+    """
+    if export_mode == "copy":
+        exporter = _export_segments_copy
+    elif export_mode == "reencode":
+        exporter = _export_segments_reencode
+    else:
+        raise ValueError(f"不支持的导出模式: {export_mode}")
+
+    os.makedirs(seg_output_folder, exist_ok=True)
+    ffmpeg_exe = _get_ffmpeg_exe()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    for i, seg in enumerate(segments):
+        output_filename = f"{name_prefix}_{timestamp}_{i+1}_{seg['expanded_start']:.1f}s-{seg['expanded_end']:.1f}s.mp4"
+        seg["path"] = os.path.join(seg_output_folder, output_filename)
+        seg["duration"] = seg["expanded_end"] - seg["expanded_start"]
+
+    saved_segments = []
+    for i, error in exporter(ffmpeg_exe, input_video_path, segments):
+        seg = segments[i]
+        if error is not None:
+            print(f"保存片段 {i+1} 时出错: {error}")
+            continue
+        saved_segments.append(seg)
+        print(f"保存片段 {i+1}: {os.path.basename(seg['path'])} ({seg['duration']:.1f}秒)")
+    return saved_segments
+
+def concat_videos(part_paths, output_path):
+    """用 ffmpeg concat 分离器按顺序无损拼接编码参数相同的多个 mp4（断点续跑的可视化分段）"""
+    if len(part_paths) == 1:
+        shutil.move(part_paths[0], output_path)
+        return output_path
+    list_path = output_path + ".concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for part_path in part_paths:
+            escaped = os.path.abspath(part_path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        _get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path,
+    ]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+class ExposureStats:
+    """\
+    增量维护的曝光统计：片段数、累计时长、时长占比与当前帧面积占比。
+
+    每个片段结束时由 SegmentTracker 调用 add_segment 累加一次，逐帧只需 O(1) 读取；
+    叠加显示与最终摘要使用同一个对象，保证两处数值一致。
+    """
+
+    def __init__(self, video_duration, frame_area=0):
+        self.video_duration = video_duration
+        self.frame_area = frame_area
+        self.segment_count = 0
+        self.total_duration = 0.0
+        self.area = 0
+        self.visible_frames = 0
+        self.area_ratio_sum = 0.0
+
+    def add_segment(self, start, end):
+        self.segment_count += 1
+        self.total_duration += end - start
+
+    def record_frame(self, area):
+        """记录当前帧的目标面积，并累计出现帧上的面积占比"""
+        self.area = area
+        if area > 0 and self.frame_area > 0:
+            self.visible_frames += 1
+            self.area_ratio_sum += area / self.frame_area
+
+    @property
+    def duration_ratio(self):
+        return (self.total_duration / self.video_duration) * 100 if self.video_duration > 0 else 0
+
+    @property
+    def area_ratio(self):
+        return self.area / self.frame_area * 100 if self.frame_area > 0 else 0
+
+    @property
+    def mean_area_ratio(self):
+        """目标出现帧上的平均面积占比（%）"""
+        return self.area_ratio_sum / self.visible_frames * 100 if self.visible_frames else 0
+
+    def snapshot(self):
+        """返回 (片段数, 累计时长, 时长占比%, 面积占比%)，供异步绘制线程使用"""
+        return self.segment_count, self.total_duration, self.duration_ratio, self.area_ratio
+
+    def state_dict(self):
+        return dict(vars(self))
+
+    def load_state_dict(self, state):
+        vars(self).update(state)
+
+class SegmentTracker:
+    """\
+    逐帧维护目标出现片段的状态机。
+
+    目标消失后先记下中断起点，只有中断持续 max_gap_sec 以上才真正结束片段（滞回），
+    避免检测闪断一两帧就把一次露出拆成多个碎片段；片段结束时再按 min_segment_duration
+    过滤过短的片段。max_gap_sec=0 时与逐帧立即判定的行为一致。
+    """
+
+    def __init__(self, min_segment_duration, max_gap_sec=0.0, stats=None):
+        self.min_segment_duration = min_segment_duration
+        self.max_gap_sec = max_gap_sec
+        self.stats = stats
+        self.segments = []
+        self.in_segment = False
+        self.segment_start = 0
+        self.gap_start = None
+
+    def update(self, has_target, current_time_sec):
+        if has_target:
+            if not self.in_segment:
+                self.segment_start = current_time_sec
+                self.in_segment = True
+            self.gap_start = None
+        elif self.in_segment:
+            if self.gap_start is None:
+                self.gap_start = current_time_sec
+            if current_time_sec - self.gap_start >= self.max_gap_sec:
+                self._close(self.gap_start)
+
+    def finish(self, current_time_sec):
+        """视频结束时若仍处于片段中，按当前时间（或中断起点）收尾"""
+        if self.in_segment:
+            self._close(self.gap_start if self.gap_start is not None else current_time_sec)
+        return self.segments
+
+    def state_dict(self):
+        """可 JSON 序列化的状态（断点续跑用），包含关联的 ExposureStats"""
+        return {
+            "segments": [list(seg) for seg in self.segments],
+            "in_segment": self.in_segment,
+            "segment_start": self.segment_start,
+            "gap_start": self.gap_start,
+            "stats": self.stats.state_dict() if self.stats is not None else None,
+        }
+
+    def load_state_dict(self, state):
+        self.segments = [tuple(seg) for seg in state["segments"]]
+        self.in_segment = state["in_segment"]
+        self.segment_start = state["segment_start"]
+        self.gap_start = state["gap_start"]
+        if self.stats is not None and state["stats"] is not None:
+            self.stats.load_state_dict(state["stats"])
+
+    def _close(self, segment_end):
+        if segment_end - self.segment_start >= self.min_segment_duration:
+            self.segments.append((self.segment_start, segment_end))
+            if self.stats is not None:
+                self.stats.add_segment(self.segment_start, segment_end)
+        self.in_segment = False
+        self.gap_start = None
+
+class ExposureBreakdown:
+    """\
+    在同一次扫描中按目标类别分别维护片段时间线与统计（时长、频次、面积占比），
+    启用跟踪时还按跟踪 ID 统计每个目标实例的出现时间与帧数。
+    """
+
+    def __init__(self, class_ids, class_names, video_duration, frame_area, min_segment_duration, max_gap_sec=0.0):
+        self.class_names = class_names
+        self.trackers = {
+            cls_id: SegmentTracker(min_segment_duration, max_gap_sec, ExposureStats(video_duration, frame_area))
+            for cls_id in class_ids
+        }
+        self.tracks = {}
+
+    def update(self, boxes, current_time_sec):
+        class_area = defaultdict(int)
+        for x1, y1, x2, y2, cls_id, track_id, _ in boxes:
+            class_area[cls_id] += (x2 - x1) * (y2 - y1)
+            if track_id >= 0:
+                track = self.tracks.get(track_id)
+                if track is None:
+                    self.tracks[track_id] = {
+                        "class": self.class_names[cls_id],
+                        "first_seen": current_time_sec,
+                        "last_seen": current_time_sec,
+                        "frames": 1,
+                    }
+                else:
+                    track["last_seen"] = current_time_sec
+                    track["frames"] += 1
+
+        for cls_id, tracker in self.trackers.items():
+            tracker.stats.record_frame(class_area.get(cls_id, 0))
+            tracker.update(cls_id in class_area, current_time_sec)
+
+    def state_dict(self):
+        return {
+            "trackers": {str(cls_id): tracker.state_dict() for cls_id, tracker in self.trackers.items()},
+            "tracks": [[track_id, track] for track_id, track in self.tracks.items()],
+        }
+
+    def load_state_dict(self, state):
+        for cls_id, tracker in self.trackers.items():
+            tracker.load_state_dict(state["trackers"][str(cls_id)])
+        self.tracks = {track_id: track for track_id, track in state["tracks"]}
+
+    def finish(self, current_time_sec, fps):
+        """结束所有类别的时间线，返回 {"classes": {类别名: 统计}, "tracks": [实例统计]}"""
+        classes = {}
+        for cls_id, tracker in self.trackers.items():
+            segments = tracker.finish(current_time_sec)
+            stats = tracker.stats
+            classes[self.class_names[cls_id]] = {
+                "total_duration": stats.total_duration,
+                "num_segments": stats.segment_count,
+                "time_ratio_percent": stats.duration_ratio,
+                "mean_area_ratio_percent": stats.mean_area_ratio,
+                "first_appeared": segments[0][0] if segments else None,
+                "last_disappeared": segments[-1][1] if segments else None,
+                "segments": segments,
+            }
+        tracks = [
+            dict(track, track_id=track_id, duration=track["frames"] / fps)
+            for track_id, track in sorted(self.tracks.items())
+        ]
+        return {"classes": classes, "tracks": tracks}
+
+def merge_expanded_segments(segments, merge_gap_sec=0.0):
+    """\
+    合并扩展后相互重叠或间隔不超过 merge_gap_sec 的片段，避免重叠部分被重复导出。
+
+    返回的每个导出片段带有 members 字段，记录其包含的原始片段。
+    merge_gap_sec 为 None 时不合并（每个原始片段单独导出）。
+    """
+    clips = []
+    for seg in sorted(segments, key=lambda x: x["expanded_start"]):
+        if (merge_gap_sec is not None and clips
+                and seg["expanded_start"] - clips[-1]["expanded_end"] <= merge_gap_sec):
+            clip = clips[-1]
+            clip["expanded_end"] = max(clip["expanded_end"], seg["expanded_end"])
+            clip["members"].append(seg)
+        else:
+            clips.append({
+                "expanded_start": seg["expanded_start"],
+                "expanded_end": seg["expanded_end"],
+                "members": [seg],
+            })
+    return clips
+
+# README 中发布的各品牌模型版本，可直接用版本名代替权重路径
+MODEL_VARIANTS = {
+    "su-v1": "./weights/su-v1.pt",
+    "su-v2": "./weights/su-v2.pt",
+    "su-v3": "./weights/su-v3.pt",
+    "su-v4": "./weights/su-v4.pt",
+    "xiaomi-v1": "./weights/xiaomi-v1.pt",
+}
+DEFAULT_WEIGHTS = "su-v4"
+INFERENCE_BACKENDS = ("pytorch", "onnx", "openvino")
+# 一致性检查抽取的帧数
+PARITY_CHECK_FRAMES = 8
+
+_model_registry = {}
+_model_registry_lock = threading.Lock()
+
+def resolve_weights_path(weights):
+    """将模型版本名（如 "su-v4"）解析为权重路径，其他值按路径原样返回"""
+    return MODEL_VARIANTS.get(weights, weights)
+
+def _export_artifact_path(weights, backend):
+    """非 pytorch 后端的导出产物路径（.pt 同目录的 .onnx 文件或 _openvino_model 目录）"""
+    stem = os.path.splitext(os.path.abspath(resolve_weights_path(weights)))[0]
+    return stem + ".onnx" if backend == "onnx" else stem + "_openvino_model"
+
+def get_detection_cache_key(input_video_path, weights=DEFAULT_WEIGHTS, imgsz=None, roi=None, backend="pytorch"):
+    """\
+    检测缓存键：视频内容哈希 + 实际推理所用模型的哈希 + 后端，指定推理尺寸、ROI 时一并计入。
+
+    pytorch 后端对权重文件取哈希；onnx / openvino 对导出产物取哈希（OpenVINO 目录按其中各文件），
+    不同后端的检测框与置信度略有差异，缓存互不复用。模型不是本地文件时按名称哈希。
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}")
+    model_path = resolve_weights_path(weights) if backend == "pytorch" else _export_artifact_path(weights, backend)
+    if os.path.isfile(model_path):
+        model_hash = file_sha256(model_path)
+    elif os.path.isdir(model_path):
+        digest = hashlib.sha256()
+        for root, _, files in sorted(os.walk(model_path)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, model_path).encode("utf-8"))
+                digest.update(file_sha256(path).encode("ascii"))
+        model_hash = digest.hexdigest()
+    else:
+        model_hash = hashlib.sha256(str(model_path).encode("utf-8")).hexdigest()
+    return detection_cache_key(file_sha256(input_video_path), model_hash, imgsz, parse_roi(roi), backend)
+
+def export_weights(weights, backend, imgsz=None):
+    """\
+    将 .pt 权重导出为 ONNX / OpenVINO 格式并缓存在 .pt 同目录下，已导出且不旧于
+    .pt 时直接复用。导出为动态输入尺寸，因此可用于任意 imgsz 与批量推理。
+    """
+    if backend not in INFERENCE_BACKENDS or backend == "pytorch":
+        raise ValueError(f"不支持的导出格式: {backend}")
+    pt_path = os.path.abspath(resolve_weights_path(weights))
+    if not os.path.exists(pt_path):
+        raise FileNotFoundError(f"未找到模型权重: {pt_path}")
+    artifact = _export_artifact_path(pt_path, backend)
+    if os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(pt_path):
+        return artifact
+    print(f"导出 {backend} 模型: {artifact}")
+    return YOLO(pt_path).export(format=backend, imgsz=imgsz or 640, dynamic=True)
+
+def get_model(weights=DEFAULT_WEIGHTS, device=None, imgsz=None, warmup=False, backend="pytorch"):
+    """\
+    按 (权重路径, device, imgsz, backend) 缓存已加载的模型，同一进程内重复调用不再重复加载与融合。
+
+    weights 可为权重路径或 MODEL_VARIANTS 中的版本名；device/imgsz 为 None 时使用
+    Ultralytics 默认值。backend 为 "onnx" / "openvino" 时先经 export_weights 导出
+    （仅首次），再通过对应运行时推理，适合无 GPU 的 CPU 节点。warmup=True 时在首次
+    加载后用一帧空白图像推理一次，提前完成预测器初始化与层融合，使第一帧真实数据
+    不再承担这部分延迟。
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}")
+    weights_path = os.path.abspath(resolve_weights_path(weights))
+    key = (weights_path, device, imgsz, backend)
+    with _model_registry_lock:
+        model = _model_registry.get(key)
+        if model is None:
+            if backend == "pytorch":
+                if not os.path.exists(weights_path):
+                    raise FileNotFoundError(f"未找到模型权重: {weights_path}")
+                model = YOLO(weights_path)
+            else:
+                model = YOLO(export_weights(weights_path, backend, imgsz), task="detect")
+            # 写入 overrides 后，之后每次 predict 都会沿用这里的 device/imgsz
+            if device is not None:
+                model.overrides["device"] = device
+            if imgsz is not None:
+                model.overrides["imgsz"] = imgsz
+            if warmup:
+                size = imgsz or 640
+                model.predict(np.zeros((size, size, 3), dtype=np.uint8), verbose=False)
+            _model_registry[key] = model
+        return model
+
+def _box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def _sample_frames(input_video_path, num_frames):
+    """从视频中均匀抽取若干帧"""
+    cap = cv2.VideoCapture(input_video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for i in range(num_frames):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * (i + 0.5) / num_frames))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+def check_backend_parity(weights, backend, frames, device=None, imgsz=None,
+                         conf_threshold=0.25, iou_threshold=0.5, min_match_ratio=0.95):
+    """\
+    在同一批帧上对比导出后端与 PyTorch 原模型的检测结果。
+
+    按类别相同且 IoU >= iou_threshold 贪心匹配检测框，返回匹配率
+    (2 * 匹配数 / 两侧检测框总数) 与匹配框之间的最大置信度差；匹配率低于
+    min_match_ratio 时打印警告。
+    """
+    reference = get_model(weights, device, imgsz)
+    exported = get_model(weights, device, imgsz, backend=backend)
+    ref_results = reference.predict(frames, conf=conf_threshold, verbose=False)
+    exp_results = exported.predict(frames, conf=conf_threshold, verbose=False)
+
+    matched = 0
+    total = 0
+    max_conf_diff = 0.0
+    for ref_result, exp_result in zip(ref_results, exp_results):
+        ref_dets = ref_result.boxes.data.cpu().numpy().tolist()
+        exp_dets = exp_result.boxes.data.cpu().numpy().tolist()
+        total += len(ref_dets) + len(exp_dets)
+        for ref_det in ref_dets:
+            best, best_iou = None, iou_threshold
+            for j, exp_det in enumerate(exp_dets):
+                if int(exp_det[5]) != int(ref_det[5]):
+                    continue
+                iou = _box_iou(ref_det, exp_det)
+                if iou >= best_iou:
+                    best, best_iou = j, iou
+            if best is not None:
+                max_conf_diff = max(max_conf_diff, abs(ref_det[4] - exp_dets[best][4]))
+                exp_dets.pop(best)
+                matched += 1
+
+    match_ratio = 2 * matched / total if total else 1.0
+    report = {"frames": len(frames), "match_ratio": match_ratio, "max_conf_diff": max_conf_diff}
+    print(f"后端一致性检查 ({backend} vs pytorch): {len(frames)} 帧，匹配率 {match_ratio * 100:.1f}%，"
+          f"最大置信度差 {max_conf_diff:.3f}")
+    if match_ratio < min_match_ratio:
+        print(f"警告: {backend} 后端与 PyTorch 检测结果差异较大（匹配率低于 {min_match_ratio * 100:.0f}%）")
+    return report
+
+def _resolve_target_class_ids(class_names, target_classes):
+    """按名称（不区分大小写）查找目标类别 ID"""
+    target_class_ids = [cid for cid, name in class_names.items() if name.lower() in [cls.lower() for cls in target_classes]]
+    if not target_class_ids:
+        raise ValueError(f"未找到目标类别: {target_classes}")
+    return target_class_ids
+
+def _save_segments(input_video_path, output_folder, target_classes, all_segments, stats,
+                   pre_buffer_sec, post_buffer_sec, merge_gap_sec, export_mode, timer=None):
+    """扩展、合并并导出检测到的片段，返回 (目标总时长, 已保存片段, 视频时长)"""
+    duration = stats.video_duration
+    if not all_segments:
+        print(f"未检测到目标类别: {target_classes}")
+        return 0.0, [], duration
+
+    # 保存视频片段
+    segments = [
+        {
+            "original_start": start,
+            "original_end": end,
+            "expanded_start": max(0, start - pre_buffer_sec),
+            "expanded_end": min(duration, end + post_buffer_sec),
+        }
+        for start, end in all_segments
+    ]
+    clips = merge_expanded_segments(segments, merge_gap_sec)
+    if len(clips) < len(segments):
+        print(f"合并重叠片段: {len(segments)} 个片段合并为 {len(clips)} 个导出文件")
+    seg_output_folder = os.path.join(output_folder, f"{'-'.join(target_classes)}_segments")
+    with measure(timer, "export", len(clips)):
+        saved_clips = export_segments(
+            input_video_path, clips, seg_output_folder, '-'.join(target_classes), export_mode)
+
+    saved_segments = []
+    for clip in saved_clips:
+        for seg in clip["members"]:
+            seg.update(
+                path=clip["path"],
+                expanded_start=clip["expanded_start"],
+                expanded_end=clip["expanded_end"],
+                duration=clip["duration"],
+            )
+            saved_segments.append(seg)
+    saved_segments.sort(key=lambda x: x["original_start"])
+
+    # 目标总时长取自统计累加器，与叠加显示的数值同源
+    target_duration = stats.total_duration
+
+    print(f"目标 '{'-'.join(target_classes)}' 总出现时长: {target_duration:.2f}秒")
+    print(f"共保存 {len(saved_segments)} 个片段到 {output_folder}")
+    return target_duration, saved_segments, duration
+
+class _RunCheckpoint:
+    """\
+    detect_and_save_segments 的断点目录 <输出目录>/<类别>_checkpoint/：state.json 保存检测状态，
+    可视化视频与检测日志在每个断点处切分为分段文件，中断后只需重做最后一个断点之后的部分，
+    扫描结束时再合并为最终文件并删除整个目录。
+    """
+
+    def __init__(self, output_folder, name_prefix):
+        self.folder = os.path.join(output_folder, f"{name_prefix}_checkpoint")
+        self.state_path = os.path.join(self.folder, "state.json")
+
+    def load(self):
+        if not os.path.isfile(self.state_path):
+            return None
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, state):
+        # 先写临时文件再替换，进程在写入途中被杀也不会留下损坏的断点
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def part_path(self, name, index):
+        stem, ext = os.path.splitext(name)
+        return os.path.join(self.folder, f"{stem}.part{index:03d}{ext}")
+
+    def part_paths(self, name, num_parts):
+        return [self.part_path(name, i) for i in range(num_parts)]
+
+    def reset(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+        os.makedirs(self.folder)
+
+    def remove(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
 def detect_and_save_segments(
     input_video_path,
     output_folder,
@@ -55,157 +1017,947 @@ def detect_and_save_segments(
     pre_buffer_sec=2,
     post_buffer_sec=3,
     conf_threshold=0.25,
-    min_segment_duration=0.3
+    min_segment_duration=0.3,
+    batch_size=1,
+    pipeline=False,
+    queue_size=8,
+    detect_every_n=1,
+    export_mode="copy",
+    max_gap_sec=0.0,
+    merge_gap_sec=0.0,
+    visualize="full",
+    preview_scale=0.5,
+    preview_frame_step=5,
+    model=None,
+    weights=None,
+    device=None,
+    imgsz=None,
+    backend="pytorch",
+    parity_check=True,
+    track=False,
+    return_details=False,
+    detection_log="auto",
+    cache_dir=None,
+    checkpoint_interval_sec=None,
+    resume=False,
+    timing_report=True,
+    metrics_interval_sec=None,
+    preprocess=False,
+    roi=None,
+    frame_batches=None,
+    scene_gate=None,
+    scene_gate_max_skip=25,
+    frame_source="opencv",
+    decode_width=None,
+    decode_threads=0
 ):
+    """\
+    检测视频中的目标类别，导出可视化视频与目标片段。
+
+    batch_size: 每次送入 model.predict 的帧数。大于 1 时将连续解码的多帧合并为一次
+    推理调用，以摊薄 Ultralytics 的调度/预处理/NMS 开销（CPU 推理时收益明显）；
+    片段状态机、画框与写视频仍按帧序逐帧执行，结果与逐帧推理一致。
+
+    pipeline: 为 True 时启用 解码线程 → 推理(主线程) → 绘制/编码线程 的流水线，
+    各级之间用容量为 queue_size 的有界队列连接（队列满时上游阻塞）。解码与编码
+    大部分在释放 GIL 的原生代码中执行，可与推理重叠；帧序与片段结果与串行模式一致。
+
+    detect_every_n: 大于 1 时每 N 帧只推理一帧，期间的帧沿用上一次的检测结果；
+    一旦相邻两个采样帧的 has_target 不同，就对其间的帧补做逐帧推理，因此单次出现/消失
+    的片段边界仍精确到帧。误差范围：完全落在两个采样帧之间、短于 N 帧的出现或中断
+    可能被漏检或被并入相邻片段，即时长误差不超过 (N-1)/fps 秒每次。此时可视化视频中
+    的检测框为沿用结果。batch_size 在此模式下表示每次推理调用的采样帧数。
+
+    export_mode: 片段导出方式，"copy" 为 ffmpeg 流拷贝（关键帧对齐，不重编码），
+    "reencode" 为精确到帧的重编码，详见 export_segments。
+
+    max_gap_sec: 目标短暂消失不超过该时长时视为同一片段（在 min_segment_duration
+    过滤之前生效），见 SegmentTracker。
+    merge_gap_sec: 前后扩展后的片段间隔不超过该值（含重叠）时合并为一个文件导出，
+    None 表示不合并。合并不影响统计：返回的每个原始片段仍单独计数，path 与
+    expanded_start/expanded_end 指向其所在的合并文件。
+
+    visualize: 可视化视频的输出方式。
+      - "full": 原分辨率、逐帧绘制检测框与统计信息（默认）
+      - "preview": 低成本预览，每 preview_frame_step 帧取一帧、按 preview_scale 缩小后绘制
+      - "none": 仅统计，不绘制、不创建 VideoWriter，只产出片段与摘要
+
+    model: 已加载的 YOLO 模型，可在多次调用间复用；为 None 时通过 get_model 按
+    weights（权重路径或 "su-v1".."su-v4"、"xiaomi-v1" 等版本名，None 为 DEFAULT_WEIGHTS）、
+    device、imgsz 获取，同一进程内重复调用不会重复加载。传入 model 且启用 cache_dir 时须同时
+    给出生成该模型的 weights 与 backend，缓存键按它们计算。
+
+    backend: 推理后端，"pytorch"（默认）/ "onnx" / "openvino"。非 pytorch 后端首次使用时
+    将权重导出并缓存在 .pt 同目录；parity_check=True 时先从视频中抽取若干帧，
+    与 PyTorch 结果对比一次（见 check_backend_parity）。
+
+    track: 为 True 时使用 Ultralytics 跟踪（model.track）为每个目标实例分配 ID，
+    并统计每个实例的出现时间；需逐帧推理（detect_every_n=1）。
+    return_details: 为 True 时额外返回第 4 个值 {"classes": {...}, "tracks": [...]}，
+    即同一次扫描中各目标类别独立的片段时间线、时长、频次、面积占比及各跟踪实例统计，
+    可传给 generate_summary_report 写入摘要。
+
+    detection_log: 逐帧检测日志格式，"auto"（默认，有 pyarrow 时为 parquet，否则 jsonl）、
+    "parquet"、"jsonl"，None 不写。日志在检测过程中分块流式写入
+    <输出目录>/<类别>_detections.*，每条记录为一个目标框（帧号、时间、类别、置信度、框、跟踪 ID），
+    可用 detection_log.load_detection_log 读取后重新计算统计，无需再次推理。
+
+    cache_dir: 指定时以 DETECTION_CACHE_CONF_FLOOR 的低置信度下限推理全部类别，
+    并把原始逐帧检测保存到 <cache_dir>/<视频哈希>_<权重哈希>.*（扫描完整结束才生效）；
+    本次结果仍按 conf_threshold 与 target_classes 筛选，与不启用缓存一致。之后可用
+    resegment_from_cache 以不同阈值、最短片段时长、前后缓冲重新生成片段与摘要。需逐帧推理，
+    且不能与 track 同时使用。
+
+    checkpoint_interval_sec: 每隔这么多秒（墙钟时间）在 <输出目录>/<类别>_checkpoint/ 保存一次断点
+    （下一帧序号、进行中的片段、已完成片段、累计统计等），可视化视频与检测日志同时切分为分段文件，
+    进程崩溃或被杀时最多损失一个间隔的计算。resume: 为 True 时从同一输出目录的断点续跑（定位到
+    断点帧继续检测，已完成的分段保留），断点中的视频与检测参数须与本次调用一致；没有断点时从头开始。
+    扫描结束后合并分段并删除断点目录。跟踪状态无法保存，不能与 track 同时使用。
+
+    timing_report: 为 True（默认）时记录各阶段耗时——解码、预处理、推理、后处理（NMS 与目标框筛选）、
+    绘制、编码、片段导出，结束时写出 <输出目录>/<类别>_timing.json（各阶段总耗时、占比、
+    单帧 p50/p90/p99、有效 FPS、内存/显存峰值及瓶颈阶段），报告路径见 details 的 timing 字段。
+    预处理/推理/后处理取自 Ultralytics 结果的 speed。metrics_interval_sec: 每隔这么多秒向
+    <输出目录>/<类别>_metrics.jsonl 追加一条区间指标（区间 FPS、各阶段单帧均值、当前内存），
+    便于长时间运行时监控。
+
+    preprocess: 为 True 时在送入模型前显式完成 letterbox（见 preprocess.LetterboxPreprocessor）：
+    按推理尺寸（imgsz，未指定时为模型的 imgsz 或 640）等比缩放并填充到复用的缓冲区，
+    Ultralytics 不再对原图逐帧缩放，检测框映射回原图坐标后再用于画框与面积统计。
+    roi: (x1, y1, x2, y2) 或 "x1,y1,x2,y2"（原图像素），只检测该区域（如排除比分牌、台标叠加层），
+    指定时自动启用 preprocess。面积占比仍相对整帧计算。
+
+    frame_batches: 已解码的 (起始帧序号, 帧列表) 批次迭代器，给出时不再自行解码（见
+    detect_multi_sponsor 的共享解码）。帧可能被其他调用方共享，绘制时先复制；不支持断点续跑。
+
+    scene_gate: 场景变化门控阈值（见 scene_gate.SceneChangeGate，建议 4~12），None 不启用。
+    每帧推理前与上一个推理帧的灰度缩略图比较，变化低于阈值时沿用上一帧的检测结果，
+    连续沿用不超过 scene_gate_max_skip 帧；跳过比例写入计时报告与 details 的 scene_gate 字段。
+    需逐帧推理（detect_every_n=1），且不能与检测缓存同时使用（缓存需要每帧真实的检测）。
+
+    frame_source: 帧源，"opencv"（默认，cv2.VideoCapture）或 "ffmpeg"（见 frame_source.FFmpegFrameSource）。
+    ffmpeg 帧源以 decode_threads 个线程解码（0 为自动），经管道把帧读入循环复用的缓冲区；
+    decode_width 指定时在解码器中直接缩小到该宽度（高度按比例），之后的检测、ROI 坐标、
+    检测日志与可视化视频均以缩小后的尺寸为准，导出的片段仍取自原视频。多核机器上解码
+    不再与推理争抢同一个线程；单核时 ffmpeg 的像素格式转换反而更慢，建议保持默认。
+    decode_width 改变检测输入，不能与检测缓存同时使用。
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size 必须 >= 1: {batch_size}")
+    if queue_size < 1:
+        raise ValueError(f"queue_size 必须 >= 1: {queue_size}")
+    if detect_every_n < 1:
+        raise ValueError(f"detect_every_n 必须 >= 1: {detect_every_n}")
+    if preview_frame_step < 1 or not 0 < preview_scale <= 1:
+        raise ValueError(f"预览参数无效: preview_scale={preview_scale}, preview_frame_step={preview_frame_step}")
+    if export_mode not in ("copy", "reencode"):
+        raise ValueError(f"不支持的导出模式: {export_mode}")
+    if visualize not in ("full", "preview", "none"):
+        raise ValueError(f"不支持的可视化模式: {visualize}")
+    if track and detect_every_n != 1:
+        raise ValueError("跟踪模式需要逐帧推理（detect_every_n=1）")
+    if cache_dir is not None and (detect_every_n != 1 or track):
+        raise ValueError("检测缓存需要逐帧推理（detect_every_n=1）且不能与跟踪同时使用")
+    if track and (checkpoint_interval_sec is not None or resume):
+        raise ValueError("跟踪器状态无法保存到断点，跟踪模式不支持断点续跑")
+    if frame_batches is not None and (checkpoint_interval_sec is not None or resume):
+        raise ValueError("外部提供的帧批次无法定位到断点帧，不支持断点续跑")
+    if scene_gate is not None and (detect_every_n != 1 or cache_dir is not None):
+        raise ValueError("场景门控需要逐帧推理（detect_every_n=1），且不能与检测缓存同时使用")
+    if decode_width is not None and cache_dir is not None:
+        raise ValueError("decode_width 会改变检测输入，不能与检测缓存同时使用")
+    if cache_dir is not None and model is not None and weights is None:
+        raise ValueError("传入 model 时需同时给出其 weights（及 backend）才能使用检测缓存，否则无法确定缓存键")
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    if metrics_interval_sec is not None and metrics_interval_sec <= 0:
+        raise ValueError(f"metrics_interval_sec 必须 > 0: {metrics_interval_sec}")
+    roi = parse_roi(roi)
     os.makedirs(output_folder, exist_ok=True)
-    model = YOLO("./weights/su-v4.pt")
-    cap = cv2.VideoCapture(input_video_path)
-    if not cap.isOpened():
-        raise ValueError(f"无法打开视频文件: {input_video_path}")
-    
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if model is None:
+        if backend != "pytorch" and parity_check:
+            check_backend_parity(weights, backend, _sample_frames(input_video_path, PARITY_CHECK_FRAMES),
+                                 device, imgsz, conf_threshold)
+        model = get_model(weights, device, imgsz, backend=backend)
+    # 复用帧缓冲区时须覆盖所有仍可能被持有的帧：流水线模式下为解码队列中的批、解码线程正在填充的批、
+    # 正在推理的批，以及绘制队列与绘制线程中的帧；外部提供帧批次时不从这里解码。
+    # 预览模式每 preview_frame_step 帧才提交一帧绘制，绘制队列中的帧彼此相隔这么多帧，
+    # 最早一帧落后解码位置 (queue_size + 1) * preview_frame_step 帧
+    batch_len = batch_size * detect_every_n
+    if frame_batches is not None:
+        num_buffers = 0
+    elif pipeline:
+        render_step = preview_frame_step if visualize == "preview" else 1
+        num_buffers = batch_len * (queue_size + 2) + (queue_size + 1) * render_step
+    else:
+        num_buffers = batch_len
+    source = _open_frame_source(input_video_path, frame_source, decode_width, decode_threads, num_buffers)
+
+    fps = source.fps
+    total_frames = source.total_frames
     duration = total_frames / fps
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    width = source.width
+    height = source.height
     
     print(f"视频信息: {width}x{height}, {fps:.2f} FPS, 时长: {duration:.2f}秒")
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_path = os.path.join(output_folder, f"{'-'.join(target_classes)}_visulize_{timestamp}.mp4")
-    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    name_prefix = '-'.join(target_classes)
+
+    # 断点续跑：读取并校验断点；启用断点后各输出按断点切分为分段文件
+    run_params = {
+        "target_classes": list(target_classes),
+        "conf_threshold": conf_threshold,
+        "min_segment_duration": min_segment_duration,
+        "max_gap_sec": max_gap_sec,
+        "batch_size": batch_size,
+        "detect_every_n": detect_every_n,
+        "visualize": visualize,
+        "preview_scale": preview_scale,
+        "preview_frame_step": preview_frame_step,
+        "weights": str(weights),
+        "imgsz": imgsz,
+        "backend": backend,
+        "detection_log": detection_log,
+        "cache_dir": cache_dir,
+        "preprocess": bool(preprocess or roi),
+        "roi": list(roi) if roi else None,
+        "scene_gate": scene_gate,
+        "scene_gate_max_skip": scene_gate_max_skip if scene_gate is not None else None,
+        "frame_source": frame_source,
+        "decode_width": decode_width,
+    }
+    checkpoint = None
+    state = None
+    if checkpoint_interval_sec is not None or resume:
+        checkpoint = _RunCheckpoint(output_folder, name_prefix)
+        state = checkpoint.load() if resume else None
+        if state is None:
+            if resume:
+                print("未找到断点，从头开始检测")
+            checkpoint.reset()
+        else:
+            if (state["video"] != os.path.abspath(input_video_path)
+                    or state["video_size"] != os.path.getsize(input_video_path)):
+                raise ValueError(f"断点对应的视频与当前输入不一致: {state['video']}")
+            if state["params"] != run_params:
+                raise ValueError(f"断点的检测参数与本次调用不一致，无法续跑: {checkpoint.state_path}")
+            print(f"从断点续跑: {state['next_frame']}/{total_frames} 帧 (保存于 {state['saved_at']})")
+
+    # 可视化输出：完整 / 低分辨率低帧率预览 / 不输出
+    writer = None
+    vis_name = None
+    render_scale = 1.0
+    render_step = 1
+    if visualize != "none":
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if visualize == "preview":
+            render_scale = preview_scale
+            render_step = preview_frame_step
+            vis_name = f"{name_prefix}_visulize_preview_{timestamp}.mp4"
+        else:
+            vis_name = f"{name_prefix}_visulize_{timestamp}.mp4"
+        if state is not None:
+            vis_name = state["vis_name"]
+    out_size = (int(width * render_scale), int(height * render_scale))
 
     # 获取目标类别ID
     class_names = model.names
-    target_class_ids = [cid for cid, name in class_names.items() if name.lower() in [cls.lower() for cls in target_classes]]
-    if not target_class_ids:
-        raise ValueError(f"未找到目标类别: {target_classes}")
+    target_class_ids = _resolve_target_class_ids(class_names, target_classes)
     print(f"检测类别: {target_classes} (IDs: {target_class_ids})")
 
-    all_segments = []
-    in_segment = False
-    segment_start_time = 0
+    preprocessor = None
+    if preprocess or roi:
+        # 与模型推理尺寸一致，Ultralytics 内部不再缩放
+        infer_size = imgsz or (getattr(model, "overrides", None) or {}).get("imgsz") or 640
+        if isinstance(infer_size, (list, tuple)):
+            infer_size = max(infer_size)
+        preprocessor = LetterboxPreprocessor(infer_size, roi)
+        print(f"显式预处理: letterbox 到 {infer_size}" + (f", ROI {roi}" if roi else ""))
+    gate = SceneChangeGate(scene_gate, scene_gate_max_skip) if scene_gate is not None else None
+
+    stats = ExposureStats(duration, width * height)
+    tracker = SegmentTracker(min_segment_duration, max_gap_sec, stats)
+    breakdown = ExposureBreakdown(target_class_ids, class_names, duration, width * height,
+                                  min_segment_duration, max_gap_sec)
+    if track:
+        # 模型可能来自缓存并跟踪过其他视频，先清空跟踪器状态
+        for tracker_state in getattr(model.predictor, "trackers", None) or []:
+            tracker_state.reset()
+
+    log_path = None
+    log_writer = None
+    if detection_log is not None:
+        log_path = detection_log_path(output_folder, name_prefix, detection_log)
+        log_meta = {
+            "video": os.path.abspath(input_video_path),
+            "fps": fps,
+            "total_frames": total_frames,
+            "width": width,
+            "height": height,
+            "class_names": {str(cls_id): name for cls_id, name in class_names.items()},
+            "target_classes": list(target_classes),
+            "target_class_ids": [int(cls_id) for cls_id in target_class_ids],
+            "conf_threshold": conf_threshold,
+            "weights": str(weights),
+            "backend": backend,
+            "detect_every_n": detect_every_n,
+            "track": track,
+            "roi": list(roi) if roi else None,
+        }
+
+    # 启用缓存时以低阈值推理全部类别，写入缓存后再按本次的阈值与目标类别筛选
+    cache_path = None
+    cache_writer = None
+    infer_conf, infer_class_ids = conf_threshold, target_class_ids
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_key = get_detection_cache_key(input_video_path, weights, imgsz, roi, backend)
+        infer_conf = min(conf_threshold, DETECTION_CACHE_CONF_FLOOR)
+        infer_class_ids = list(class_names)
+        cache_path = os.path.join(cache_dir, f"{cache_key}.partial.{resolve_log_format('auto')}")
+        cache_meta = {
+            "video": os.path.abspath(input_video_path),
+            "video_sha256": file_sha256(input_video_path),
+            "fps": fps,
+            "total_frames": total_frames,
+            "width": width,
+            "height": height,
+            "class_names": {str(cls_id): name for cls_id, name in class_names.items()},
+            "conf_threshold": infer_conf,
+            "weights": str(weights),
+            "imgsz": imgsz,
+            "roi": list(roi) if roi else None,
+            "backend": backend,
+        }
+
+    part_index = state["num_parts"] if state is not None else 0
+
+    def part_path(path):
+        # 启用断点时写入断点目录中的当前分段，否则直接写最终文件
+        return path if checkpoint is None else checkpoint.part_path(os.path.basename(path), part_index)
+
+    def open_outputs():
+        nonlocal writer, log_writer, cache_writer
+        if vis_name is not None:
+            writer = cv2.VideoWriter(part_path(os.path.join(output_folder, vis_name)),
+                                     cv2.VideoWriter_fourcc(*"mp4v"), fps / render_step, out_size)
+        if log_path is not None:
+            log_writer = DetectionLogWriter(part_path(log_path), log_meta)
+        if cache_path is not None:
+            cache_writer = DetectionLogWriter(part_path(cache_path), cache_meta)
+
+    def close_outputs(footer=None):
+        try:
+            if writer is not None:
+                writer.release()
+        finally:
+            try:
+                if log_writer is not None:
+                    log_writer.close(footer)
+            finally:
+                if cache_writer is not None:
+                    cache_writer.close(footer)
+
+    open_outputs()
 
     last_log_time = time.time()
+    last_checkpoint_time = last_log_time
+    current_time_sec = 0
+    stopped = False
 
-    for frame_idx in range(total_frames):
-        ret, frame = cap.read()
-        if not ret:
-            break
+    overlay = None
+    if writer is not None:
+        overlay = OverlayRenderer(
+            _STATS_OVERLAY_LABELS,
+            origin=(int(10 * render_scale), int(50 * render_scale)),
+            line_spacing=int(50 * render_scale),
+            text_size=max(int(40 * render_scale), 8),
+        )
 
-        current_time = time.time()
-        if current_time - last_log_time > 5:
-            print(f"处理进度: {(frame_idx / total_frames) * 100:.1f}% ({frame_idx}/{total_frames})")
-            last_log_time = current_time
+    shared_frames = frame_batches is not None
 
-        current_time_sec = frame_idx / fps
-        results = model.predict(frame, conf=conf_threshold, verbose=False)
-        detections = results[0].boxes.data.cpu().numpy()
-
-        has_target = False
-        area = 0
-        for det in detections:
-            if len(det) >= 6 and int(det[5]) in target_class_ids:
-                has_target = True
-                x1, y1, x2, y2 = map(int, det[:4])
-                # print("x1, y1, x2, y2:", x1, y1, x2, y2)
-                area += (x2 - x1) * (y2 - y1)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # 改为绿色框
-                cv2.putText(frame, class_names[int(det[5])], (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                
-
-        # 判断是否进入或离开一个目标片段
-        if has_target and not in_segment:
-            segment_start_time = current_time_sec
-            in_segment = True
-        elif not has_target and in_segment:
-            segment_end_time = current_time_sec
-            if segment_end_time - segment_start_time >= min_segment_duration:
-                all_segments.append((segment_start_time, segment_end_time))
-            in_segment = False
-
-        # 实时显示统计信息
-        target_duration = sum(end - start for start, end in all_segments)
-        duration_ratio = (target_duration / duration) * 100 if duration > 0 else 0
-        
-        frame = cv2AddChineseText(frame, f"广告出现次数(Segments): {len(all_segments)}", (10, 50), (255, 0, 0), 40)
-        frame = cv2AddChineseText(frame, f"广告出现时长(Time): {target_duration:.1f}s", (10, 100), (255, 0, 0), 40)
-        frame = cv2AddChineseText(frame, f"广告出现时长占比(Time Ratio): {duration_ratio:.2f}%", (10, 150), (255, 0, 0), 40)
-        # print("area,width,height:", area/(width*height))
-        frame = cv2AddChineseText(frame, f"广告面积占比: {area/(width*height)*100:.1f}%", (10, 200), (255, 0, 0), 40)
-
-        writer.write(frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    def render_frame(item):
+        frame, boxes, overlay_stats = item
+        if shared_frames and render_scale == 1.0:
+            frame = frame.copy()  # 原尺寸绘制会改写帧，共享的帧先复制
+        with measure(timer, "overlay"):
+            drawn = _draw_frame(frame, boxes, class_names, overlay, overlay_stats, render_scale)
+        with measure(timer, "encode"):
+            writer.write(drawn)
+
+    last_det = (False, 0, [])
+    inferred_frames = 0
+    processed_frames = 0
+    start_frame = 0
+    if state is not None:
+        tracker.load_state_dict(state["tracker"])
+        breakdown.load_state_dict(state["breakdown"])
+        last_det = tuple(state["last_det"])
+        inferred_frames = state["inferred_frames"]
+        processed_frames = state["processed_frames"]
+        current_time_sec = state["current_time_sec"]
+        start_frame = state["next_frame"]
+        source.seek(start_frame)
+        if gate is not None:
+            gate.checked, gate.skipped = state["scene_gate"]
+
+    # 计时从扫描开始，不含模型加载与后端校验
+    timer = StageTimer() if timing_report or metrics_interval_sec is not None else None
+    metrics_file = None
+    last_metrics_time = time.time()
+    if metrics_interval_sec is not None:
+        # 追加写入，断点续跑时保留之前的区间指标
+        metrics_file = open(os.path.join(output_folder, f"{name_prefix}_metrics.jsonl"), "a", encoding="utf-8")
+
+    background_decode = pipeline and not shared_frames
+    if not shared_frames:
+        frame_batches = _iter_frame_batches(source, batch_len, total_frames - start_frame, timer)
+    frame_sink = None
+    if background_decode:
+        frame_batches = _BackgroundIterator(frame_batches, queue_size)
+    if pipeline and writer is not None:
+        frame_sink = _BackgroundWorker(render_frame, queue_size)
+
+    loop_error = None
+    try:
+        for batch_offset, frames in frame_batches:
+            frame_idx = start_frame + batch_offset
+            current_time = time.time()
+            if current_time - last_log_time > 5:
+                print(f"处理进度: {(frame_idx / total_frames) * 100:.1f}% ({frame_idx}/{total_frames})")
+                last_log_time = current_time
+
+            # 整批帧合并推理，结果顺序与输入帧顺序一致
+            frame_dets, last_det, num_inferred = _detect_batch(
+                model, frames, infer_conf, infer_class_ids, detect_every_n, last_det, track, timer, preprocessor,
+                gate)
+            inferred_frames += num_inferred
+            if timer is not None:
+                timer.count_frames(len(frames))
+
+            for offset, (frame, det) in enumerate(zip(frames, frame_dets)):
+                current_time_sec = (frame_idx + offset) / fps
+                processed_frames += 1
+                if cache_writer is not None:
+                    cache_writer.add_frame(frame_idx + offset, current_time_sec, det[2])
+                    det = _select_target_boxes(det[2], target_class_ids, conf_threshold)
+                has_target, area, boxes = det
+
+                # 判断是否进入或离开一个目标片段
+                tracker.update(has_target, current_time_sec)
+                stats.record_frame(area)
+                breakdown.update(boxes, current_time_sec)
+                if log_writer is not None:
+                    log_writer.add_frame(frame_idx + offset, current_time_sec, boxes)
+
+                if writer is None or (frame_idx + offset) % render_step:
+                    continue
+
+                # 实时显示统计信息
+                item = (frame, boxes, stats.snapshot())
+                if frame_sink is not None:
+                    frame_sink.submit(item)
+                else:
+                    render_frame(item)
+
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    stopped = True
+                    break
+            if stopped:
+                break
+
+            if metrics_file is not None and time.time() - last_metrics_time >= metrics_interval_sec:
+                metrics = timer.interval_metrics()
+                metrics["next_frame"] = frame_idx + len(frames)
+                metrics_file.write(json.dumps(metrics, ensure_ascii=False) + "\n")
+                metrics_file.flush()
+                stage_ms = ", ".join(f"{stage} {ms:.1f}ms" for stage, ms in metrics["stage_mean_ms"].items())
+                print(f"[指标] {metrics['interval_fps']:.1f} FPS, 单帧耗时: {stage_ms}, 内存: {metrics['rss_mb']} MB")
+                last_metrics_time = time.time()
+
+            if checkpoint_interval_sec is not None and time.time() - last_checkpoint_time >= checkpoint_interval_sec:
+                # 先让当前分段全部落盘，再记录断点并开始下一个分段
+                if frame_sink is not None:
+                    frame_sink.close()
+                close_outputs()
+                part_index += 1
+                checkpoint.save({
+                    "video": os.path.abspath(input_video_path),
+                    "video_size": os.path.getsize(input_video_path),
+                    "params": run_params,
+                    "saved_at": datetime.now().isoformat(timespec="seconds"),
+                    "next_frame": frame_idx + len(frames),
+                    "num_parts": part_index,
+                    "vis_name": vis_name,
+                    "tracker": tracker.state_dict(),
+                    "breakdown": breakdown.state_dict(),
+                    "last_det": list(last_det),
+                    "inferred_frames": inferred_frames,
+                    "processed_frames": processed_frames,
+                    "current_time_sec": current_time_sec,
+                    "scene_gate": [gate.checked, gate.skipped] if gate is not None else None,
+                })
+                open_outputs()
+                if frame_sink is not None:
+                    frame_sink = _BackgroundWorker(render_frame, queue_size)
+                last_checkpoint_time = time.time()
+    except BaseException as e:
+        loop_error = e
+        raise
+    finally:
+        # 分段日志与合并后的日志使用同一个结尾
+        footer = {"processed_frames": processed_frames, "complete": not stopped and loop_error is None}
+        # 每个资源各自在 try/finally 中关闭，前一步出错也不会让后面的文件与进程保持打开
+        try:
+            if background_decode:
+                frame_batches.close()
+        finally:
+            try:
+                if frame_sink is not None:
+                    try:
+                        frame_sink.close()
+                    except Exception as e:
+                        # 绘制线程的异常不覆盖检测循环中已经抛出的异常
+                        if loop_error is None:
+                            raise
+                        if e is not loop_error:
+                            print(f"绘制线程同时出错: {e}")
+            finally:
+                try:
+                    if metrics_file is not None:
+                        metrics_file.close()
+                finally:
+                    try:
+                        close_outputs(footer)
+                    finally:
+                        source.release()
+
+    cv2.destroyAllWindows()
+
+    if checkpoint is not None:
+        # 合并各分段为最终文件
+        num_parts = part_index + 1
+        if vis_name is not None:
+            concat_videos(checkpoint.part_paths(vis_name, num_parts), os.path.join(output_folder, vis_name))
+        if log_path is not None:
+            merge_detection_logs(checkpoint.part_paths(os.path.basename(log_path), num_parts), log_path, footer)
+        if cache_path is not None and not stopped:
+            merge_detection_logs(checkpoint.part_paths(os.path.basename(cache_path), num_parts), cache_path, footer)
+        checkpoint.remove()
+    if cache_path is not None and stopped and os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    if detect_every_n > 1 and processed_frames:
+        print(f"稀疏检测: 实际推理 {inferred_frames}/{processed_frames} 帧 "
+              f"({inferred_frames / processed_frames * 100:.1f}%)")
+    if gate is not None:
+        gate_report = gate.report()
+        print(f"场景门控: 跳过 {gate_report['skipped_frames']}/{gate_report['checked_frames']} 帧 "
+              f"({gate_report['skip_rate_percent']:.1f}%)，沿用上一帧检测结果")
 
     # 如果视频结束时还处于一个片段中，记得加上
-    if in_segment:
-        if current_time_sec - segment_start_time >= min_segment_duration:
-            all_segments.append((segment_start_time, current_time_sec))
+    all_segments = tracker.finish(current_time_sec)
+    details = breakdown.finish(current_time_sec, fps)
+    details["processed_frames"] = processed_frames
+    details["detection_log"] = log_path
+    details["scene_gate"] = gate.report() if gate is not None else None
+    if cache_path is not None and os.path.exists(cache_path):
+        final_cache_path = cache_path.replace(".partial.", ".")
+        os.replace(cache_path, final_cache_path)
+        print(f"已保存检测缓存: {final_cache_path}")
 
+    result = _save_segments(
+        input_video_path, output_folder, target_classes, all_segments, stats,
+        pre_buffer_sec, post_buffer_sec, merge_gap_sec, export_mode, timer)
+
+    details["timing"] = None
+    if timing_report:
+        timing_path = os.path.join(output_folder, f"{name_prefix}_timing.json")
+        report = timer.write_report(timing_path, {
+            "video": os.path.abspath(input_video_path),
+            "width": width,
+            "height": height,
+            "video_fps": fps,
+            "total_frames": total_frames,
+            "processed_frames": processed_frames,
+            "inferred_frames": inferred_frames,
+            "resumed_from_frame": start_frame,
+            "scene_gate": details["scene_gate"],
+            "params": dict(run_params, pipeline=pipeline, queue_size=queue_size, export_mode=export_mode,
+                           track=track, device=device),
+        })
+        shares = ", ".join(f"{stage} {s['share_percent']:.1f}%" for stage, s in report["stages"].items())
+        print(f"阶段耗时占比: {shares}")
+        print(f"有效处理速度: {report['fps']:.1f} FPS, 瓶颈阶段: {report['bottleneck']}, "
+              f"内存峰值: {report['peak_rss_mb']} MB，计时报告: {timing_path}")
+        details["timing"] = timing_path
+    if return_details:
+        return result + (details,)
+    return result
+
+def resegment_from_cache(
+    input_video_path,
+    output_folder,
+    target_classes,
+    cache_dir=None,
+    cache_path=None,
+    weights=DEFAULT_WEIGHTS,
+    imgsz=None,
+    pre_buffer_sec=2,
+    post_buffer_sec=3,
+    conf_threshold=0.25,
+    min_segment_duration=0.3,
+    max_gap_sec=0.0,
+    merge_gap_sec=0.0,
+    export_mode="copy",
+    return_details=False,
+    roi=None,
+    backend="pytorch"
+):
+    """\
+    基于 detect_and_save_segments(cache_dir=...) 保存的检测缓存重新生成片段与统计，不再推理。
+
+    缓存按视频内容哈希与权重哈希查找（也可直接给出 cache_path），其中保存了全部类别在低置信度
+    下限以上的逐帧检测；这里按新的 conf_threshold、target_classes 重新筛选，再按
+    min_segment_duration / max_gap_sec 重建时间线，按前后缓冲导出片段。结果与使用相同参数
+    直接运行 detect_and_save_segments 一致。返回值与 detect_and_save_segments 相同。
+    生成缓存时指定了 roi、非 pytorch 后端的，查找时需给出相同的 roi 与 backend。
+    """
+    if cache_path is None:
+        if cache_dir is None:
+            raise ValueError("需要指定 cache_dir 或 cache_path")
+        cache_path = find_detection_cache(
+            cache_dir, get_detection_cache_key(input_video_path, weights, imgsz, roi, backend))
+        if cache_path is None:
+            raise FileNotFoundError(f"未找到检测缓存: {input_video_path} (weights={weights}, backend={backend})")
+    start_time = time.time()
+    meta, columns = load_detection_log(cache_path)
+    if meta.get("video_sha256") and meta["video_sha256"] != file_sha256(input_video_path):
+        raise ValueError(f"检测缓存与视频内容不匹配: {cache_path}")
+    if conf_threshold < meta["conf_threshold"]:
+        raise ValueError(f"置信度阈值 {conf_threshold} 低于缓存的置信度下限 {meta['conf_threshold']}")
+    os.makedirs(output_folder, exist_ok=True)
+
+    fps = meta["fps"]
+    duration = meta["total_frames"] / fps
+    frame_area = meta["width"] * meta["height"]
+    num_frames = meta.get("processed_frames", meta["total_frames"])
+    class_names = {int(cls_id): name for cls_id, name in meta["class_names"].items()}
+    target_class_ids = _resolve_target_class_ids(class_names, target_classes)
+
+    # 向量化筛选后按帧号切分（缓存按帧序写入，frame 列有序）
+    mask = np.isin(columns["class_id"], target_class_ids) & (columns["conf"] > conf_threshold)
+    rows = np.column_stack([
+        columns[name][mask] for name in ("x1", "y1", "x2", "y2", "class_id", "track_id")
+    ]).astype(np.int64).tolist()
+    all_boxes = [row + [conf] for row, conf in zip(rows, columns["conf"][mask].tolist())]
+    bounds = np.searchsorted(columns["frame"][mask], np.arange(num_frames + 1)).tolist()
+
+    stats = ExposureStats(duration, frame_area)
+    tracker = SegmentTracker(min_segment_duration, max_gap_sec, stats)
+    breakdown = ExposureBreakdown(target_class_ids, class_names, duration, frame_area,
+                                  min_segment_duration, max_gap_sec)
+    current_time_sec = 0
+    for frame_idx in range(num_frames):
+        boxes = all_boxes[bounds[frame_idx]:bounds[frame_idx + 1]]
+        current_time_sec = frame_idx / fps
+        tracker.update(bool(boxes), current_time_sec)
+        stats.record_frame(sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2, *_ in boxes))
+        breakdown.update(boxes, current_time_sec)
+
+    all_segments = tracker.finish(current_time_sec)
+    details = breakdown.finish(current_time_sec, fps)
+    details["processed_frames"] = num_frames
+    details["detection_log"] = cache_path
+    print(f"基于检测缓存重新分析 {num_frames} 帧，耗时 {time.time() - start_time:.2f}秒 "
+          f"(conf_threshold={conf_threshold}, min_segment_duration={min_segment_duration})")
+
+    result = _save_segments(
+        input_video_path, output_folder, target_classes, all_segments, stats,
+        pre_buffer_sec, post_buffer_sec, merge_gap_sec, export_mode)
+    if return_details:
+        return result + (details,)
+    return result
+
+def _segments_from_runs(runs, fps, last_frame, min_segment_duration, max_gap_sec=0.0, stats=None):
+    """\
+    将按帧号记录的有目标区间 [start, end) 回放进 SegmentTracker，得到片段列表。
+
+    状态机只在“有目标”的首帧和“无目标”的帧上起作用，且中断是否超过 max_gap_sec
+    随时间单调，因此只需回放每段区间的首帧、其后的第一个无目标帧以及下一段开始前的
+    最后一个无目标帧，结果与逐帧更新完全一致。
+    """
+    tracker = SegmentTracker(min_segment_duration, max_gap_sec, stats)
+    for start, end in runs:
+        if start > 0:
+            tracker.update(False, (start - 1) / fps)
+        tracker.update(True, start / fps)
+        if end <= last_frame:
+            tracker.update(False, end / fps)
+    return tracker.finish(last_frame / fps)
+
+def _detect_shard(input_video_path, weights, device, imgsz, backend, start_frame, end_frame, target_classes,
+                  conf_threshold, batch_size, detect_every_n, num_threads):
+    """\
+    在工作进程中检测 [start_frame, end_frame) 范围内的帧。
+
+    返回 (有目标的帧区间列表 [(start, end), ...]（全局帧号，end 不含）, 实际处理的帧数)。
+    """
+    import torch
+    torch.set_num_threads(num_threads)
+    model = get_model(weights, device, imgsz, backend=backend)
+    target_class_ids = _resolve_target_class_ids(model.names, target_classes)
+
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频文件: {input_video_path}")
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    runs = []
+    run_start = None
+    last_det = (False, 0, [])
+    processed = 0
+    try:
+        for offset, frames in _iter_frame_batches(cap, batch_size * detect_every_n, end_frame - start_frame):
+            frame_dets, last_det, _ = _detect_batch(
+                model, frames, conf_threshold, target_class_ids, detect_every_n, last_det)
+            for i, (has_target, _, _) in enumerate(frame_dets):
+                frame_idx = start_frame + offset + i
+                if has_target and run_start is None:
+                    run_start = frame_idx
+                elif not has_target and run_start is not None:
+                    runs.append((run_start, frame_idx))
+                    run_start = None
+            processed += len(frames)
+    finally:
+        cap.release()
+    if run_start is not None:
+        runs.append((run_start, start_frame + processed))
+    return runs, processed
+
+def detect_and_save_segments_sharded(
+    input_video_path,
+    output_folder,
+    target_classes,
+    num_shards=None,
+    weights=DEFAULT_WEIGHTS,
+    device=None,
+    imgsz=None,
+    backend="pytorch",
+    parity_check=True,
+    pre_buffer_sec=2,
+    post_buffer_sec=3,
+    conf_threshold=0.25,
+    min_segment_duration=0.3,
+    batch_size=1,
+    detect_every_n=1,
+    export_mode="copy",
+    max_gap_sec=0.0,
+    merge_gap_sec=0.0
+):
+    """\
+    按时间将长视频切成 num_shards 段，在多个进程中并行检测后拼接结果，再统一导出片段。
+
+    各分片通过 CAP_PROP_POS_FRAMES 定位起始帧，只记录逐帧“有/无目标”的区间；拼接时
+    首尾相接的区间会合并，因此跨越分片边界的片段不会被拆开，max_gap_sec 与
+    min_segment_duration 也在拼接之后统一应用，片段结果与单进程逐帧扫描一致。
+    该模式只产出片段与统计（实时叠加的统计信息依赖全局进度，不生成可视化视频）。
+    num_shards 默认为 CPU 核数，CPU 线程在各进程间均分。参数含义同 detect_and_save_segments。
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size 必须 >= 1: {batch_size}")
+    if detect_every_n < 1:
+        raise ValueError(f"detect_every_n 必须 >= 1: {detect_every_n}")
+    if export_mode not in ("copy", "reencode"):
+        raise ValueError(f"不支持的导出模式: {export_mode}")
+    os.makedirs(output_folder, exist_ok=True)
+
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频文件: {input_video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     cap.release()
-    writer.release()
-    cv2.destroyAllWindows()
+    duration = total_frames / fps
 
-    if not all_segments:
-        print(f"未检测到目标类别: {target_classes}")
-        return 0.0, [], duration
+    if backend != "pytorch":
+        # 先在主进程中导出一次，避免各分片进程同时导出同一份文件
+        export_weights(weights, backend, imgsz)
+        if parity_check:
+            check_backend_parity(weights, backend, _sample_frames(input_video_path, PARITY_CHECK_FRAMES),
+                                 device, imgsz, conf_threshold)
 
-    # 保存视频片段
-    video_clip = VideoFileClip(input_video_path)
-    saved_segments = []
+    cpu_count = os.cpu_count() or 1
+    num_shards = max(1, min(num_shards or cpu_count, total_frames))
+    shard_len = -(-total_frames // num_shards)  # 向上取整
+    bounds = [(start, min(start + shard_len, total_frames)) for start in range(0, total_frames, shard_len)]
+    num_threads = max(1, cpu_count // len(bounds))
+    print(f"视频信息: {fps:.2f} FPS, 时长: {duration:.2f}秒，分 {len(bounds)} 段并行检测")
 
-    seg_output_folder = os.path.join(output_folder, f"{'-'.join(target_classes)}_segments")   
-    os.makedirs(seg_output_folder, exist_ok=True)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(bounds), mp_context=ctx) as pool:
+        futures = [
+            pool.submit(_detect_shard, input_video_path, weights, device, imgsz, backend, start, end, target_classes,
+                        conf_threshold, batch_size, detect_every_n, num_threads)
+            for start, end in bounds
+        ]
+        shard_results = [future.result() for future in futures]
 
-    for i, (start, end) in enumerate(all_segments):
-        expanded_start = max(0, start - pre_buffer_sec)
-        expanded_end = min(duration, end + post_buffer_sec)
-        
-        try:
-            # 修复方法名：subclipped -> subclip
-            segment_clip = video_clip.subclipped(expanded_start, expanded_end)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"{'-'.join(target_classes)}_{timestamp}_{i+1}_{expanded_start:.1f}s-{expanded_end:.1f}s.mp4"
-            output_path = os.path.join(seg_output_folder, output_filename)
-            
-            # 关键修复：禁用音频处理
-            segment_clip.write_videofile(
-                output_path, 
-                codec="libx264", 
-                audio=False,  # 禁用音频
-                fps=fps, 
-                logger=None
-            )
-            segment_clip.close()
-
-            saved_segments.append({
-                "path": output_path,
-                "original_start": start,
-                "original_end": end,
-                "expanded_start": expanded_start,
-                "expanded_end": expanded_end,
-                "duration": expanded_end - expanded_start
-            })
+    # 拼接：相邻分片首尾相接的区间合并为一段
+    runs = []
+    processed = 0
+    for shard_runs, shard_processed in shard_results:
+        for start, end in shard_runs:
+            if runs and runs[-1][1] == start:
+                runs[-1] = (runs[-1][0], end)
+            else:
+                runs.append((start, end))
+        processed += shard_processed
+    if processed < total_frames:
+        print(f"警告: 实际解码 {processed}/{total_frames} 帧")
+
+    stats = ExposureStats(duration)
+    all_segments = _segments_from_runs(runs, fps, max(processed - 1, 0), min_segment_duration, max_gap_sec, stats)
+    return _save_segments(
+        input_video_path, output_folder, target_classes, all_segments, stats,
+        pre_buffer_sec, post_buffer_sec, merge_gap_sec, export_mode)
+
+class _SerializedModel:
+    """让多个线程中的模型轮流推理：CPU 上同时推理会争抢同一组计算线程，总耗时反而更长"""
+
+    def __init__(self, model, lock):
+        self._model = model
+        self._lock = lock
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            return self._model.predict(*args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        with self._lock:
+            return self._model.track(*args, **kwargs)
+
+# 共享解码模式下由调用方统一决定、不能按赞助商单独设置的参数
+_SHARED_DECODE_KWARGS = ("batch_size", "detect_every_n", "queue_size", "frame_batches",
+                         "checkpoint_interval_sec", "resume", "frame_source", "decode_width", "decode_threads")
+
+def detect_multi_sponsor(
+    input_video_path,
+    sponsors,
+    batch_size=1,
+    detect_every_n=1,
+    queue_size=8,
+    return_details=False,
+    serialize_inference=True,
+    frame_source="opencv",
+    decode_width=None,
+    decode_threads=0,
+    **common_kwargs
+):
+    """\
+    同一场比赛覆盖多个赞助商时只解码一次视频，把每批帧分发给多个模型。
+
+    sponsors 为列表，每项是一个字典：weights（权重路径或版本名，如 "su-v4"、"xiaomi-v1"）、
+    target_classes、output_folder 必填，name 可选（用于日志），其余键（conf_threshold、imgsz、
+    roi、visualize 等）覆盖 common_kwargs 中的同名参数，均透传给 detect_and_save_segments。
+    每个赞助商在独立线程中用自己的模型推理，拥有各自的片段时间线、统计与输出目录；
+    解码在后台线程中完成一次，按 batch_size * detect_every_n 帧一批经容量为 queue_size 的
+    有界队列分发，最慢的模型决定整体速度。不支持断点续跑。
+    serialize_inference: 为 True（默认）时各模型轮流推理，其余线程同时进行筛选、绘制与编码；
+    多块 GPU 各跑一个模型时可设为 False 让推理并行。
+    frame_source、decode_width、decode_threads 决定共享的解码方式，含义同 detect_and_save_segments。
+
+    返回与 sponsors 顺序一致的列表，每项为对应 detect_and_save_segments 的返回值。
+    任一赞助商失败时，其余赞助商仍会完成，最后抛出第一个异常。
+    """
+    if not sponsors:
+        raise ValueError("sponsors 不能为空")
+    if batch_size < 1 or detect_every_n < 1 or queue_size < 1:
+        raise ValueError(f"参数无效: batch_size={batch_size}, detect_every_n={detect_every_n}, queue_size={queue_size}")
+    for key in _SHARED_DECODE_KWARGS:
+        if key in common_kwargs or any(key in sponsor for sponsor in sponsors):
+            raise ValueError(f"共享解码模式不支持单独设置参数: {key}")
+    for sponsor in sponsors:
+        missing = [key for key in ("weights", "target_classes", "output_folder") if key not in sponsor]
+        if missing:
+            raise ValueError(f"赞助商配置缺少字段 {missing}: {sponsor}")
+    sponsor_kwargs = []
+    for sponsor in sponsors:
+        kwargs = dict(common_kwargs)
+        kwargs.update({key: value for key, value in sponsor.items()
+                       if key not in ("name", "target_classes", "output_folder")})
+        sponsor_kwargs.append(kwargs)
+    # 同一进程内相同 (权重, device, imgsz, backend) 的模型是同一个对象，不能并行推理或各自跟踪
+    model_keys = [(os.path.abspath(resolve_weights_path(kw["weights"])), kw.get("device"), kw.get("imgsz"),
+                   kw.get("backend", "pytorch")) for kw in sponsor_kwargs if kw.get("model") is None]
+    if len(set(model_keys)) < len(model_keys) and (
+            not serialize_inference or any(kw.get("track") for kw in sponsor_kwargs)):
+        raise ValueError("多个赞助商使用同一模型时需 serialize_inference=True，且不能启用跟踪")
+
+    # 各赞助商同时持有同一批帧的引用，帧不能复用缓冲区
+    source = _open_frame_source(input_video_path, frame_source, decode_width, decode_threads)
+    total_frames = source.total_frames
+    names = [sponsor.get("name") or "-".join(sponsor["target_classes"]) for sponsor in sponsors]
+    print(f"共享解码: {len(sponsors)} 个模型 ({', '.join(names)})，共 {total_frames} 帧")
+
+    decode_timer = StageTimer()
+    broadcaster = _FrameBroadcaster(
+        _iter_frame_batches(source, batch_size * detect_every_n, total_frames, decode_timer), len(sponsors), queue_size)
+    results = [None] * len(sponsors)
+    errors = [None] * len(sponsors)
 
-            print(f"保存片段 {i+1}: {output_filename} ({expanded_end - expanded_start:.1f}秒)")
+    inference_lock = threading.Lock() if serialize_inference else None
+
+    def run_sponsor(index):
+        sponsor = sponsors[index]
+        kwargs = dict(sponsor_kwargs[index])
+        try:
+            if inference_lock is not None:
+                model = kwargs.get("model")
+                if model is None:
+                    # 与 detect_and_save_segments 自行加载时相同：非 pytorch 后端先做一致性校验
+                    backend = kwargs.get("backend", "pytorch")
+                    if backend != "pytorch" and kwargs.get("parity_check", True):
+                        check_backend_parity(kwargs["weights"], backend,
+                                             _sample_frames(input_video_path, PARITY_CHECK_FRAMES),
+                                             kwargs.get("device"), kwargs.get("imgsz"),
+                                             kwargs.get("conf_threshold", 0.25))
+                    model = get_model(kwargs["weights"], kwargs.get("device"), kwargs.get("imgsz"), backend=backend)
+                kwargs["model"] = _SerializedModel(model, inference_lock)
+            results[index] = detect_and_save_segments(
+                input_video_path, sponsor["output_folder"], sponsor["target_classes"],
+                batch_size=batch_size, detect_every_n=detect_every_n, queue_size=queue_size,
+                return_details=return_details, frame_batches=broadcaster.subscribe(index),
+                frame_source=frame_source, decode_width=decode_width, decode_threads=decode_threads, **kwargs)
         except Exception as e:
-            print(f"保存片段 {i+1} 时出错: {str(e)}")
-            continue
+            errors[index] = e
+            print(f"[{names[index]}] 检测失败: {e}")
+        finally:
+            broadcaster.close(index)
 
-    video_clip.close()
-    
-    # 计算目标总时长
-    target_duration = sum(end - start for start, end in all_segments)
-    
-    print(f"目标 '{'-'.join(target_classes)}' 总出现时长: {target_duration:.2f}秒")
-    print(f"共保存 {len(saved_segments)} 个片段到 {output_folder}")
-    return target_duration, saved_segments, duration
+    threads = [threading.Thread(target=run_sponsor, args=(i,), name=f"sponsor-{i}") for i in range(len(sponsors))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    broadcaster.join()
+    source.release()
+
+    decode_stats = decode_timer.report()["stages"].get("decode")
+    if decode_stats:
+        print(f"共享解码耗时: {decode_stats['total_sec']:.2f}秒 ({decode_stats['items']} 帧，"
+              f"{decode_stats['mean_ms']:.2f} ms/帧)，按模型分别解码需约 {decode_stats['total_sec'] * len(sponsors):.2f}秒")
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
 
-def generate_summary_report(target_classes, total_duration, segments, output_folder, duration):
-    """生成摘要报告"""
+def generate_summary_report(target_classes, total_duration, segments, output_folder, duration, details=None):
+    """生成摘要报告，details 为 detect_and_save_segments(return_details=True) 返回的分类别/分实例统计"""
     report_path = os.path.join(output_folder, f"{'-'.join(target_classes)}_summary.txt")
     
     with open(report_path, "w") as f:
@@ -226,10 +1978,72 @@ def generate_summary_report(target_classes, total_duration, segments, output_fol
         duration_ratio = (total_duration / duration) * 100 if duration > 0 else 0
         
         f.write(f"\n目标出现时长占比: {duration_ratio:.2f}%\n")
+
+        if details:
+            # 各类别独立统计（pdf_generate 按模板行“广告牌/产品”分别填充）
+            f.write("\n各类别统计:\n")
+            for name, cls_stats in details["classes"].items():
+                line = (f"  类别 {name}: 出现时长 {cls_stats['total_duration']:.2f}秒, "
+                        f"片段数 {cls_stats['num_segments']}, "
+                        f"时长占比 {cls_stats['time_ratio_percent']:.2f}%, "
+                        f"平均面积占比 {cls_stats['mean_area_ratio_percent']:.2f}%")
+                if cls_stats["first_appeared"] is not None:
+                    line += (f", 首次出现 {cls_stats['first_appeared']:.1f}s, "
+                             f"最后消失 {cls_stats['last_disappeared']:.1f}s")
+                f.write(line + "\n")
+
+            if details.get("tracks"):
+                f.write("\n跟踪目标统计:\n")
+                for track in details["tracks"]:
+                    f.write(f"  #{track['track_id']} {track['class']}: "
+                            f"{track['first_seen']:.1f}s - {track['last_seen']:.1f}s "
+                            f"(可见 {track['duration']:.1f}秒, {track['frames']}帧)\n")
     
+    write_summary_json(target_classes, total_duration, segments, output_folder, duration, details)
     print(f"已生成摘要报告: {report_path}")
     return report_path
 
+def write_summary_json(target_classes, total_duration, segments, output_folder, duration, details=None):
+    """\
+    写出与摘要文本内容对应的机器可读摘要 <类别>_summary.json，
+    pdf_generate 优先读取该文件而不再用正则解析摘要文本。
+    """
+    summary = {
+        "target_classes": list(target_classes),
+        "video_duration": duration,
+        "total_duration": total_duration,
+        "num_segments": len(segments),
+        "time_ratio_percent": (total_duration / duration) * 100 if duration > 0 else 0,
+        "first_appeared": min((seg["original_start"] for seg in segments), default=None),
+        "last_disappeared": max((seg["original_end"] for seg in segments), default=None),
+        "segments": [
+            {key: seg[key] for key in ("path", "original_start", "original_end",
+                                       "expanded_start", "expanded_end", "duration")}
+            for seg in segments
+        ],
+        "classes": None,
+        "tracks": None,
+        "processed_frames": None,
+        "detection_log": None,
+        "timing": None,
+    }
+    if details:
+        summary.update(
+            classes={
+                name: dict(cls_stats, segments=[list(seg) for seg in cls_stats["segments"]])
+                for name, cls_stats in details["classes"].items()
+            },
+            tracks=details.get("tracks"),
+            processed_frames=details.get("processed_frames"),
+            detection_log=details.get("detection_log"),
+            timing=details.get("timing"),
+        )
+
+    json_path = os.path.join(output_folder, f"{'-'.join(target_classes)}_summary.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return json_path
+
 if __name__ == "__main__":
     # 示例用法
     input_video = "test/output.mp4"
@@ -242,18 +2056,19 @@ if __name__ == "__main__":
     start_time = time.time()
     
     # 检测并保存片段
-    total_duration, saved_segments, duration = detect_and_save_segments(
+    total_duration, saved_segments, duration, details = detect_and_save_segments(
         input_video,
         output_folder,
         target_classes,
         pre_buffer_sec=2,  # 目标出现前保留2秒
         post_buffer_sec=3,  # 目标消失后保留3秒
-        min_segment_duration=0.5  # 明确指定最小片段持续时间
+        min_segment_duration=0.5,  # 明确指定最小片段持续时间
+        return_details=True  # 同时返回各类别独立统计
     )
     
     # 生成摘要报告
     if saved_segments:
-        generate_summary_report(target_classes, total_duration, saved_segments, output_folder, duration)
+        generate_summary_report(target_classes, total_duration, saved_segments, output_folder, duration, details)
     
     print(f"处理完成! 总耗时: {time.time() - start_time:.2f}秒")
     print(f"目标 '{', '.join(target_classes)}' 总出现时长: {total_duration:.2f}秒")
\ No newline at end of file
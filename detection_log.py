@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    # 可选依赖：未安装 pyarrow 时回退为 jsonl 列块格式
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+# 每条记录为一个检测框；无检测的帧不产生记录，总帧数见元数据
+LOG_COLUMNS = {
+    'frame': np.int64,
+    'time': np.float64,
+    'class_id': np.int32,
+    'conf': np.float32,
+    'x1': np.int32,
+    'y1': np.int32,
+    'x2': np.int32,
+    'y2': np.int32,
+    'track_id': np.int64,
+}
+
+LOG_FORMATS = ('auto', 'parquet', 'jsonl')
+
+# 检测缓存以较低的置信度下限保存全部类别，之后可按更高的阈值、任意目标类别重新分析
+DETECTION_CACHE_CONF_FLOOR = 0.05
+
+
+def resolve_log_format(fmt):
+    """\
+    @description 解析日志格式，auto 在安装了 pyarrow 时使用 parquet，否则使用 jsonl。
+    @param {str} fmt - auto / parquet / jsonl。
+    @returns {str} parquet 或 jsonl
+    """
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"不支持的检测日志格式: {fmt}")
+    if fmt == 'auto':
+        return 'parquet' if pa is not None else 'jsonl'
+    if fmt == 'parquet' and pa is None:
+        raise RuntimeError("写 parquet 检测日志需要 pyarrow，请先安装：pip install pyarrow")
+    return fmt
+
+
+def detection_log_path(output_folder, name_prefix, fmt):
+    """检测日志文件路径：<输出目录>/<类别前缀>_detections.parquet|.jsonl"""
+    return os.path.join(output_folder, f"{name_prefix}_detections.{resolve_log_format(fmt)}")
+
+
+class DetectionLogWriter:
+    """\
+    逐帧检测记录的流式写出器。记录先按列缓存，每 chunk_rows 条写出一块，
+    parquet 为一个 row group，jsonl 为一行 {列名: [值...]}；首块之前写入元数据
+    （fps、总帧数、分辨率、类别名、置信度阈值等），使日志可脱离视频单独重新分析。
+    """
+
+    def __init__(self, path, meta, chunk_rows=4096):
+        self.path = path
+        self.meta = meta
+        self.chunk_rows = chunk_rows
+        self.num_rows = 0
+        self._columns = {name: [] for name in LOG_COLUMNS}
+        self._pending = 0
+        if path.endswith('.parquet'):
+            resolve_log_format('parquet')
+            schema = pa.schema(
+                [(name, pa.from_numpy_dtype(dtype)) for name, dtype in LOG_COLUMNS.items()],
+                metadata={'meta': json.dumps(meta, ensure_ascii=False)},
+            )
+            self._parquet = pq.ParquetWriter(path, schema)
+            self._file = None
+        else:
+            self._parquet = None
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'meta': meta}, ensure_ascii=False) + '\n')
+
+    def add_frame(self, frame_idx, time_sec, boxes):
+        """记录一帧的检测框，boxes 每行为 [x1, y1, x2, y2, 类别 ID, 跟踪 ID, 置信度]"""
+        if not boxes:
+            return
+        columns = self._columns
+        for x1, y1, x2, y2, cls_id, track_id, conf in boxes:
+            columns['frame'].append(frame_idx)
+            columns['time'].append(time_sec)
+            columns['class_id'].append(cls_id)
+            columns['conf'].append(conf)
+            columns['x1'].append(x1)
+            columns['y1'].append(y1)
+            columns['x2'].append(x2)
+            columns['y2'].append(y2)
+            columns['track_id'].append(track_id)
+        self._pending += len(boxes)
+        if self._pending >= self.chunk_rows:
+            self.flush()
+
+    def add_columns(self, columns):
+        """按列追加一批记录（如合并分段日志时），columns 为 load_detection_log 返回的列字典"""
+        num_rows = len(columns['frame'])
+        if not num_rows:
+            return
+        for name in LOG_COLUMNS:
+            self._columns[name].extend(columns[name].tolist())
+        self._pending += num_rows
+        if self._pending >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        if self._parquet is not None:
+            arrays = {name: np.asarray(values, dtype=LOG_COLUMNS[name]) for name, values in self._columns.items()}
+            self._parquet.write_table(pa.table(arrays, schema=self._parquet.schema))
+        else:
+            self._file.write(json.dumps(self._columns) + '\n')
+        self.num_rows += self._pending
+        self._pending = 0
+        self._columns = {name: [] for name in LOG_COLUMNS}
+
+    def close(self, footer=None):
+        """写出剩余记录并关闭文件；footer 为结束时才知道的元数据（如实际处理帧数）"""
+        self.flush()
+        if self._parquet is not None:
+            if footer is not None:
+                self._parquet.add_key_value_metadata({'footer': json.dumps(footer, ensure_ascii=False)})
+            self._parquet.close()
+        elif self._file is not None:
+            if footer is not None:
+                self._file.write(json.dumps({'footer': footer}, ensure_ascii=False) + '\n')
+            self._file.close()
+
+
+def load_detection_log(path):
+    """\
+    @description 读取检测日志（parquet 或 jsonl），返回元数据与按列的 NumPy 数组。
+    @param {str} path - 日志路径。
+    @returns {(dict, dict)} meta（含结束时写入的 footer 字段）, columns（列名 -> ndarray，按写入顺序即帧序排列）
+    """
+    if path.endswith('.parquet'):
+        resolve_log_format('parquet')
+        table = pq.read_table(path)
+        meta = json.loads(table.schema.metadata[b'meta'].decode('utf-8'))
+        footer = (pq.read_metadata(path).metadata or {}).get(b'footer')
+        if footer:
+            meta.update(json.loads(footer.decode('utf-8')))
+        columns = {name: table.column(name).to_numpy().astype(dtype, copy=False) for name, dtype in LOG_COLUMNS.items()}
+        return meta, columns
+
+    meta = {}
+    chunks = {name: [] for name in LOG_COLUMNS}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if 'meta' in record:
+                meta.update(record['meta'])
+                continue
+            if 'footer' in record:
+                meta.update(record['footer'])
+                continue
+            for name in LOG_COLUMNS:
+                chunks[name].extend(record[name])
+    columns = {name: np.asarray(chunks[name], dtype=dtype) for name, dtype in LOG_COLUMNS.items()}
+    return meta, columns
+
+
+def merge_detection_logs(part_paths, path, footer=None):
+    """\
+    @description 将按断点切分的分段日志按顺序合并为一个文件，元数据取自第一个分段。
+    @param {list} part_paths - 分段日志路径（按帧序排列）。
+    @param {str} path - 合并后的日志路径，扩展名决定格式。
+    @param {dict|None} footer - 写入合并结果的结束元数据。
+    @returns {str} 合并后的日志路径
+    """
+    writer = None
+    try:
+        for part_path in part_paths:
+            meta, columns = load_detection_log(part_path)
+            if writer is None:
+                writer = DetectionLogWriter(path, meta)
+            writer.add_columns(columns)
+    finally:
+        if writer is not None:
+            writer.close(footer)
+    return path
+
+
+@lru_cache(maxsize=64)
+def _file_sha256(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    """文件内容的 SHA-256；同一进程内按 (路径, 修改时间, 大小) 缓存，避免重复读取大视频"""
+    st = os.stat(path)
+    return _file_sha256(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def detection_cache_key(video_sha256, weights_sha256, imgsz=None, roi=None, backend="pytorch"):
+    """检测缓存的键：视频内容哈希 + 模型哈希（非 pytorch 后端、指定推理尺寸、检测区域时一并计入）"""
+    key = f"{video_sha256[:16]}_{weights_sha256[:16]}"
+    if backend != "pytorch":
+        key += f"_{backend}"
+    if imgsz is not None:
+        key += f"_{imgsz}"
+    if roi is not None:
+        key += "_roi" + "-".join(str(v) for v in roi)
+    return key
+
+
+def find_detection_cache(cache_dir, key):
+    """\
+    @description 查找已完成的检测缓存文件。
+    @param {str} cache_dir - 缓存目录。
+    @param {str} key - detection_cache_key 的返回值。
+    @returns {str|None} 缓存路径，不存在时为 None
+    """
+    for fmt in ('parquet', 'jsonl'):
+        path = os.path.join(cache_dir, f"{key}.{fmt}")
+        if os.path.isfile(path):
+            return path
+    return None
@@ -0,0 +1,110 @@
+import subprocess
+
+import cv2
+import numpy as np
+
+FRAME_SOURCES = ('opencv', 'ffmpeg')
+
+
+class OpenCVFrameSource:
+    """\
+    帧源接口的默认实现（cv2.VideoCapture）。
+
+    帧源需提供 fps、total_frames、width、height（输出帧的尺寸）属性，以及
+    read() -> (ok, frame)、seek(frame_idx)、release() 方法，检测循环只通过这些接口取帧。
+    """
+
+    def __init__(self, path):
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise ValueError(f"无法打开视频文件: {path}")
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.total_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def read(self):
+        return self._cap.read()
+
+    def seek(self, frame_idx):
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+
+    def release(self):
+        self._cap.release()
+
+
+class FFmpegFrameSource:
+    """\
+    通过 ffmpeg 子进程解码的帧源：ffmpeg 以多线程解码（threads=0 为自动），可在解码器中
+    直接缩放到 decode_width（高度按比例取偶数），以 bgr24 原始帧经管道输出，
+    再用 readinto 写入预先分配的帧缓冲区，避免逐帧分配大数组。
+
+    num_buffers > 0 时循环复用这么多个缓冲区，第 num_buffers 次之后读到的帧会覆盖最早的帧，
+    调用方需保证届时不再持有它们（见 detect_and_save_segments 的计算）；0 表示每帧新分配。
+    ffmpeg 在第一次 read 时才启动，只读取属性时不产生子进程；seek 通过重启 ffmpeg 并以 -ss 精确定位实现。
+    """
+
+    def __init__(self, path, ffmpeg_exe, decode_width=None, threads=0, num_buffers=0):
+        probe = OpenCVFrameSource(path)
+        self.fps = probe.fps
+        self.total_frames = probe.total_frames
+        self.source_width, self.source_height = probe.width, probe.height
+        probe.release()
+
+        if decode_width is not None and decode_width < self.source_width:
+            self.width = int(decode_width) // 2 * 2
+            self.height = max(2, round(self.source_height * self.width / self.source_width / 2) * 2)
+        else:
+            self.width, self.height = self.source_width, self.source_height
+        self.path = path
+        self.ffmpeg_exe = ffmpeg_exe
+        self.threads = threads
+        self._frame_bytes = self.width * self.height * 3
+        self._buffers = [np.empty((self.height, self.width, 3), dtype=np.uint8) for _ in range(num_buffers)]
+        self._next_buffer = 0
+        self._proc = None
+        self._start_frame = 0
+
+    def _start(self, start_frame):
+        cmd = [self.ffmpeg_exe, "-hide_banner", "-loglevel", "error", "-nostdin", "-threads", str(self.threads)]
+        if start_frame > 0:
+            # 定位到第 start_frame 帧：输出时间戳不早于其前半帧的第一帧
+            cmd += ["-ss", f"{(start_frame - 0.5) / self.fps:.6f}"]
+        cmd += ["-i", self.path, "-map", "0:v:0", "-an", "-sn", "-vsync", "passthrough"]
+        if (self.width, self.height) != (self.source_width, self.source_height):
+            cmd += ["-vf", f"scale={self.width}:{self.height}:flags=bilinear"]
+        cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=self._frame_bytes)
+
+    def read(self):
+        if self._proc is None:
+            self._start(self._start_frame)
+        if self._buffers:
+            frame = self._buffers[self._next_buffer]
+            self._next_buffer = (self._next_buffer + 1) % len(self._buffers)
+        else:
+            frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        view = memoryview(frame.reshape(-1))
+        filled = 0
+        while filled < self._frame_bytes:
+            num_read = self._proc.stdout.readinto(view[filled:])
+            if not num_read:
+                return False, None
+            filled += num_read
+        return True, frame
+
+    def seek(self, frame_idx):
+        self._stop()
+        self._start_frame = frame_idx
+
+    def _stop(self):
+        if self._proc is None:
+            return
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.stdout.close()
+        self._proc.wait()
+        self._proc = None
+
+    def release(self):
+        self._stop()
@@ -0,0 +1,452 @@
+import os
+import json
+import math
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+from cut import (
+    DEFAULT_WEIGHTS, ExposureStats, SegmentTracker, _filter_target_boxes, _resolve_target_class_ids,
+    generate_summary_report, get_model, get_next_output_folder,
+)
+
+# 推理落后于读帧时，环形缓冲在 pre_buffer_sec 之外额外保留的秒数，用于补齐片段开头
+LIVE_LAG_SLACK_SEC = 2.0
+# 读帧线程与片段写入线程之间的队列长度（帧），写入落后超过该长度时读帧线程等待
+LIVE_WRITER_QUEUE_SIZE = 16
+# 环形缓冲中前置帧的 JPEG 压缩质量
+LIVE_RING_JPEG_QUALITY = 90
+
+
+class _LatestFrameSource:
+    """\
+    在后台线程中持续读取直播流（RTSP/HLS 等 URL，或不断追加写入的本地文件），只保留最新一帧，
+    推理跟不上时旧帧直接丢弃。每一帧（包括被丢弃的）都会交给 on_frame 回调，用于录制片段。
+
+    时间戳按读到的帧序号 / fps 计算。读取失败时每隔 reconnect_delay 秒重连（本地文件重新打开并
+    定位到已读帧数之后，以便读取新追加的内容），超过 idle_timeout 秒没有新帧即视为流结束。
+    realtime 为 True 时按 fps 节奏读取，用本地文件模拟直播；默认本地文件开启、URL 关闭。
+    """
+
+    def __init__(self, source, on_frame=None, realtime=None, reconnect_delay=1.0, idle_timeout=10.0):
+        self.source = source
+        self.is_file = os.path.exists(source)
+        self.realtime = self.is_file if realtime is None else realtime
+        self.on_frame = on_frame
+        self.reconnect_delay = reconnect_delay
+        self.idle_timeout = idle_timeout
+        self.read_frames = 0
+        self.finished = False
+
+        self._cap = cv2.VideoCapture(source)
+        if not self._cap.isOpened():
+            raise ValueError(f"无法打开视频源: {source}")
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        # 部分直播流不报告帧率
+        self.fps = fps if fps and math.isfinite(fps) and fps > 0 else 25.0
+
+        self._latest = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _reopen(self):
+        self._cap.release()
+        self._cap = cv2.VideoCapture(self.source)
+        if self.is_file and self._cap.isOpened():
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, self.read_frames)
+
+    def _run(self):
+        start_time = time.monotonic()
+        last_frame_time = start_time
+        try:
+            while not self._stop.is_set():
+                ok, frame = self._cap.read()
+                if not ok:
+                    if time.monotonic() - last_frame_time > self.idle_timeout:
+                        break
+                    self._stop.wait(self.reconnect_delay)
+                    self._reopen()
+                    continue
+                last_frame_time = time.monotonic()
+
+                frame_idx = self.read_frames
+                self.read_frames += 1
+                if self.on_frame is not None:
+                    self.on_frame(frame_idx, frame)
+                with self._cond:
+                    self._latest = (frame_idx, frame)
+                    self._cond.notify()
+
+                if self.realtime:
+                    delay = start_time + self.read_frames / self.fps - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+        finally:
+            self._cap.release()
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def get(self):
+        """取最新一帧 (帧序号, 帧)，上次取走之后读到的更早的帧被丢弃；流结束时返回 None"""
+        with self._cond:
+            while self._latest is None and not self.finished:
+                self._cond.wait()
+            item, self._latest = self._latest, None
+            return item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class _LiveClipRecorder:
+    """\
+    录制片段：读帧线程只把帧放入有界队列，由专用的写入线程维护环形缓冲并写文件，
+    编码与磁盘写入不会拖慢读帧。环形缓冲保留最近 pre_buffer_sec（另加 LIVE_LAG_SLACK_SEC）的帧，
+    以 JPEG（质量 LIVE_RING_JPEG_QUALITY）压缩保存，1080p 下约为原始帧的 1/20；
+    片段开始时连同缓冲一起写入，片段结束后再写 post_buffer_sec 才关闭文件。
+    扩展区间相互重叠的片段写入同一个文件（与 merge_expanded_segments 的默认行为一致），
+    不足 min_segment_duration 的片段对应的文件被删除。已完成的片段放入 finished_clips 队列。
+    start / end 与帧经同一队列按顺序处理，因此与直接在读帧线程中录制时看到的缓冲内容一致。
+    """
+
+    def __init__(self, seg_output_folder, name_prefix, fps, pre_buffer_sec, post_buffer_sec):
+        self.seg_output_folder = seg_output_folder
+        self.name_prefix = name_prefix
+        self.fps = fps
+        self.pre_buffer_sec = pre_buffer_sec
+        self.post_buffer_sec = post_buffer_sec
+        self.finished_clips = queue.Queue()
+        self._ring = deque(maxlen=int((pre_buffer_sec + LIVE_LAG_SLACK_SEC) * fps) + 1)
+        self._commands = queue.Queue(maxsize=LIVE_WRITER_QUEUE_SIZE)
+        self._error = None
+        self._writer = None
+        self._clip = None
+        self._close_at = None
+        self._clip_count = 0
+        self._timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(seg_output_folder, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def push(self, frame_idx, frame):
+        """读帧线程回调：把帧交给写入线程，队列满时等待写入线程追上"""
+        self._commands.put(("frame", frame_idx / self.fps, frame))
+
+    def start(self, segment_start):
+        """片段开始：新建文件并写入缓冲中的前置帧；上一个文件尚在写后置缓冲时直接续写"""
+        self._commands.put(("start", segment_start))
+
+    def end(self, segment_end, segment=None):
+        """片段结束：segment 为保留的 (开始, 结束)，过短被丢弃时为 None"""
+        self._commands.put(("end", segment_end, segment))
+
+    def flush(self):
+        """流结束时等待队列写完并关闭正在写入的文件（后置缓冲可能不足 post_buffer_sec）"""
+        self._commands.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            command = self._commands.get()
+            if command is None:
+                break
+            if self._error is not None:
+                # 出错后继续取走队列中的帧，避免读帧线程阻塞，错误在 flush 时抛出
+                continue
+            try:
+                getattr(self, f"_on_{command[0]}")(*command[1:])
+            except Exception as e:
+                self._error = e
+        try:
+            if self._error is None and self._writer is not None:
+                self._finalize()
+        except Exception as e:
+            self._error = e
+
+    def _on_frame(self, current_time_sec, frame):
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, LIVE_RING_JPEG_QUALITY])
+        if not ok:
+            raise ValueError(f"缓存帧编码失败: {current_time_sec:.2f}s")
+        self._ring.append((current_time_sec, encoded))
+        if self._writer is None:
+            return
+        self._writer.write(frame)
+        self._clip["expanded_end"] = current_time_sec
+        if self._close_at is not None and current_time_sec >= self._close_at:
+            self._finalize()
+
+    def _on_start(self, segment_start):
+        if self._writer is not None:
+            self._close_at = None
+            return
+        encoded_frames = [(t, f) for t, f in self._ring if t >= segment_start - self.pre_buffer_sec]
+        if not encoded_frames:
+            return
+        self._clip_count += 1
+        first_frame = cv2.imdecode(encoded_frames[0][1], cv2.IMREAD_COLOR)
+        height, width = first_frame.shape[:2]
+        partial_path = os.path.join(self.seg_output_folder, f".{self.name_prefix}_{self._clip_count}.partial.mp4")
+        self._writer = cv2.VideoWriter(partial_path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (width, height))
+        self._clip = {
+            "partial_path": partial_path,
+            "expanded_start": encoded_frames[0][0],
+            "expanded_end": encoded_frames[-1][0],
+            "members": [],
+        }
+        self._writer.write(first_frame)
+        for _, encoded in encoded_frames[1:]:
+            self._writer.write(cv2.imdecode(encoded, cv2.IMREAD_COLOR))
+
+    def _on_end(self, segment_end, segment):
+        if self._writer is None:
+            return
+        if segment is not None:
+            self._clip["members"].append(segment)
+        if not self._clip["members"]:
+            # 文件中只有被丢弃的过短片段
+            self._finalize()
+        else:
+            self._close_at = segment_end + self.post_buffer_sec
+
+    def _finalize(self):
+        self._writer.release()
+        clip = self._clip
+        self._writer = None
+        self._clip = None
+        self._close_at = None
+        if not clip["members"]:
+            os.remove(clip["partial_path"])
+            return
+        output_filename = (f"{self.name_prefix}_{self._timestamp}_{self._clip_count}_"
+                           f"{clip['expanded_start']:.1f}s-{clip['expanded_end']:.1f}s.mp4")
+        clip["path"] = os.path.join(self.seg_output_folder, output_filename)
+        os.replace(clip.pop("partial_path"), clip["path"])
+        clip["duration"] = clip["expanded_end"] - clip["expanded_start"]
+        self.finished_clips.put(clip)
+
+
+class RollingExposureStats:
+    """\
+    最近 window_sec 秒内的曝光统计。直播模式下推理帧之间可能丢弃了若干帧，
+    每个推理样本按距上一个样本的时间间隔计入，间隔内视为状态不变。
+    """
+
+    def __init__(self, window_sec, frame_area=0):
+        self.window_sec = window_sec
+        self.frame_area = frame_area
+        self._samples = deque()  # (时间, 距上一样本的间隔, 是否出现, 面积占比)
+        self._last_time = None
+
+    def add(self, current_time_sec, has_target, area):
+        interval = 0.0 if self._last_time is None else current_time_sec - self._last_time
+        self._last_time = current_time_sec
+        area_ratio = area / self.frame_area if self.frame_area > 0 else 0.0
+        self._samples.append((current_time_sec, interval, has_target, area_ratio))
+        while self._samples[0][0] <= current_time_sec - self.window_sec:
+            self._samples.popleft()
+
+    def snapshot(self):
+        span = sum(interval for _, interval, _, _ in self._samples)
+        exposure = sum(interval for _, interval, has_target, _ in self._samples if has_target)
+        visible = [area_ratio for _, _, has_target, area_ratio in self._samples if has_target]
+        return {
+            "window_end": self._last_time,
+            "window_sec": span,
+            "exposure_sec": exposure,
+            "exposure_ratio_percent": exposure / span * 100 if span > 0 else 0.0,
+            "mean_area_ratio_percent": sum(visible) / len(visible) * 100 if visible else 0.0,
+            "inferred_frames": len(self._samples),
+        }
+
+
+def detect_stream(
+    source,
+    output_folder,
+    target_classes,
+    pre_buffer_sec=2,
+    post_buffer_sec=3,
+    conf_threshold=0.25,
+    min_segment_duration=0.3,
+    max_gap_sec=0.0,
+    window_sec=60,
+    report_every_sec=10,
+    max_duration_sec=None,
+    realtime=None,
+    idle_timeout_sec=10.0,
+    model=None,
+    weights=DEFAULT_WEIGHTS,
+    device=None,
+    imgsz=None,
+    backend="pytorch"
+):
+    """\
+    检测直播流（或不断追加写入的本地文件）中的目标，片段结束后立即导出。
+
+    与 detect_and_save_segments 不同，这里不依赖总帧数与视频时长：读帧线程只保留最新一帧，
+    推理跟不上时丢帧；读到的每一帧交给片段写入线程录制（前后缓冲与离线模式含义相同），结束即关闭文件；
+    每 report_every_sec 秒（流时间）输出一次最近 window_sec 秒的滚动统计，同时追加到
+    <类别>_live_stats.jsonl。流结束、超过 max_duration_sec 或按 Ctrl+C 后写出摘要。
+    返回值与 detect_and_save_segments 相同：(目标总时长, 已保存片段, 流时长)。
+    """
+    if model is None:
+        model = get_model(weights, device, imgsz, backend=backend)
+    class_names = model.names
+    target_class_ids = _resolve_target_class_ids(class_names, target_classes)
+    name_prefix = '-'.join(target_classes)
+    os.makedirs(output_folder, exist_ok=True)
+    print(f"检测类别: {target_classes} (IDs: {target_class_ids})")
+
+    frame_source = _LatestFrameSource(source, realtime=realtime, idle_timeout=idle_timeout_sec)
+    recorder = _LiveClipRecorder(os.path.join(output_folder, f"{name_prefix}_segments"), name_prefix,
+                                 frame_source.fps, pre_buffer_sec, post_buffer_sec)
+    frame_source.on_frame = recorder.push
+    frame_source.start()
+    print(f"视频源: {source}, {frame_source.fps:.2f} FPS")
+
+    stats = ExposureStats(0.0)
+    tracker = SegmentTracker(min_segment_duration, max_gap_sec, stats)
+    rolling = RollingExposureStats(window_sec)
+    stats_path = os.path.join(output_folder, f"{name_prefix}_live_stats.jsonl")
+    saved_segments = []
+    inferred_frames = 0
+    current_time_sec = 0.0
+    next_report_time = report_every_sec
+
+    def update_tracker(has_target, current_time_sec):
+        was_in_segment = tracker.in_segment
+        num_segments = len(tracker.segments)
+        gap_start = tracker.gap_start
+        if has_target is None:
+            tracker.finish(current_time_sec)
+        else:
+            tracker.update(has_target, current_time_sec)
+        if not was_in_segment and tracker.in_segment:
+            recorder.start(tracker.segment_start)
+        elif was_in_segment and not tracker.in_segment:
+            segment_end = gap_start if gap_start is not None else current_time_sec
+            segment = tracker.segments[-1] if len(tracker.segments) > num_segments else None
+            recorder.end(segment_end, segment)
+
+    def collect_clips():
+        while True:
+            try:
+                clip = recorder.finished_clips.get_nowait()
+            except queue.Empty:
+                return
+            for start, end in clip["members"]:
+                saved_segments.append({
+                    "original_start": start,
+                    "original_end": end,
+                    "expanded_start": clip["expanded_start"],
+                    "expanded_end": clip["expanded_end"],
+                    "duration": clip["duration"],
+                    "path": clip["path"],
+                })
+            print(f"保存片段 {len(saved_segments)}: {os.path.basename(clip['path'])} ({clip['duration']:.1f}秒)")
+
+    try:
+        with open(stats_path, "a", encoding="utf-8") as stats_file:
+            while True:
+                item = frame_source.get()
+                if item is None:
+                    break
+                frame_idx, frame = item
+                current_time_sec = frame_idx / frame_source.fps
+                if max_duration_sec is not None and current_time_sec >= max_duration_sec:
+                    break
+                if not stats.frame_area:
+                    stats.frame_area = rolling.frame_area = frame.shape[0] * frame.shape[1]
+
+                result = model.predict(frame, conf=conf_threshold, verbose=False)[0]
+                has_target, area, _ = _filter_target_boxes(result, target_class_ids)
+                inferred_frames += 1
+
+                stats.video_duration = current_time_sec
+                stats.record_frame(area)
+                rolling.add(current_time_sec, has_target, area)
+                update_tracker(has_target, current_time_sec)
+                collect_clips()
+
+                if current_time_sec >= next_report_time:
+                    next_report_time = current_time_sec + report_every_sec
+                    report = rolling.snapshot()
+                    report.update(
+                        frames_read=frame_source.read_frames,
+                        frames_dropped=frame_source.read_frames - inferred_frames,
+                        segments_in_window=sum(1 for _, end in tracker.segments if end > current_time_sec - window_sec),
+                        total_segments=stats.segment_count,
+                        total_duration=stats.total_duration,
+                    )
+                    stats_file.write(json.dumps(report) + "\n")
+                    stats_file.flush()
+                    print(f"[{current_time_sec:.0f}s] 最近 {report['window_sec']:.0f} 秒露出 {report['exposure_sec']:.1f}秒 "
+                          f"({report['exposure_ratio_percent']:.1f}%)，片段 {report['segments_in_window']} 个，"
+                          f"累计丢帧 {report['frames_dropped']}/{report['frames_read']}")
+    except KeyboardInterrupt:
+        print("收到中断，结束直播检测")
+    finally:
+        frame_source.close()
+
+    # 收尾：结束仍在进行的片段并关闭文件
+    update_tracker(None, current_time_sec)
+    recorder.flush()
+    collect_clips()
+
+    if frame_source.read_frames:
+        print(f"共读取 {frame_source.read_frames} 帧，推理 {inferred_frames} 帧 "
+              f"(丢帧 {(1 - inferred_frames / frame_source.read_frames) * 100:.1f}%)")
+    print(f"目标 '{name_prefix}' 总出现时长: {stats.total_duration:.2f}秒")
+    print(f"共保存 {len(saved_segments)} 个片段到 {output_folder}")
+    return stats.total_duration, saved_segments, current_time_sec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="直播流检测：丢帧保实时、滚动统计、片段结束即导出")
+    parser.add_argument("source", help="RTSP/HLS 地址，或不断追加写入的本地视频文件")
+    parser.add_argument("--output", default="output", help="基础输出目录（默认 output）")
+    parser.add_argument("--classes", nargs="+", default=["Billboard", "drinks"], help="目标类别")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="模型权重路径或版本名（su-v1..su-v4、xiaomi-v1）")
+    parser.add_argument("--device", default=None, help="推理设备，如 cpu、0")
+    parser.add_argument("--imgsz", type=int, default=None, help="推理尺寸")
+    parser.add_argument("--backend", choices=["pytorch", "onnx", "openvino"], default="pytorch", help="推理后端")
+    parser.add_argument("--conf", type=float, default=0.25, help="置信度阈值")
+    parser.add_argument("--min-segment-duration", type=float, default=0.5)
+    parser.add_argument("--max-gap", type=float, default=0.0, help="片段内允许的最长漏检秒数")
+    parser.add_argument("--window", type=float, default=60, help="滚动统计窗口（秒）")
+    parser.add_argument("--report-every", type=float, default=10, help="滚动统计输出间隔（秒）")
+    parser.add_argument("--max-duration", type=float, default=None, help="最长检测时长（秒），默认直到流结束")
+    parser.add_argument("--realtime", action="store_true", default=None, help="按帧率节奏读取本地文件（本地文件默认开启）")
+    args = parser.parse_args()
+
+    output_folder = get_next_output_folder(args.output)
+    total_duration, saved_segments, duration = detect_stream(
+        args.source,
+        output_folder,
+        args.classes,
+        conf_threshold=args.conf,
+        min_segment_duration=args.min_segment_duration,
+        max_gap_sec=args.max_gap,
+        window_sec=args.window,
+        report_every_sec=args.report_every,
+        max_duration_sec=args.max_duration,
+        realtime=args.realtime,
+        weights=args.weights,
+        device=args.device,
+        imgsz=args.imgsz,
+        backend=args.backend,
+    )
+    if saved_segments:
+        generate_summary_report(args.classes, total_duration, saved_segments, output_folder, duration)
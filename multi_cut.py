@@ -0,0 +1,70 @@
+import os
+import time
+import argparse
+
+from cut import MODEL_VARIANTS, detect_multi_sponsor, generate_summary_report, get_next_output_folder
+
+
+def parse_sponsor(values):
+    """\
+    @description 解析 --sponsor 参数：名称、权重与目标类别。
+    @param {list} values - [名称, 权重路径或版本名, 类别1, 类别2, ...]。
+    @returns {dict} 赞助商配置（不含输出目录）
+    """
+    if len(values) < 3:
+        raise argparse.ArgumentTypeError(f"--sponsor 需要 名称 权重 类别...: {values}")
+    name, weights, *classes = values
+    return {'name': name, 'weights': weights, 'target_classes': classes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="共享解码：一次解码视频，同时按多个赞助商的模型检测并分别导出")
+    parser.add_argument("video", help="输入视频路径")
+    parser.add_argument("--sponsor", nargs="+", action="append", required=True, metavar="ARG",
+                        help=f"名称 权重 类别...，可重复指定，如 --sponsor 速力奥 su-v4 Billboard drinks；"
+                             f"权重版本名: {', '.join(MODEL_VARIANTS)}")
+    parser.add_argument("--output", default="output", help="基础输出目录，每个赞助商输出到 outputN/<名称>/")
+    parser.add_argument("--device", default=None, help="推理设备，如 cpu、0")
+    parser.add_argument("--imgsz", type=int, default=None, help="推理尺寸")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--detect-every-n", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=8, help="解码与各模型之间的队列容量（批）")
+    parser.add_argument("--visualize", choices=["full", "preview", "none"], default="none")
+    parser.add_argument("--export-mode", choices=["copy", "reencode"], default="copy")
+    parser.add_argument("--min-segment-duration", type=float, default=0.5)
+    parser.add_argument("--frame-source", choices=["opencv", "ffmpeg"], default="opencv",
+                        help="帧源：opencv 或 ffmpeg 子进程多线程解码")
+    parser.add_argument("--decode-width", type=int, default=None, help="ffmpeg 帧源在解码时缩小到该宽度")
+    args = parser.parse_args()
+
+    sponsors = [parse_sponsor(values) for values in args.sponsor]
+    if len({s['name'] for s in sponsors}) != len(sponsors):
+        parser.error("赞助商名称不能重复")
+    output_folder = get_next_output_folder(args.output)
+    for sponsor in sponsors:
+        sponsor['output_folder'] = os.path.join(output_folder, sponsor['name'])
+
+    start_time = time.time()
+    results = detect_multi_sponsor(
+        args.video,
+        sponsors,
+        batch_size=args.batch_size,
+        detect_every_n=args.detect_every_n,
+        queue_size=args.queue_size,
+        return_details=True,
+        frame_source=args.frame_source,
+        decode_width=args.decode_width,
+        device=args.device,
+        imgsz=args.imgsz,
+        visualize=args.visualize,
+        export_mode=args.export_mode,
+        min_segment_duration=args.min_segment_duration,
+    )
+
+    for sponsor, (total_duration, saved_segments, duration, details) in zip(sponsors, results):
+        print(f"[{sponsor['name']}] 总出现时长 {total_duration:.2f}秒，{len(saved_segments)} 个片段 -> {sponsor['output_folder']}")
+        if saved_segments:
+            generate_summary_report(sponsor['target_classes'], total_duration, saved_segments,
+                                    sponsor['output_folder'], duration, details)
+
+    print(f"处理完成! 总耗时: {time.time() - start_time:.2f}秒")
@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+from functools import lru_cache
+
+SOFFICE_CANDIDATES = ('soffice', 'libreoffice')
+
+
+def find_soffice():
+    """\
+    @description 查找本地 LibreOffice 可执行文件（依次尝试 soffice、libreoffice）。
+    @returns {str|None} 可执行文件路径，未安装时为 None
+    """
+    for name in SOFFICE_CANDIDATES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+@lru_cache(maxsize=None)
+def find_uno_python(soffice):
+    """\
+    @description 查找能 `import uno` 的 Python 解释器，用于运行 UNO 桥接进程。
+    pip/venv 环境中当前解释器通常没有 uno，依次尝试当前解释器、LibreOffice 自带的 Python
+    （Windows/macOS 安装包）与系统 python3（Debian/Ubuntu 的 python3-uno）。
+    @param {str} soffice - LibreOffice 可执行文件路径。
+    @returns {str|None} 解释器路径，都不可用时为 None
+    """
+    program_dir = os.path.dirname(os.path.realpath(soffice))
+    candidates = [sys.executable,
+                  os.path.join(program_dir, 'python'), os.path.join(program_dir, 'python.exe'),
+                  '/usr/bin/python3', shutil.which('python3')]
+    for python in dict.fromkeys(c for c in candidates if c and os.path.isfile(c)):
+        try:
+            result = subprocess.run([python, '-c', 'import uno'], stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL, timeout=30)
+        except Exception:
+            continue
+        if result.returncode == 0:
+            return python
+    return None
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class OfficeWorker:
+    """\
+    一个常驻的 headless LibreOffice 转换实例，使用独立的用户配置目录（多个实例互不锁定）。
+
+    有可用的 UNO 解释器（见 find_uno_python）时，启动一次 soffice 监听本地 socket，并启动一个
+    UNO 桥接子进程（本模块以 --serve 运行）保持连接；之后每次转换经管道把任务发给桥接进程，
+    由它打开文档、导出 PDF，不再冷启动。单次请求超过 timeout 秒时杀掉实例，由
+    OfficeConverterPool 重启。uno_python 为 None 时只能每次调用 soffice --convert-to。
+    """
+
+    def __init__(self, soffice, uno_python=None, timeout=120, start_timeout=60):
+        self.soffice = soffice
+        self.uno_python = uno_python
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.conversions = 0
+        self._profile_dir = tempfile.mkdtemp(prefix='lo_profile_')
+        self._proc = None
+        self._bridge = None
+
+    def _base_cmd(self):
+        profile_url = 'file://' + os.path.abspath(self._profile_dir).replace(os.sep, '/')
+        return [self.soffice, f'-env:UserInstallation={profile_url}', '--headless', '--invisible',
+                '--nologo', '--nodefault', '--norestore', '--nolockcheck']
+
+    def start(self):
+        """启动常驻的 soffice 与 UNO 桥接进程，等待连接就绪（无 UNO 解释器时无需启动）"""
+        self.conversions = 0
+        if self.uno_python is None:
+            return
+        port = _free_port()
+        self._proc = subprocess.Popen(
+            self._base_cmd() + [f'--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._bridge = subprocess.Popen(
+            [self.uno_python, os.path.abspath(__file__), '--serve', str(port), str(self.start_timeout)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+        try:
+            self._request(None, self.start_timeout + 10)
+        except Exception as e:
+            self.stop()
+            raise RuntimeError(f'LibreOffice 转换实例启动失败: {e}')
+
+    def _request(self, message, timeout):
+        # 超时后杀掉实例与桥接进程，阻塞中的 readline 随管道关闭而返回
+        watchdog = threading.Timer(timeout, self._kill)
+        watchdog.start()
+        try:
+            if message is not None:
+                self._bridge.stdin.write(json.dumps(message, ensure_ascii=False) + '\n')
+                self._bridge.stdin.flush()
+            line = self._bridge.stdout.readline()
+        finally:
+            watchdog.cancel()
+        if not line:
+            raise RuntimeError('UNO 桥接进程无响应')
+        reply = json.loads(line)
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error') or 'UNO 请求失败')
+        return reply
+
+    def is_alive(self):
+        """健康检查：soffice 与桥接进程仍在运行，且经 UNO 连接的 ping 有响应"""
+        if self.uno_python is None:
+            return True
+        if self._proc is None or self._proc.poll() is not None:
+            return False
+        if self._bridge is None or self._bridge.poll() is not None:
+            return False
+        try:
+            self._request({'cmd': 'ping'}, 10)
+            return True
+        except Exception:
+            return False
+
+    def convert(self, input_docx_path, output_pdf_path):
+        """\
+        @description 将 DOCX 转换为 PDF，失败时抛出异常。
+        @param {str} input_docx_path
+        @param {str} output_pdf_path
+        @returns {None}
+        """
+        if self.uno_python is None:
+            self._convert_cli(input_docx_path, output_pdf_path)
+        else:
+            self._request({'cmd': 'convert', 'src': os.path.abspath(input_docx_path),
+                           'dst': os.path.abspath(output_pdf_path)}, self.timeout)
+        self.conversions += 1
+
+    def _convert_cli(self, input_docx_path, output_pdf_path):
+        # 先输出到本实例的临时目录（转换后文件名与 docx 同名），并发转换同名文档时互不覆盖
+        outdir = os.path.join(self._profile_dir, 'out')
+        os.makedirs(outdir, exist_ok=True)
+        subprocess.run(self._base_cmd() + ['--convert-to', 'pdf', '--outdir', outdir, input_docx_path],
+                       check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout)
+        generated_pdf = os.path.join(outdir, os.path.splitext(os.path.basename(input_docx_path))[0] + '.pdf')
+        if not os.path.exists(generated_pdf):
+            raise RuntimeError(f'LibreOffice 未生成 PDF: {input_docx_path}')
+        shutil.move(generated_pdf, output_pdf_path)
+
+    def _kill(self):
+        for proc in (self._bridge, self._proc):
+            if proc is not None and proc.poll() is None:
+                proc.kill()
+
+    def stop(self):
+        """关闭实例（先请求正常退出，超时再强制结束）"""
+        if self._bridge is not None:
+            try:
+                # 桥接进程收到 quit 后让 soffice 退出
+                self._bridge.stdin.write(json.dumps({'cmd': 'quit'}) + '\n')
+                self._bridge.stdin.close()
+            except Exception:
+                pass
+        for proc in (self._bridge, self._proc):
+            if proc is None:
+                continue
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        if self._bridge is not None:
+            self._bridge.stdout.close()
+        self._bridge = None
+        self._proc = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self._profile_dir, ignore_errors=True)
+
+
+class OfficeConverterPool:
+    """\
+    有界的 LibreOffice 转换实例池：size 个 OfficeWorker 经队列分配给调用方，并发转换数不超过 size。
+
+    实例在第一次使用时启动并在之后的转换中复用；每次转换前做健康检查，已退出或无响应的实例
+    自动重启；转换失败时重启该实例并重试一次；每个实例转换 max_conversions 次后重启一次，
+    避免长时间运行时内存持续增长。线程安全。找不到能 import uno 的 Python 时无法常驻，
+    创建时打印警告，之后每次转换各自冷启动 soffice。
+    """
+
+    def __init__(self, size=1, soffice=None, timeout=120, start_timeout=60, max_conversions=200):
+        if size < 1:
+            raise ValueError(f'size 必须 >= 1: {size}')
+        self.soffice = soffice or find_soffice()
+        if self.soffice is None:
+            raise RuntimeError('未找到 LibreOffice（soffice/libreoffice）')
+        self.uno_python = find_uno_python(self.soffice)
+        self.persistent = self.uno_python is not None
+        if not self.persistent:
+            print('警告: 未找到可 import uno 的 Python（Debian/Ubuntu 请安装 python3-uno），'
+                  'LibreOffice 无法常驻，每次转换都会冷启动 soffice')
+        self.max_conversions = max_conversions
+        self._workers = [OfficeWorker(self.soffice, self.uno_python, timeout, start_timeout) for _ in range(size)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._closed = False
+
+    def _ensure_ready(self, worker):
+        if worker.conversions >= self.max_conversions or not worker.is_alive():
+            worker.stop()
+            worker.start()
+
+    def convert(self, input_docx_path, output_pdf_path):
+        """\
+        @description 用池中空闲的实例将 DOCX 转换为 PDF（无空闲实例时等待）。
+        @param {str} input_docx_path
+        @param {str} output_pdf_path
+        @returns {bool} 成功与否
+        """
+        if self._closed:
+            raise RuntimeError('转换实例池已关闭')
+        worker = self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    self._ensure_ready(worker)
+                    worker.convert(input_docx_path, output_pdf_path)
+                    return True
+                except Exception as e:
+                    print(f'PDF 转换失败（第 {attempt + 1} 次）: {e}')
+                    worker.stop()
+            return False
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """关闭全部实例并删除其配置目录"""
+        self._closed = True
+        for worker in self._workers:
+            worker.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_converter_pool():
+    """\
+    @description 获取进程内共享的转换实例池（单实例，首次调用时创建，进程退出时关闭）。
+    @returns {OfficeConverterPool|None} 未安装 LibreOffice 时为 None
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            if find_soffice() is None:
+                return None
+            _default_pool = OfficeConverterPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def _serve(port, start_timeout):
+    """UNO 桥接进程：连接本地 soffice，逐行读取 JSON 任务（convert / ping / quit）并逐行回复结果"""
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    def props(**kwargs):
+        values = []
+        for name, value in kwargs.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            values.append(prop)
+        return tuple(values)
+
+    def reply(**kwargs):
+        sys.stdout.write(json.dumps(kwargs, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+    local_context = uno.getComponentContext()
+    resolver = local_context.ServiceManager.createInstanceWithContext(
+        'com.sun.star.bridge.UnoUrlResolver', local_context)
+    deadline = time.time() + start_timeout
+    while True:
+        try:
+            context = resolver.resolve(f'uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext')
+            break
+        except Exception as e:
+            if time.time() > deadline:
+                reply(ok=False, error=f'无法连接 soffice: {e}')
+                return
+            time.sleep(0.2)
+    desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+    reply(ok=True)
+
+    for line in sys.stdin:
+        message = json.loads(line)
+        if message['cmd'] == 'quit':
+            break
+        try:
+            if message['cmd'] == 'ping':
+                desktop.getFrames().getCount()
+            elif message['cmd'] == 'convert':
+                doc = desktop.loadComponentFromURL(
+                    uno.systemPathToFileUrl(message['src']), '_blank', 0, props(Hidden=True))
+                if doc is None:
+                    raise RuntimeError(f"LibreOffice 无法打开文档: {message['src']}")
+                try:
+                    doc.storeToURL(uno.systemPathToFileUrl(message['dst']), props(FilterName='writer_pdf_Export'))
+                finally:
+                    doc.close(True)
+            reply(ok=True)
+        except Exception as e:
+            reply(ok=False, error=str(e))
+    try:
+        desktop.terminate()
+    except Exception:
+        pass
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--serve':
+        _serve(int(sys.argv[2]), float(sys.argv[3]))
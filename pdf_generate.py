@@ -1,8 +1,16 @@
 import os
 import re
-import subprocess
+import glob
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+from office_converter import OfficeConverterPool, find_soffice, get_converter_pool
+
 try:
     # 延迟导入，环境可能未安装
     import docx
@@ -12,6 +20,12 @@ except Exception:
 
 # 字体注册放在使用 reportlab 的函数内部进行，避免未安装时在导入阶段报错
 
+# 模板数据行（左侧标签）对应的检测类别名（不区分大小写）
+ROW_CLASS_ALIASES = {
+    '广告牌': ('billboard',),
+    '产品': ('drinks', 'drink', 'product', 'bottle'),
+}
+
 def load_data_from_folder(input_folder):
     """\
     @description 从由 `cut.py` 产出的目录中加载数据。
@@ -97,7 +111,8 @@ def parse_summary_stats(summary_text):
       'avg_each_duration_sec': float,
       'first_appeared_sec': float | None,
       'last_disappeared_sec': float | None,
-      'time_ratio_percent': float | None
+      'time_ratio_percent': float | None,
+      'per_class': {类别名: 同上字段 + 'mean_area_ratio_percent'}（摘要含“各类别统计”时）
     }
     """
     if not summary_text:
@@ -108,6 +123,7 @@ def parse_summary_stats(summary_text):
             'first_appeared_sec': None,
             'last_disappeared_sec': None,
             'time_ratio_percent': None,
+            'per_class': {},
         }
 
     total_duration_sec = 0.0
@@ -155,6 +171,23 @@ def parse_summary_stats(summary_text):
 
     avg_each_duration_sec = (total_duration_sec / num_segments) if num_segments > 0 else 0.0
 
+    # 各类别独立统计（新版 cut.py 摘要中的“各类别统计”段落，旧摘要没有则为空）
+    per_class = {}
+    for match in re.finditer(
+            r"^\s*类别 (.+?): 出现时长 ([0-9.]+)秒, 片段数 (\d+), 时长占比 ([0-9.]+)%, 平均面积占比 ([0-9.]+)%"
+            r"(?:, 首次出现 ([0-9.]+)s, 最后消失 ([0-9.]+)s)?", summary_text, re.M):
+        cls_total = float(match.group(2))
+        cls_count = int(match.group(3))
+        per_class[match.group(1)] = {
+            'total_duration_sec': cls_total,
+            'num_segments': cls_count,
+            'avg_each_duration_sec': (cls_total / cls_count) if cls_count > 0 else 0.0,
+            'first_appeared_sec': float(match.group(6)) if match.group(6) else None,
+            'last_disappeared_sec': float(match.group(7)) if match.group(7) else None,
+            'time_ratio_percent': float(match.group(4)),
+            'mean_area_ratio_percent': float(match.group(5)),
+        }
+
     return {
         'total_duration_sec': total_duration_sec,
         'num_segments': num_segments,
@@ -162,9 +195,82 @@ def parse_summary_stats(summary_text):
         'first_appeared_sec': first_appeared_sec,
         'last_disappeared_sec': last_disappeared_sec,
         'time_ratio_percent': time_ratio_percent,
+        'per_class': per_class,
+    }
+
+
+def load_summary_json(input_folder):
+    """\
+    @description 读取 `cut.py` 写出的机器可读摘要 *_summary.json（取最新修改时间的一份）。
+    @param {str} input_folder - `cut.py` 输出的目录路径。
+    @returns {dict|None} 摘要内容，不存在或无法读取时为 None
+    """
+    try:
+        json_candidates = [
+            f for f in os.listdir(input_folder)
+            if f.endswith('_summary.json') and os.path.isfile(os.path.join(input_folder, f))
+        ]
+    except Exception:
+        return None
+    if not json_candidates:
+        return None
+    json_candidates.sort(key=lambda n: os.path.getmtime(os.path.join(input_folder, n)), reverse=True)
+    try:
+        with open(os.path.join(input_folder, json_candidates[0]), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading summary json: {e}")
+        return None
+
+
+def stats_from_summary_json(summary):
+    """\
+    @description 将 *_summary.json 转换为与 parse_summary_stats 相同结构的统计字典。
+    @param {dict} summary - load_summary_json 的返回值。
+    @returns {dict} 统计信息字典
+    """
+    total_duration_sec = summary.get('total_duration') or 0.0
+    num_segments = summary.get('num_segments') or 0
+
+    per_class = {}
+    for name, cls_stats in (summary.get('classes') or {}).items():
+        cls_total = cls_stats.get('total_duration') or 0.0
+        cls_count = cls_stats.get('num_segments') or 0
+        per_class[name] = {
+            'total_duration_sec': cls_total,
+            'num_segments': cls_count,
+            'avg_each_duration_sec': (cls_total / cls_count) if cls_count > 0 else 0.0,
+            'first_appeared_sec': cls_stats.get('first_appeared'),
+            'last_disappeared_sec': cls_stats.get('last_disappeared'),
+            'time_ratio_percent': cls_stats.get('time_ratio_percent'),
+            'mean_area_ratio_percent': cls_stats.get('mean_area_ratio_percent'),
+        }
+
+    return {
+        'total_duration_sec': total_duration_sec,
+        'num_segments': num_segments,
+        'avg_each_duration_sec': (total_duration_sec / num_segments) if num_segments > 0 else 0.0,
+        'first_appeared_sec': summary.get('first_appeared'),
+        'last_disappeared_sec': summary.get('last_disappeared'),
+        'time_ratio_percent': summary.get('time_ratio_percent'),
+        'per_class': per_class,
     }
 
 
+def _match_row_class(row_label, per_class):
+    """\
+    @description 按 ROW_CLASS_ALIASES 找到模板行标签对应的类别统计。
+    @param {str} row_label - 模板数据行左侧标签，如“广告牌”。
+    @param {dict} per_class - parse_summary_stats 返回的 per_class。
+    @returns {dict|None}
+    """
+    aliases = ROW_CLASS_ALIASES.get(row_label, ())
+    for name, cls_stats in per_class.items():
+        if name.lower() in aliases:
+            return cls_stats
+    return None
+
+
 def _format_mm_ss(seconds_value):
     """\
     @description 将秒数格式化为 mm:ss 或 ss.s 格式，便于在模板中展示。
@@ -192,6 +298,7 @@ def _format_mm_ss(seconds_value):
 def fill_docx_template(template_path, output_docx_path, stats):
     """\
     @description 使用统计数据填充 DOCX 模板中的表格。
+    摘要含各类别统计时，“广告牌/产品”等数据行分别填入对应类别的数值；否则只填第一条数据行。
     @param {str} template_path - 模板路径。
     @param {str} output_docx_path - 输出 DOCX 路径。
     @param {dict} stats - parse_summary_stats 的返回值。
@@ -206,13 +313,42 @@ def fill_docx_template(template_path, output_docx_path, stats):
     def norm(text):
         return (text or "").replace("\u00A0", " ").replace("\xa0", " ").strip()
 
-    # 将要填充的值（只填第一条数据行，模板中一般为“广告牌”那一行）
-    total_duration = stats.get('total_duration_sec') or 0.0
-    num_segments = stats.get('num_segments') or 0
-    avg_each = stats.get('avg_each_duration_sec') or 0.0
-    first_time = stats.get('first_appeared_sec')
-    last_time = stats.get('last_disappeared_sec')
-    time_ratio = stats.get('time_ratio_percent')
+    per_class = stats.get('per_class') or {}
+
+    # 露出次数占比的分母：优先使用外部带入的全局总数，其次为各类别次数之和
+    total_counts = None
+    if stats.get('total_counts_all_forms'):
+        try:
+            total_counts = float(stats.get('total_counts_all_forms'))
+        except Exception:
+            total_counts = None
+    if total_counts is None and per_class:
+        total_counts = float(sum(c['num_segments'] for c in per_class.values()))
+
+    def rows_to_fill(table):
+        """返回 [(行号, 该行统计)]：按类别逐行匹配，无匹配时回退为第一条数据行 + 整体统计"""
+        rows = []
+        if per_class:
+            for r in range(1, len(table.rows)):
+                row_stats = _match_row_class(norm(table.cell(r, 0).text), per_class)
+                if row_stats is not None:
+                    rows.append((r, row_stats))
+        if rows:
+            return rows
+        # 查找第一条数据行（通常左侧为“广告牌”）
+        for r in range(1, len(table.rows)):
+            if norm(table.cell(r, 0).text) in ('广告牌', '产品', ''):
+                return [(r, stats)]
+        return []
+
+    def count_ratio_of(row_stats, num_segments):
+        # 露出次数占比：该形式次数 / 总次数。
+        # 没有可比较的总数时（单一形式），按 100% 处理。
+        if row_stats is stats and stats.get('count_ratio_percent') is not None:
+            return stats.get('count_ratio_percent')
+        if total_counts is not None:
+            return (num_segments / total_counts * 100.0) if total_counts > 0 else 0.0
+        return 100.0 if num_segments > 0 else 0.0
 
     # 遍历表格，依据表头识别需要填充的表
     for table in doc.tables:
@@ -222,100 +358,60 @@ def fill_docx_template(template_path, output_docx_path, stats):
             header_cells = [norm(c.text) for c in table.rows[0].cells]
         except Exception:
             continue
+        if len(header_cells) < 5 or header_cells[0] != '权益':
+            continue
 
-        # 1.1 总露出时长
-        if len(header_cells) >= 5 and header_cells[0] == '权益' and '总露出时长' in header_cells[1]:
-            # 查找第一条数据行（通常左侧为“广告牌”）
-            for r in range(1, len(table.rows)):
-                first_col_text = norm(table.cell(r, 0).text)
-                if first_col_text in ('广告牌', '产品', ''):
-                    table.cell(r, 1).text = f"{total_duration:.1f}"
-                    # 周期平均/差值暂缺
-                    # table.cell(r, 2).text = ""
-                    # table.cell(r, 3).text = ""
-                    # 图例留空
-                    # table.cell(r, 4).text = ""
-                    break
-
-        # 1.2 平均每次露出时长
-        elif len(header_cells) >= 5 and header_cells[0] == '权益' and '平均每次时长' in header_cells[1]:
-            for r in range(1, len(table.rows)):
-                first_col_text = norm(table.cell(r, 0).text)
-                if first_col_text in ('广告牌', '产品', ''):
-                    table.cell(r, 1).text = f"{avg_each:.1f}"
-                    break
+        for r, row_stats in rows_to_fill(table):
+            total_duration = row_stats.get('total_duration_sec') or 0.0
+            num_segments = row_stats.get('num_segments') or 0
+            avg_each = row_stats.get('avg_each_duration_sec') or 0.0
+            first_time = row_stats.get('first_appeared_sec')
+            last_time = row_stats.get('last_disappeared_sec')
+            time_ratio = row_stats.get('time_ratio_percent')
 
-        # 1.3 露出频次
-        elif len(header_cells) >= 5 and header_cells[0] == '权益' and '露出频次' in header_cells[1]:
-            for r in range(1, len(table.rows)):
-                first_col_text = norm(table.cell(r, 0).text)
-                if first_col_text in ('广告牌', '产品', ''):
-                    table.cell(r, 1).text = str(num_segments)
-                    break
+            # 1.1 总露出时长（周期平均/差值暂缺，图例留空）
+            if '总露出时长' in header_cells[1]:
+                table.cell(r, 1).text = f"{total_duration:.1f}"
 
-        # 1.4 首末露出时间点（标题可能有意外空格，如“首次露出时 间点”）
-        elif len(header_cells) >= 6 and header_cells[0] == '权益' and ('首次露出' in header_cells[1] or '首次露出时间点' in header_cells[1]):
-            for r in range(1, len(table.rows)):
-                first_col_text = norm(table.cell(r, 0).text)
-                if first_col_text in ('广告牌', '产品', ''):
-                    table.cell(r, 1).text = _format_mm_ss(first_time)
-                    table.cell(r, 2).text = _format_mm_ss(last_time)
-                    break
-
-        # 1.5 露出类型分布
-        elif len(header_cells) >= 6 and header_cells[0] == '权益' and '露出总时长' in header_cells[1]:
-            for r in range(1, len(table.rows)):
-                first_col_text = norm(table.cell(r, 0).text)
-                if first_col_text in ('广告牌', '产品', ''):
-                    table.cell(r, 1).text = f"{total_duration:.1f}"
-                    if time_ratio is not None:
-                        table.cell(r, 2).text = f"{time_ratio:.2f}%"
-                    # 露出总次数
-                    table.cell(r, 3).text = str(num_segments)
-                    # 露出次数占比：该形式次数 / 总次数。
-                    # 当前仅填本行（单一形式）时，按 100% 处理（有全局总数时可在 stats 中带入覆盖）。
-                    count_ratio = None
-                    if isinstance(stats, dict):
-                        count_ratio = stats.get('count_ratio_percent')
-                        if count_ratio is None and stats.get('total_counts_all_forms'):
-                            try:
-                                total_counts = float(stats.get('total_counts_all_forms'))
-                                count_ratio = (num_segments / total_counts * 100.0) if total_counts > 0 else 0.0
-                            except Exception:
-                                count_ratio = None
-                    if count_ratio is None:
-                        count_ratio = 100.0 if num_segments > 0 else 0.0
-                    table.cell(r, 4).text = f"{count_ratio:.2f}%"
-                    break
+            # 1.2 平均每次露出时长
+            elif '平均每次时长' in header_cells[1]:
+                table.cell(r, 1).text = f"{avg_each:.1f}"
+
+            # 1.3 露出频次
+            elif '露出频次' in header_cells[1]:
+                table.cell(r, 1).text = str(num_segments)
+
+            # 1.4 首末露出时间点（标题可能有意外空格，如“首次露出时 间点”）
+            elif len(header_cells) >= 6 and '首次露出' in header_cells[1]:
+                table.cell(r, 1).text = _format_mm_ss(first_time)
+                table.cell(r, 2).text = _format_mm_ss(last_time)
+
+            # 1.5 露出类型分布
+            elif len(header_cells) >= 6 and '露出总时长' in header_cells[1]:
+                table.cell(r, 1).text = f"{total_duration:.1f}"
+                if time_ratio is not None:
+                    table.cell(r, 2).text = f"{time_ratio:.2f}%"
+                # 露出总次数
+                table.cell(r, 3).text = str(num_segments)
+                table.cell(r, 4).text = f"{count_ratio_of(row_stats, num_segments):.2f}%"
 
     doc.save(output_docx_path)
 
 
-def convert_docx_to_pdf(input_docx_path, output_pdf_path):
+def convert_docx_to_pdf(input_docx_path, output_pdf_path, converter=None):
     """\
     @description 调用本地 LibreOffice 将 DOCX 转换为 PDF。
+    默认使用进程内共享的常驻转换实例（见 office_converter），多份报告只冷启动一次 LibreOffice。
     @param {str} input_docx_path
     @param {str} output_pdf_path
+    @param {OfficeConverterPool|None} converter - 转换实例池，默认 get_converter_pool()。
     @returns {bool} 成功与否
     """
-    # 优先尝试 soffice
-    soffice_cmds = [
-        ['soffice', '--headless', '--convert-to', 'pdf', '--outdir', os.path.dirname(output_pdf_path), input_docx_path],
-        ['libreoffice', '--headless', '--convert-to', 'pdf', '--outdir', os.path.dirname(output_pdf_path), input_docx_path],
-    ]
-    for cmd in soffice_cmds:
-        try:
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            # 转换后文件名称通常以 .pdf 存放于 outdir，名称与 docx 同名
-            generated_pdf = os.path.join(os.path.dirname(output_pdf_path), os.path.splitext(os.path.basename(input_docx_path))[0] + '.pdf')
-            if os.path.exists(generated_pdf):
-                # 重命名/移动到目标路径
-                if os.path.abspath(generated_pdf) != os.path.abspath(output_pdf_path):
-                    os.replace(generated_pdf, output_pdf_path)
-                return True
-        except Exception:
-            continue
-    return False
+    if converter is None:
+        converter = get_converter_pool()
+    if converter is None:
+        return False
+    return converter.convert(input_docx_path, output_pdf_path)
 
 def generate_pdf_report(video_segments, summary_text, boxed_video_path, output_pdf_path, input_folder):
     """\
@@ -582,40 +678,78 @@ def generate_pdf_report(video_segments, summary_text, boxed_video_path, output_p
     print(f"PDF report generated successfully at {output_pdf_path}")
 
 
-def generate_from_template(input_folder, output_directory=None, template_path=None):
+def report_pdf_path(input_folder, output_directory=None):
     """\
-    @description 基于模板填充并输出 PDF（优先方案）。
+    @description 报告 PDF 的输出路径：<输出目录>/<目录名>_analysis_report.pdf，输出目录默认为输入目录的上级目录。
     @param {str} input_folder - `cut.py` 输出目录。
     @param {str|None} output_directory - 输出目录，可为空。
-    @param {str|None} template_path - DOCX 模板路径，默认 `test/template.docx`。
-    @returns {str} 输出的 PDF 路径
+    @returns {str}
     """
     folder_name = os.path.basename(input_folder.rstrip('/'))
     base_output_dir = os.path.dirname(input_folder) if output_directory is None else output_directory
+    return os.path.join(base_output_dir, f"{folder_name}_analysis_report.pdf")
+
+
+def fill_report_docx(input_folder, output_directory=None, template_path=None):
+    """\
+    @description 读取 `cut.py` 输出目录的统计并填充 DOCX 模板（generate_from_template 的第一步，不转换 PDF）。
+    @param {str} input_folder - `cut.py` 输出目录。
+    @param {str|None} output_directory - 输出目录，可为空。
+    @param {str|None} template_path - DOCX 模板路径，默认 `test/template.docx`。
+    @returns {(str, str)} 填充后的 DOCX 路径、应输出的 PDF 路径
+    """
+    folder_name = os.path.basename(input_folder.rstrip('/'))
+    output_pdf = report_pdf_path(input_folder, output_directory)
+    base_output_dir = os.path.dirname(output_pdf)
     os.makedirs(base_output_dir, exist_ok=True)
 
     template_path = template_path or os.path.join(os.path.dirname(__file__), 'test', 'template.docx')
     if not os.path.exists(template_path):
         raise FileNotFoundError(f"未找到模板: {template_path}")
 
-    video_segments, summary_text, _ = load_data_from_folder(input_folder)
-    stats = parse_summary_stats(summary_text)
+    _, summary_text, _ = load_data_from_folder(input_folder)
+    # 优先使用机器可读摘要，旧输出目录只有摘要文本时再用正则解析
+    summary = load_summary_json(input_folder)
+    stats = stats_from_summary_json(summary) if summary is not None else parse_summary_stats(summary_text)
 
-    # 生成 DOCX 并转换为 PDF
+    # 生成 DOCX，PDF 由 convert_report_docx 转换
     output_docx = os.path.join(base_output_dir, f"{folder_name}_filled.docx")
-    output_pdf = os.path.join(base_output_dir, f"{folder_name}_analysis_report.pdf")
 
     fill_docx_template(template_path, output_docx, stats)
+    return output_docx, output_pdf
+
 
-    ok = convert_docx_to_pdf(output_docx, output_pdf)
+def convert_report_docx(input_folder, output_docx, output_pdf, converter=None):
+    """\
+    @description 将填充好的 DOCX 转为 PDF，LibreOffice 不可用时保留 DOCX 并回退 ReportLab。
+    @param {str} input_folder - `cut.py` 输出目录（回退方案读取其中的片段与摘要）。
+    @param {str} output_docx - fill_report_docx 生成的 DOCX。
+    @param {str} output_pdf - 输出的 PDF 路径。
+    @param {OfficeConverterPool|None} converter - 转换实例池，默认进程内共享的实例池。
+    @returns {str} 输出的 PDF 路径
+    """
+    ok = convert_docx_to_pdf(output_docx, output_pdf, converter)
     if not ok:
         print("警告: 未检测到 LibreOffice/soffice，将保留 DOCX 并回退到 ReportLab PDF 方案。")
         # 回退旧方案
-        _, summary_text_fallback, boxed_video = load_data_from_folder(input_folder)
+        video_segments, summary_text_fallback, boxed_video = load_data_from_folder(input_folder)
         generate_pdf_report(video_segments, summary_text_fallback, boxed_video, output_pdf, input_folder)
 
     return output_pdf
 
+
+def generate_from_template(input_folder, output_directory=None, template_path=None, converter=None):
+    """\
+    @description 基于模板填充并输出 PDF（优先方案）。
+    @param {str} input_folder - `cut.py` 输出目录。
+    @param {str|None} output_directory - 输出目录，可为空。
+    @param {str|None} template_path - DOCX 模板路径，默认 `test/template.docx`。
+    @param {OfficeConverterPool|None} converter - DOCX 转 PDF 使用的转换实例池，默认进程内共享的实例池。
+    @returns {str} 输出的 PDF 路径
+    """
+    output_docx, output_pdf = fill_report_docx(input_folder, output_directory, template_path)
+    return convert_report_docx(input_folder, output_docx, output_pdf, converter)
+
 def main(input_folder, output_directory=None, prefer_template=True, template_path=None):
     """\
     @description 入口函数：优先用模板填充导出 PDF，若失败则回退 ReportLab。
@@ -637,25 +771,280 @@ def main(input_folder, output_directory=None, prefer_template=True, template_pat
         print(f"模板填充失败，回退 ReportLab 方案。原因: {e}")
 
     # 回退旧方案
-    folder_name = os.path.basename(input_folder.rstrip('/'))
-    pdf_filename = f"{folder_name}_analysis_report.pdf"
-    if output_directory is None:
-        output_pdf_path = os.path.join(os.path.dirname(input_folder), pdf_filename)
-    else:
+    output_pdf_path = report_pdf_path(input_folder, output_directory)
+    if output_directory is not None:
         os.makedirs(output_directory, exist_ok=True)
-        output_pdf_path = os.path.join(output_directory, pdf_filename)
 
     video_segments, summary_text, boxed_video_path = load_data_from_folder(input_folder)
     generate_pdf_report(video_segments, summary_text, boxed_video_path, output_pdf_path, input_folder)
     return output_pdf_path
 
+def _has_summary(folder):
+    return any(f.endswith('_summary.txt') for f in os.listdir(folder))
+
+
+def _expand_report_folder(folder):
+    # 目录本身含摘要时即为输入，否则取其下含摘要的子目录（multi_cut.py 的 outputN/<名称>/）
+    if _has_summary(folder):
+        return [folder]
+    return sorted(
+        os.path.join(folder, sub) for sub in os.listdir(folder)
+        if os.path.isdir(os.path.join(folder, sub)) and _has_summary(os.path.join(folder, sub))
+    )
+
+
+def discover_report_folders(sources):
+    """\
+    @description 解析批量输入，返回需要生成报告的 `cut.py` 输出目录（去重，保持顺序）。
+    - 目录：本身含 *_summary.txt 时即为输入；否则取其下的 outputN 子目录（按序号排序），
+      没有 outputN 子目录时取该目录本身；目录中没有摘要时取其下含摘要的子目录
+      （multi_cut.py 的 outputN/<名称>/）
+    - 含 * ? [ 的 glob 模式：匹配到的目录，同样展开多赞助商子目录
+    - 清单文件：每行一个目录，# 开头为注释，相对路径相对于清单文件所在目录
+    @param {list} sources - 输入列表。
+    @returns {list} 目录路径列表
+    """
+    folders = []
+    for source in sources:
+        if os.path.isdir(source):
+            numbered = []
+            if not _has_summary(source):
+                for name in os.listdir(source):
+                    m = re.fullmatch(r'output(\d+)', name)
+                    if m and os.path.isdir(os.path.join(source, name)):
+                        numbered.append((int(m.group(1)), name))
+            if not numbered:
+                folders.extend(_expand_report_folder(source))
+            for _, name in sorted(numbered):
+                folders.extend(_expand_report_folder(os.path.join(source, name)))
+        elif any(c in source for c in '*?['):
+            for path in sorted(glob.glob(source)):
+                if os.path.isdir(path):
+                    folders.extend(_expand_report_folder(path))
+        elif os.path.isfile(source):
+            manifest_dir = os.path.dirname(os.path.abspath(source))
+            with open(source, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    folders.append(line if os.path.isabs(line) else os.path.join(manifest_dir, line))
+        else:
+            raise FileNotFoundError(f"输入目录、glob 或清单不存在: {source}")
+
+    unique = []
+    seen = set()
+    for folder in folders:
+        folder = folder.rstrip('/')
+        key = os.path.abspath(folder)
+        if key not in seen:
+            seen.add(key)
+            unique.append(folder)
+    return unique
+
+
+def report_input_fingerprint(input_folder, template_path=None):
+    """\
+    @description 计算报告输入的指纹，用于判断上次生成后输入是否变化：摘要文件（*_summary.txt / *_summary.json）
+    按内容哈希，片段视频按文件名、大小与修改时间（不读取视频内容），另含模板的路径、大小与修改时间。
+    @param {str} input_folder - `cut.py` 输出目录。
+    @param {str|None} template_path - DOCX 模板路径，None 表示 ReportLab 方案。
+    @returns {str} sha256 十六进制串
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(input_folder)):
+        path = os.path.join(input_folder, name)
+        if name.endswith(('_summary.txt', '_summary.json')) and os.path.isfile(path):
+            digest.update(name.encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        elif name.endswith('_segments') and os.path.isdir(path):
+            for segment in sorted(os.listdir(path)):
+                st = os.stat(os.path.join(path, segment))
+                digest.update(f"{name}/{segment}:{st.st_size}:{st.st_mtime_ns}".encode('utf-8'))
+    if template_path is not None:
+        st = os.stat(template_path)
+        digest.update(f"template:{os.path.abspath(template_path)}:{st.st_size}:{st.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _report_state_path(output_pdf):
+    return os.path.splitext(output_pdf)[0] + '_state.json'
+
+
+def _load_report_fingerprint(output_pdf):
+    try:
+        with open(_report_state_path(output_pdf), 'r', encoding='utf-8') as f:
+            return json.load(f).get('fingerprint')
+    except Exception:
+        return None
+
+
+def _save_report_fingerprint(output_pdf, input_folder, fingerprint):
+    with open(_report_state_path(output_pdf), 'w', encoding='utf-8') as f:
+        json.dump({
+            'input': os.path.abspath(input_folder),
+            'fingerprint': fingerprint,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+        }, f, ensure_ascii=False, indent=2)
+
+
+def _prepare_report(input_folder, output_directory, template_path):
+    """\
+    在工作进程中读取统计并填充模板（template_path 为 None 时直接用 ReportLab 生成 PDF），
+    返回记录（失败时记录错误而不抛出）
+    """
+    record = {'input': input_folder, 'docx': None, 'status': 'ok', 'error': None, 'elapsed_sec': 0.0}
+    start_time = time.time()
+    try:
+        if template_path is None:
+            main(input_folder, output_directory, prefer_template=False)
+        else:
+            record['docx'], _ = fill_report_docx(input_folder, output_directory, template_path)
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = str(e)
+    record['elapsed_sec'] = time.time() - start_time
+    return record
+
+
+def generate_reports_batch(input_folders, output_directory=None, template_path=None, prefer_template=True,
+                           workers=2, converters=1, force=False):
+    """\
+    @description 批量生成报告：模板填充在进程池中并行，DOCX 转 PDF 交给 converters 个常驻 LibreOffice
+    实例（见 office_converter.OfficeConverterPool），填充完成一份即转换一份。输入指纹（见
+    report_input_fingerprint）与上次生成时相同且 PDF 仍存在的目录直接跳过。
+    @param {list} input_folders - `cut.py` 输出目录列表（可由 discover_report_folders 得到）。
+    @param {str|None} output_directory - 统一的输出目录，默认各报告输出到输入目录的上级目录。
+    @param {str|None} template_path - DOCX 模板路径，默认 `test/template.docx`。
+    @param {bool} prefer_template - 是否使用 DOCX 模板，False 时直接用 ReportLab 生成。
+    @param {int} workers - 模板填充的工作进程数。
+    @param {int} converters - 同时转换 PDF 的 LibreOffice 实例数。
+    @param {bool} force - 为 True 时忽略指纹，全部重新生成。
+    @returns {list} 与输入顺序一致的记录：input、pdf、status（generated / skipped / failed）、error、elapsed_sec
+    """
+    if workers < 1 or converters < 1:
+        raise ValueError(f"workers 与 converters 必须 >= 1: {workers}, {converters}")
+    if prefer_template:
+        template_path = template_path or os.path.join(os.path.dirname(__file__), 'test', 'template.docx')
+        if not os.path.exists(template_path):
+            print(f"未找到模板 {template_path}，将回退到 ReportLab PDF 方案。")
+            prefer_template = False
+    if not prefer_template:
+        template_path = None
+    if output_directory is not None:
+        names = [os.path.basename(folder.rstrip('/')) for folder in input_folders]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"输出到同一目录时报告会重名，请分别生成或不指定输出目录: {duplicates}")
+        os.makedirs(output_directory, exist_ok=True)
+
+    records = {}
+    pending = {}
+    for folder in input_folders:
+        output_pdf = report_pdf_path(folder, output_directory)
+        try:
+            fingerprint = report_input_fingerprint(folder, template_path)
+        except OSError as e:
+            records[folder] = {'input': folder, 'pdf': output_pdf, 'status': 'failed', 'error': str(e), 'elapsed_sec': 0.0}
+            continue
+        if not force and os.path.exists(output_pdf) and _load_report_fingerprint(output_pdf) == fingerprint:
+            records[folder] = {'input': folder, 'pdf': output_pdf, 'status': 'skipped', 'error': None, 'elapsed_sec': 0.0}
+        else:
+            pending[folder] = (output_pdf, fingerprint)
+    print(f"批量生成报告: {len(input_folders)} 个目录，{len(pending)} 个待生成，"
+          f"{sum(1 for r in records.values() if r['status'] == 'skipped')} 个输入未变化已跳过")
+
+    def finish(record):
+        folder = record['input']
+        output_pdf, fingerprint = pending[folder]
+        record = {'input': folder, 'pdf': output_pdf, 'status': record['status'], 'error': record['error'],
+                  'elapsed_sec': record['elapsed_sec']}
+        if record['status'] == 'ok':
+            record['status'] = 'generated'
+            _save_report_fingerprint(output_pdf, folder, fingerprint)
+            print(f"[{len(records) + 1}/{len(input_folders)}] 完成: {folder} -> {output_pdf} ({record['elapsed_sec']:.1f}秒)")
+        else:
+            print(f"[{len(records) + 1}/{len(input_folders)}] 失败: {folder} ({record['error']})")
+        records[folder] = record
+
+    def convert(record):
+        start_time = time.time()
+        try:
+            convert_report_docx(record['input'], record['docx'], pending[record['input']][0], converter)
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+        record['elapsed_sec'] += time.time() - start_time
+        return record
+
+    converter = None
+    if pending and prefer_template and find_soffice() is not None:
+        converter = OfficeConverterPool(size=converters)
+    # spawn 与 batch_cut.py 一致，工作进程不继承父进程的线程与 LibreOffice 连接
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as fill_pool, \
+                ThreadPoolExecutor(max_workers=converters) as convert_pool:
+            fill_futures = [fill_pool.submit(_prepare_report, folder, output_directory, template_path)
+                            for folder in pending]
+            convert_futures = []
+            for future in as_completed(fill_futures):
+                record = future.result()
+                if record['status'] == 'ok' and record['docx'] is not None:
+                    # 填充完成一份即转换一份，转换与其余目录的填充重叠进行
+                    convert_futures.append(convert_pool.submit(convert, record))
+                else:
+                    finish(record)
+            for future in as_completed(convert_futures):
+                finish(future.result())
+    finally:
+        if converter is not None:
+            converter.close()
+
+    ordered = [records[folder] for folder in input_folders]
+    generated = sum(1 for r in ordered if r['status'] == 'generated')
+    skipped = sum(1 for r in ordered if r['status'] == 'skipped')
+    print(f"批量生成完成: 生成 {generated} 个，跳过 {skipped} 个，失败 {len(ordered) - generated - skipped} 个")
+    return ordered
+
+
+def _batch_main(argv):
+    parser = argparse.ArgumentParser(
+        prog='pdf_generate.py --batch',
+        description="批量生成报告：发现多个 cut.py 输出目录并行生成，输入未变化的目录跳过")
+    parser.add_argument("sources", nargs="*", default=["output"],
+                        help="基础输出目录（取其下的 outputN）、glob 模式（如 'output/output1*'）或清单文件，默认 output")
+    parser.add_argument("--output-dir", default=None, help="统一的报告输出目录，默认输出到各输入目录的上级目录")
+    parser.add_argument("--template", default=None, help="DOCX 模板路径，默认 test/template.docx")
+    parser.add_argument("--no-template", action="store_true", help="不使用模板，直接用 ReportLab 生成")
+    parser.add_argument("--workers", type=int, default=2, help="模板填充的工作进程数")
+    parser.add_argument("--converters", type=int, default=1, help="同时转换 PDF 的 LibreOffice 实例数")
+    parser.add_argument("--force", action="store_true", help="忽略上次生成的记录，全部重新生成")
+    args = parser.parse_args(argv)
+
+    folders = discover_report_folders(args.sources)
+    if not folders:
+        print("未找到包含 *_summary.txt 的输出目录")
+        return 0
+    records = generate_reports_batch(folders, args.output_dir, template_path=args.template,
+                                     prefer_template=not args.no_template, workers=args.workers,
+                                     converters=args.converters, force=args.force)
+    return 1 if any(r['status'] == 'failed' for r in records) else 0
+
+
 if __name__ == "__main__":
     import sys
 
+    if len(sys.argv) >= 2 and sys.argv[1] == '--batch':
+        sys.exit(_batch_main(sys.argv[2:]))
+
     if len(sys.argv) < 2:
         print("Usage: python pdf_generate.py <input_folder> [output_directory] [--no-template] [--template /abs/path/to/template.docx]")
+        print("       python pdf_generate.py --batch [output | 'output/output*' | folders.txt ...] [--workers N] [--converters N] [--force]")
         print("Example: python pdf_generate.py ./yolo广告检测demo-产品文件夹")
         print("Example: python pdf_generate.py ./yolo广告检测demo-产品文件夹 ./reports")
+        print("Example: python pdf_generate.py --batch ./output")
         sys.exit(1)
 
     input_folder = sys.argv[1]
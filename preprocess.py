@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+
+
+def parse_roi(value):
+    """\
+    @description 解析感兴趣区域参数。
+    @param {str|list|tuple|None} value - "x1,y1,x2,y2" 字符串或 4 个数的序列（原图像素坐标），None 表示整帧。
+    @returns {tuple|None} (x1, y1, x2, y2)
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.replace(',', ' ').split()
+    try:
+        x1, y1, x2, y2 = (int(round(float(v))) for v in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"ROI 应为 x1,y1,x2,y2 四个数: {value}")
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"ROI 无效（需 x2 > x1 且 y2 > y1）: {(x1, y1, x2, y2)}")
+    return x1, y1, x2, y2
+
+
+class LetterboxPreprocessor:
+    """\
+    显式的推理前处理：裁剪感兴趣区域（可选）后等比缩放并填充到推理尺寸（letterbox），
+    写入预先分配、跨帧复用的缓冲区，再把推理得到的框映射回原图坐标。
+
+    缩放与填充方式与 Ultralytics 的 LetterBox 一致（INTER_LINEAR、填充值 114、填充到 stride 的
+    最小矩形并居中），推理尺寸与模型的 imgsz 相同时 Ultralytics 内部不会再次缩放，
+    检测结果与直接送入原图一致。ROI 之外（如比分牌、台标）的内容不参与检测。
+
+    prepare 返回的图像是缓冲区本身，下一次调用 prepare 时会被覆盖，只能在本批推理中使用。
+    """
+
+    def __init__(self, imgsz=640, roi=None, stride=32, pad_value=114):
+        self.imgsz = int(imgsz)
+        self.roi = parse_roi(roi)
+        self.stride = stride
+        self.pad_value = pad_value
+        self._frame_shape = None
+        self._buffers = []
+
+    def _setup(self, frame_shape):
+        height, width = frame_shape[:2]
+        if self.roi is None:
+            crop = (0, 0, width, height)
+        else:
+            x1, y1, x2, y2 = self.roi
+            crop = (max(0, x1), max(0, y1), min(width, x2), min(height, y2))
+            if crop[2] <= crop[0] or crop[3] <= crop[1]:
+                raise ValueError(f"ROI {self.roi} 不在画面 {width}x{height} 内")
+        crop_w, crop_h = crop[2] - crop[0], crop[3] - crop[1]
+
+        ratio = min(self.imgsz / crop_h, self.imgsz / crop_w)
+        new_w, new_h = round(crop_w * ratio), round(crop_h * ratio)
+        pad_w = (self.imgsz - new_w) % self.stride / 2
+        pad_h = (self.imgsz - new_h) % self.stride / 2
+        top, left = round(pad_h - 0.1), round(pad_w - 0.1)
+        out_h = new_h + top + round(pad_h + 0.1)
+        out_w = new_w + left + round(pad_w + 0.1)
+
+        self._frame_shape = frame_shape
+        self.crop = crop
+        self.ratio = ratio
+        self.offset = (left, top)
+        self.resized_size = (new_w, new_h)
+        self.input_shape = (out_h, out_w)
+        self._buffers = []
+
+    def _buffer(self, index):
+        # 填充区域在分配时写好，之后每帧只覆盖中间的缩放区域
+        while len(self._buffers) <= index:
+            self._buffers.append(np.full(self.input_shape + (3,), self.pad_value, dtype=np.uint8))
+        return self._buffers[index]
+
+    def prepare(self, frames):
+        """\
+        @description 对一批帧做 ROI 裁剪与 letterbox，结果写入复用的缓冲区。
+        @param {list} frames - BGR 原始帧列表（同一视频，尺寸相同）。
+        @returns {list} 与输入一一对应的推理输入图像（缓冲区视图，下次调用时被覆盖）
+        """
+        inputs = []
+        for i, frame in enumerate(frames):
+            if frame.shape != self._frame_shape:
+                self._setup(frame.shape)
+            x1, y1, x2, y2 = self.crop
+            left, top = self.offset
+            new_w, new_h = self.resized_size
+            buffer = self._buffer(i)
+            target = buffer[top:top + new_h, left:left + new_w]
+            src = frame[y1:y2, x1:x2]
+            if src.shape[:2] == (new_h, new_w):
+                np.copyto(target, src)
+            else:
+                cv2.resize(src, (new_w, new_h), dst=target, interpolation=cv2.INTER_LINEAR)
+            inputs.append(buffer)
+        return inputs
+
+    def map_boxes(self, detections):
+        """把推理输入坐标下的检测结果（前 4 列为 xyxy）映射回原图坐标，并裁剪到 ROI 范围内"""
+        if not len(detections):
+            return detections
+        detections = detections.copy()
+        left, top = self.offset
+        x1, y1, x2, y2 = self.crop
+        detections[:, [0, 2]] = ((detections[:, [0, 2]] - left) / self.ratio + x1).clip(x1, x2)
+        detections[:, [1, 3]] = ((detections[:, [1, 3]] - top) / self.ratio + y1).clip(y1, y2)
+        return detections
@@ -0,0 +1,53 @@
+import time
+import argparse
+
+from cut import DEFAULT_WEIGHTS, generate_summary_report, get_next_output_folder, resegment_from_cache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="基于检测缓存按新的阈值重新生成片段与摘要（不再推理）")
+    parser.add_argument("video", help="原始视频路径（用于查找缓存与导出片段）")
+    parser.add_argument("--cache-dir", default="cache", help="检测缓存目录（默认 cache）")
+    parser.add_argument("--cache", default=None, help="直接指定缓存文件，忽略 --cache-dir/--weights/--imgsz")
+    parser.add_argument("--output", default="output", help="基础输出目录（默认 output）")
+    parser.add_argument("--classes", nargs="+", default=["Billboard", "drinks"], help="目标类别")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="生成缓存时使用的模型权重路径或版本名")
+    parser.add_argument("--imgsz", type=int, default=None, help="生成缓存时使用的推理尺寸")
+    parser.add_argument("--roi", default=None, help="生成缓存时使用的检测区域 x1,y1,x2,y2")
+    parser.add_argument("--backend", choices=["pytorch", "onnx", "openvino"], default="pytorch",
+                        help="生成缓存时使用的推理后端")
+    parser.add_argument("--conf", type=float, default=0.25, help="置信度阈值，不低于缓存的置信度下限")
+    parser.add_argument("--min-segment-duration", type=float, default=0.5)
+    parser.add_argument("--pre-buffer", type=float, default=2, help="目标出现前保留秒数")
+    parser.add_argument("--post-buffer", type=float, default=3, help="目标消失后保留秒数")
+    parser.add_argument("--max-gap", type=float, default=0.0, help="片段内允许的最长漏检秒数")
+    parser.add_argument("--merge-gap", type=float, default=0.0, help="扩展后片段合并间隔")
+    parser.add_argument("--export-mode", choices=["copy", "reencode"], default="copy")
+    args = parser.parse_args()
+
+    output_folder = get_next_output_folder(args.output)
+    start_time = time.time()
+
+    total_duration, saved_segments, duration, details = resegment_from_cache(
+        args.video,
+        output_folder,
+        args.classes,
+        cache_dir=args.cache_dir,
+        cache_path=args.cache,
+        weights=args.weights,
+        imgsz=args.imgsz,
+        pre_buffer_sec=args.pre_buffer,
+        post_buffer_sec=args.post_buffer,
+        conf_threshold=args.conf,
+        min_segment_duration=args.min_segment_duration,
+        max_gap_sec=args.max_gap,
+        merge_gap_sec=args.merge_gap,
+        export_mode=args.export_mode,
+        return_details=True,
+        roi=args.roi,
+        backend=args.backend,
+    )
+
+    if saved_segments:
+        generate_summary_report(args.classes, total_duration, saved_segments, output_folder, duration, details)
+
+    print(f"处理完成! 总耗时: {time.time() - start_time:.2f}秒")
@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+
+class SceneChangeGate:
+    """\
+    推理前的场景变化门控：把帧缩成灰度缩略图，与上一个实际推理帧的缩略图比较，
+    变化分数低于阈值时认为画面未变（静止的远景、回放、字幕板等），直接沿用上一帧的检测结果。
+
+    分数为缩略图逐像素绝对差的最大值（0~255）。每个缩略图像素是原图一个块的平均值，
+    噪声与压缩伪影被平均掉，而局部出现的新目标（如画面一角出现的产品）仍会使对应块明显变化。
+    连续跳过 max_skip 帧后强制推理一次，限制沿用结果的时长。
+    """
+
+    def __init__(self, threshold=8.0, max_skip=25, thumb_size=(64, 36)):
+        if threshold < 0:
+            raise ValueError(f"场景门控阈值必须 >= 0: {threshold}")
+        if max_skip < 1:
+            raise ValueError(f"max_skip 必须 >= 1: {max_skip}")
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.thumb_size = thumb_size
+        self.checked = 0
+        self.skipped = 0
+        self._reference = None
+        self._run = 0
+
+    def _thumbnail(self, frame):
+        # 先用 INTER_LINEAR 采样到 4 倍缩略图尺寸，再按块平均：比直接对整帧 INTER_AREA 快一个数量级，
+        # 每个缩略图像素仍平均了块内 16 个采样点
+        width, height = self.thumb_size
+        small = cv2.resize(frame, (width * 4, height * 4), interpolation=cv2.INTER_LINEAR)
+        small = cv2.resize(small, self.thumb_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def should_infer(self, frame):
+        """判断该帧是否需要推理；需要时以它作为之后比较的参照帧"""
+        self.checked += 1
+        thumb = self._thumbnail(frame)
+        if (self._reference is not None and self._run < self.max_skip
+                and int(np.abs(thumb - self._reference).max()) < self.threshold):
+            self.skipped += 1
+            self._run += 1
+            return False
+        self._reference = thumb
+        self._run = 0
+        return True
+
+    def reset(self):
+        self._reference = None
+        self._run = 0
+
+    def report(self):
+        """跳过统计：检查帧数、跳过帧数与跳过比例"""
+        return {
+            "threshold": self.threshold,
+            "max_skip": self.max_skip,
+            "checked_frames": self.checked,
+            "skipped_frames": self.skipped,
+            "skip_rate_percent": round(self.skipped / self.checked * 100, 2) if self.checked else 0.0,
+        }
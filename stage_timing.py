@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+try:
+    # Windows 没有 resource 模块，内存峰值记为 None
+    import resource
+except ImportError:
+    resource = None
+
+# 报告中各阶段的固定顺序；gate 为推理前的场景变化判断，postprocess 含 NMS 与目标框筛选
+TIMING_STAGES = ("decode", "gate", "preprocess", "inference", "postprocess", "overlay", "encode", "export")
+
+
+def peak_rss_bytes():
+    """进程常驻内存的峰值（字节），无法获取时为 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes():
+    """当前常驻内存（字节），仅 Linux 下可用"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _cuda_peak_bytes():
+    # 不主动导入 torch：只有推理已加载 torch 且使用了 GPU 时才记录显存峰值
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available() or not torch.cuda.is_initialized():
+        return None
+    return torch.cuda.max_memory_allocated()
+
+
+def measure(timer, stage, items=1):
+    """timer 为 None 时不计时，便于在可选计时的函数中统一写 with measure(...)"""
+    return timer.measure(stage, items) if timer is not None else nullcontext()
+
+
+def _to_mb(num_bytes):
+    return round(num_bytes / (1 << 20), 1) if num_bytes is not None else None
+
+
+class StageTimer:
+    """\
+    分阶段计时器，可在解码、推理、绘制/编码等不同线程中同时记录。
+
+    每次 add 记录一个样本 (耗时, 处理项数)，如一次批量推理耗时 40ms、处理 4 帧；
+    报告中的百分位按样本的单项耗时（耗时 / 项数）计算，并给出各阶段总耗时占墙钟时间的比例。
+    流水线模式下各阶段在不同线程中重叠执行，占比之和可能超过 100%。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._interval_marks = {}
+        self.start_time = time.perf_counter()
+        self.frames = 0
+        self._interval_start = self.start_time
+        self._interval_frames = 0
+
+    def add(self, stage, seconds, items=1):
+        with self._lock:
+            self._samples.setdefault(stage, []).append((seconds, items))
+
+    @contextmanager
+    def measure(self, stage, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, items)
+
+    def count_frames(self, num_frames):
+        with self._lock:
+            self.frames += num_frames
+
+    @staticmethod
+    def _summarize(samples, wall_sec):
+        seconds = np.array([s for s, _ in samples], dtype=np.float64)
+        items = np.array([n for _, n in samples], dtype=np.float64)
+        per_item_ms = seconds / np.maximum(items, 1) * 1000
+        total_sec = float(seconds.sum())
+        return {
+            "calls": len(samples),
+            "items": int(items.sum()),
+            "total_sec": round(total_sec, 4),
+            "share_percent": round(total_sec / wall_sec * 100, 2) if wall_sec > 0 else 0.0,
+            "mean_ms": round(total_sec * 1000 / max(items.sum(), 1), 3),
+            "p50_ms": round(float(np.percentile(per_item_ms, 50)), 3),
+            "p90_ms": round(float(np.percentile(per_item_ms, 90)), 3),
+            "p99_ms": round(float(np.percentile(per_item_ms, 99)), 3),
+            "max_ms": round(float(per_item_ms.max()), 3),
+        }
+
+    def _ordered_stages(self):
+        return [s for s in TIMING_STAGES if s in self._samples] + sorted(set(self._samples) - set(TIMING_STAGES))
+
+    def report(self, extra=None):
+        """\
+        @description 生成完整的计时报告。
+        @param {dict|None} extra - 附加到报告中的信息（视频参数、运行模式等）。
+        @returns {dict} 含墙钟时间、有效 FPS、内存峰值与各阶段统计的字典
+        """
+        with self._lock:
+            wall_sec = time.perf_counter() - self.start_time
+            stages = {stage: self._summarize(self._samples[stage], wall_sec) for stage in self._ordered_stages()}
+            frames = self.frames
+        report = {
+            "wall_sec": round(wall_sec, 3),
+            "frames": frames,
+            "fps": round(frames / wall_sec, 2) if wall_sec > 0 else 0.0,
+            "peak_rss_mb": _to_mb(peak_rss_bytes()),
+            "cuda_peak_mb": _to_mb(_cuda_peak_bytes()),
+            "bottleneck": max(stages, key=lambda s: stages[s]["total_sec"]) if stages else None,
+            "stages": stages,
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+    def interval_metrics(self):
+        """自上次调用以来的区间指标（用于周期性输出）：区间 FPS、各阶段单帧平均耗时与当前内存"""
+        with self._lock:
+            now = time.perf_counter()
+            interval_sec = now - self._interval_start
+            frames = self.frames - self._interval_frames
+            stage_means = {}
+            for stage in self._ordered_stages():
+                samples = self._samples[stage]
+                recent = samples[self._interval_marks.get(stage, 0):]
+                self._interval_marks[stage] = len(samples)
+                if recent:
+                    stage_means[stage] = round(
+                        sum(s for s, _ in recent) * 1000 / max(sum(n for _, n in recent), 1), 3)
+            self._interval_start = now
+            self._interval_frames = self.frames
+            total_frames = self.frames
+        return {
+            "elapsed_sec": round(now - self.start_time, 3),
+            "interval_sec": round(interval_sec, 3),
+            "frames": total_frames,
+            "interval_fps": round(frames / interval_sec, 2) if interval_sec > 0 else 0.0,
+            "stage_mean_ms": stage_means,
+            "rss_mb": _to_mb(current_rss_bytes()),
+            "peak_rss_mb": _to_mb(peak_rss_bytes()),
+        }
+
+    def write_report(self, path, extra=None):
+        report = self.report(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
@@ -0,0 +1,122 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 合成视频：帧尺寸、帧率，以及各类别目标出现的帧区间（左闭右开）
+VIDEO_SIZE = (160, 120)
+VIDEO_FPS = 25.0
+VIDEO_FRAMES = 100
+CLASS_REGIONS = {
+    0: (10, 20, 60, 80),     # Billboard：左侧白块
+    1: (100, 20, 150, 80),   # drinks：右侧白块
+}
+CLASS_VISIBLE = {
+    0: [(10, 40), (42, 45), (60, 90)],
+    1: [(30, 36), (70, 95)],
+}
+# 替身模型输出的各类别置信度
+CLASS_CONF = {0: 0.9, 1: 0.5}
+# 顶部色带按二进制位（每位一个 20 像素宽的黑/白块）标记帧序号，用于核对绘制时拿到的是哪一帧
+INDEX_BAND_HEIGHT = 12
+INDEX_BIT_WIDTH = 20
+
+
+def frame_index_of(frame):
+    """从合成视频的帧中读出帧序号"""
+    bits = [frame[:INDEX_BAND_HEIGHT, i * INDEX_BIT_WIDTH:(i + 1) * INDEX_BIT_WIDTH].mean() > 128
+            for i in range(VIDEO_SIZE[0] // INDEX_BIT_WIDTH)]
+    return sum(1 << i for i, bit in enumerate(bits) if bit)
+
+
+def visible_classes(frame_idx):
+    return [cls_id for cls_id, spans in CLASS_VISIBLE.items() if any(a <= frame_idx < b for a, b in spans)]
+
+
+class _Tensor:
+    """模拟 torch 张量的 .cpu().numpy()"""
+
+    def __init__(self, array):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Tensor(data)
+
+
+class _Result:
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+def make_result(rows):
+    """由 [x1, y1, x2, y2, conf, cls] 行构造一帧的推理结果"""
+    return _Result(np.asarray(rows, dtype=np.float32).reshape(-1, 6))
+
+
+class StubModel:
+    """\
+    按合成视频的画面内容给出检测结果的替身模型：某类别区域为白色时输出该区域的框
+    （置信度见 CLASS_CONF，只保留高于 conf 的框），列为 xyxy, conf, cls，与 Ultralytics 检测结果一致。
+    fail_after 给出时第 fail_after+1 次推理调用抛出 RuntimeError，模拟进程中途退出。
+    """
+
+    names = {0: "Billboard", 1: "drinks"}
+
+    def __init__(self, fail_after=None):
+        self.overrides = {}
+        self.predictor = None
+        self.fail_after = fail_after
+        self.calls = 0
+        self.inferred_frames = 0
+
+    def predict(self, frames, conf=0.25, verbose=False):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("stub model stopped")
+        self.calls += 1
+        self.inferred_frames += len(frames)
+        results = []
+        for frame in frames:
+            rows = []
+            for cls_id, (x1, y1, x2, y2) in CLASS_REGIONS.items():
+                if frame[y1:y2, x1:x2].mean() > 128 and CLASS_CONF[cls_id] > conf:
+                    rows.append([x1, y1, x2, y2, CLASS_CONF[cls_id], cls_id])
+            results.append(make_result(rows))
+        return results
+
+
+@pytest.fixture(scope="session")
+def synthetic_video(tmp_path_factory):
+    """按 CLASS_VISIBLE 画出白块、顶部色带标记帧序号的合成视频"""
+    path = str(tmp_path_factory.mktemp("video") / "synthetic.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), VIDEO_FPS, VIDEO_SIZE)
+    for frame_idx in range(VIDEO_FRAMES):
+        frame = np.zeros((VIDEO_SIZE[1], VIDEO_SIZE[0], 3), dtype=np.uint8)
+        for i in range(VIDEO_SIZE[0] // INDEX_BIT_WIDTH):
+            if frame_idx >> i & 1:
+                frame[:INDEX_BAND_HEIGHT, i * INDEX_BIT_WIDTH:(i + 1) * INDEX_BIT_WIDTH] = 255
+        for cls_id in visible_classes(frame_idx):
+            x1, y1, x2, y2 = CLASS_REGIONS[cls_id]
+            frame[y1:y2, x1:x2] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def stub_weights(tmp_path):
+    """检测缓存按权重文件内容计算键，替身模型用一个内容固定的文件代替"""
+    path = tmp_path / "stub.pt"
+    path.write_bytes(b"stub model")
+    return str(path)
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import VIDEO_FPS, VIDEO_FRAMES, StubModel
+from cut import detect_and_save_segments
+from detection_log import load_detection_log
+
+RUN_KWARGS = dict(
+    target_classes=["Billboard"],
+    batch_size=4,
+    min_segment_duration=0.2,
+    visualize="none",
+    detection_log="jsonl",
+    timing_report=False,
+    return_details=True,
+)
+
+
+def _run(video, output_folder, model, **kwargs):
+    return detect_and_save_segments(video, str(output_folder), model=model, **dict(RUN_KWARGS, **kwargs))
+
+
+def _segment_times(segments):
+    return [(s["original_start"], s["original_end"], s["expanded_start"], s["expanded_end"]) for s in segments]
+
+
+def _assert_same_log(path_a, path_b):
+    meta_a, columns_a = load_detection_log(str(path_a))
+    meta_b, columns_b = load_detection_log(str(path_b))
+    assert meta_a["processed_frames"] == meta_b["processed_frames"] == VIDEO_FRAMES
+    assert meta_a["complete"] and meta_b["complete"]
+    for name in columns_a:
+        np.testing.assert_array_equal(columns_a[name], columns_b[name], err_msg=name)
+
+
+def _cache_file(cache_dir):
+    names = [name for name in os.listdir(cache_dir) if ".partial." not in name]
+    assert len(names) == 1, names
+    return os.path.join(cache_dir, names[0])
+
+
+def test_resume_matches_uninterrupted_run(synthetic_video, stub_weights, tmp_path):
+    full_dir = tmp_path / "full"
+    expected = _run(synthetic_video, full_dir, StubModel(), weights=stub_weights, cache_dir=str(tmp_path / "cache_full"))
+
+    resumed_dir = tmp_path / "resumed"
+    resumed_cache = str(tmp_path / "cache_resumed")
+    # 每批之后都保存断点，第 10 次推理调用（第 37~40 帧）时模拟进程退出
+    with pytest.raises(RuntimeError, match="stub model stopped"):
+        _run(synthetic_video, resumed_dir, StubModel(fail_after=9), weights=stub_weights, cache_dir=resumed_cache,
+             checkpoint_interval_sec=0)
+    assert os.path.isfile(resumed_dir / "Billboard_checkpoint" / "state.json")
+    assert not os.path.exists(resumed_dir / "Billboard_detections.jsonl")
+
+    model = StubModel()
+    result = _run(synthetic_video, resumed_dir, model, weights=stub_weights, cache_dir=resumed_cache,
+                  checkpoint_interval_sec=0, resume=True)
+    # 续跑只推理断点之后的帧
+    assert model.inferred_frames == VIDEO_FRAMES - 36
+
+    total, segments, duration, details = result
+    assert total == pytest.approx(expected[0])
+    assert duration == pytest.approx(VIDEO_FRAMES / VIDEO_FPS)
+    assert _segment_times(segments) == _segment_times(expected[1])
+    assert details["classes"] == expected[3]["classes"]
+    assert details["processed_frames"] == expected[3]["processed_frames"] == VIDEO_FRAMES
+
+    _assert_same_log(full_dir / "Billboard_detections.jsonl", resumed_dir / "Billboard_detections.jsonl")
+    _assert_same_log(_cache_file(tmp_path / "cache_full"), _cache_file(resumed_cache))
+    assert not os.path.exists(resumed_dir / "Billboard_checkpoint")
+
+
+def test_resume_without_checkpoint_starts_over(synthetic_video, tmp_path):
+    expected = _run(synthetic_video, tmp_path / "full", StubModel())
+    result = _run(synthetic_video, tmp_path / "resumed", StubModel(), resume=True)
+    assert _segment_times(result[1]) == _segment_times(expected[1])
+    _assert_same_log(tmp_path / "full" / "Billboard_detections.jsonl",
+                     tmp_path / "resumed" / "Billboard_detections.jsonl")
+
+
+def test_resume_rejects_changed_parameters(synthetic_video, tmp_path):
+    with pytest.raises(RuntimeError):
+        _run(synthetic_video, tmp_path, StubModel(fail_after=3), checkpoint_interval_sec=0)
+    with pytest.raises(ValueError, match="检测参数"):
+        _run(synthetic_video, tmp_path, StubModel(), checkpoint_interval_sec=0, resume=True, min_segment_duration=1.0)
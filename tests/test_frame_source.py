@@ -0,0 +1,31 @@
+import time
+
+import pytest
+
+import cut
+from conftest import VIDEO_FRAMES, StubModel, frame_index_of
+
+
+def _rendered_frame_indices(video, output_folder, monkeypatch, **kwargs):
+    """记录绘制线程实际拿到的帧；绘制放慢，让绘制队列保持满载"""
+    seen = []
+    draw_frame = cut._draw_frame
+
+    def slow_draw_frame(frame, *args, **kw):
+        seen.append(frame_index_of(frame))
+        time.sleep(0.005)
+        return draw_frame(frame, *args, **kw)
+
+    monkeypatch.setattr(cut, "_draw_frame", slow_draw_frame)
+    cut.detect_and_save_segments(video, str(output_folder), ["Billboard"], model=StubModel(), pipeline=True,
+                                 detection_log=None, timing_report=False, **kwargs)
+    return seen
+
+
+@pytest.mark.parametrize("visualize, step", [("full", 1), ("preview", 5), ("preview", 7)])
+@pytest.mark.parametrize("queue_size", [1, 2, 4])
+def test_ffmpeg_buffers_are_not_reused_before_render(synthetic_video, tmp_path, monkeypatch, visualize, step,
+                                                     queue_size):
+    seen = _rendered_frame_indices(synthetic_video, tmp_path, monkeypatch, frame_source="ffmpeg",
+                                   visualize=visualize, preview_frame_step=step, queue_size=queue_size)
+    assert seen == list(range(0, VIDEO_FRAMES, step))
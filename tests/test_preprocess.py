@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from conftest import make_result
+from cut import _filter_target_boxes
+from preprocess import LetterboxPreprocessor, parse_roi
+
+
+def _frame(width=640, height=360, rect=None, seed=0):
+    frame = np.random.default_rng(seed).integers(0, 100, (height, width, 3), dtype=np.uint8)
+    if rect is not None:
+        x1, y1, x2, y2 = rect
+        frame[y1:y2, x1:x2] = 255
+    return frame
+
+
+def _white_box(image):
+    ys, xs = np.nonzero(image.min(axis=2) > 200)
+    return np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], dtype=np.float32)
+
+
+def test_parse_roi():
+    assert parse_roi(None) is None
+    assert parse_roi("10,20,300,200") == (10, 20, 300, 200)
+    assert parse_roi("10 20 300 200") == (10, 20, 300, 200)
+    assert parse_roi([10.4, 19.6, 300, 200]) == (10, 20, 300, 200)
+    with pytest.raises(ValueError):
+        parse_roi("10,20,300")
+    with pytest.raises(ValueError):
+        parse_roi((300, 20, 10, 200))
+
+
+@pytest.mark.parametrize("size", [(640, 360), (360, 640), (500, 500), (1280, 720)])
+def test_matches_ultralytics_letterbox(size):
+    from ultralytics.data.augment import LetterBox
+
+    frame = _frame(*size)
+    prepared = LetterboxPreprocessor(320).prepare([frame])[0]
+    expected = LetterBox(320, auto=True, stride=32)(image=frame)
+    assert prepared.shape == expected.shape
+    np.testing.assert_array_equal(prepared, expected)
+
+
+def test_buffers_are_reused_and_padding_kept():
+    preprocessor = LetterboxPreprocessor(320)
+    first = preprocessor.prepare([_frame(seed=1), _frame(seed=2)])
+    second = preprocessor.prepare([_frame(seed=3)])
+    assert second[0] is first[0]
+    left, top = preprocessor.offset
+    assert top > 0 and (second[0][:top] == 114).all()
+    # 换一种画面尺寸时重新分配
+    third = preprocessor.prepare([_frame(320, 320)])
+    assert third[0] is not first[0]
+
+
+@pytest.mark.parametrize("roi", [None, (100, 50, 500, 330), (300, 0, 640, 360), (400, 100, 700, 400)])
+def test_map_boxes_returns_original_coordinates(roi):
+    rect = (420, 150, 480, 260)
+    preprocessor = LetterboxPreprocessor(320, roi)
+    prepared = preprocessor.prepare([_frame(rect=rect)])[0]
+    mapped = preprocessor.map_boxes(_white_box(prepared))
+    # 缩放引入的误差不超过一个输入像素对应的原图像素
+    np.testing.assert_allclose(mapped[0], rect, atol=1 / preprocessor.ratio + 1)
+
+
+def test_roi_crop_and_clipping():
+    preprocessor = LetterboxPreprocessor(320, (400, 100, 700, 400))
+    preprocessor.prepare([_frame()])
+    # ROI 超出画面的部分被裁掉
+    assert preprocessor.crop == (400, 100, 640, 360)
+    left, top = preprocessor.offset
+    new_w, new_h = preprocessor.resized_size
+    # 整个缩放区域映射回裁剪区域；落在填充区的坐标被裁剪到 ROI 边界
+    detections = np.array([[left, top, left + new_w, top + new_h, 0.9, 0],
+                           [0, 0, 1000, 1000, 0.8, 1]], dtype=np.float32)
+    mapped = preprocessor.map_boxes(detections)
+    # 缩放后的尺寸取整，映射回去有不到半个原图像素的误差
+    np.testing.assert_allclose(mapped[:, :4], [[400, 100, 640, 360]] * 2, atol=0.5)
+    # 置信度与类别列保持不变
+    np.testing.assert_array_equal(mapped[:, 4:], detections[:, 4:])
+    assert preprocessor.map_boxes(np.empty((0, 6), dtype=np.float32)).shape == (0, 6)
+
+
+def test_roi_outside_frame_is_rejected():
+    with pytest.raises(ValueError, match="ROI"):
+        LetterboxPreprocessor(320, (700, 0, 800, 100)).prepare([_frame()])
+
+
+def test_filter_target_boxes_maps_with_preprocessor():
+    rect = (150, 120, 250, 200)
+    preprocessor = LetterboxPreprocessor(320, (100, 50, 500, 330))
+    prepared = preprocessor.prepare([_frame(rect=rect)])[0]
+    x1, y1, x2, y2 = _white_box(prepared)[0]
+    has_target, area, boxes = _filter_target_boxes(make_result([[x1, y1, x2, y2, 0.9, 0]]), [0], preprocessor)
+    assert has_target
+    bx1, by1, bx2, by2, cls_id, track_id, conf = boxes[0]
+    assert (cls_id, track_id) == (0, -1) and conf == pytest.approx(0.9)
+    np.testing.assert_allclose([bx1, by1, bx2, by2], rect, atol=1 / preprocessor.ratio + 1)
+    assert area == (bx2 - bx1) * (by2 - by1)
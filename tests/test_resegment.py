@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from conftest import StubModel
+from cut import (ExposureStats, SegmentTracker, _segments_from_runs, detect_and_save_segments,
+                 get_detection_cache_key, resegment_from_cache)
+
+FPS = 25.0
+
+
+def _runs(presence):
+    runs = []
+    for frame_idx, has_target in enumerate(presence):
+        if not has_target:
+            continue
+        if runs and runs[-1][1] == frame_idx:
+            runs[-1][1] = frame_idx + 1
+        else:
+            runs.append([frame_idx, frame_idx + 1])
+    return [tuple(run) for run in runs]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("min_segment_duration, max_gap_sec", [(0.0, 0.0), (0.2, 0.0), (0.1, 0.15), (0.5, 0.4)])
+def test_segments_from_runs_matches_frame_replay(seed, min_segment_duration, max_gap_sec):
+    rng = random.Random(seed)
+    presence = []
+    while len(presence) < 200:
+        presence.extend([rng.random() < 0.5] * rng.randint(1, 12))
+    presence = presence[:200]
+
+    stats = ExposureStats(len(presence) / FPS)
+    tracker = SegmentTracker(min_segment_duration, max_gap_sec, stats)
+    for frame_idx, has_target in enumerate(presence):
+        tracker.update(has_target, frame_idx / FPS)
+    expected = tracker.finish((len(presence) - 1) / FPS)
+
+    run_stats = ExposureStats(len(presence) / FPS)
+    segments = _segments_from_runs(_runs(presence), FPS, len(presence) - 1, min_segment_duration, max_gap_sec,
+                                   run_stats)
+    assert segments == expected
+    assert run_stats.total_duration == pytest.approx(stats.total_duration)
+    assert run_stats.segment_count == stats.segment_count
+
+
+RUN_KWARGS = dict(visualize="none", detection_log=None, timing_report=False, return_details=True)
+
+
+def _summary(result):
+    total, segments, duration, details = result
+    return (
+        pytest.approx(total),
+        [(s["original_start"], s["original_end"], s["expanded_start"], s["expanded_end"]) for s in segments],
+        duration,
+        details["classes"],
+    )
+
+
+@pytest.fixture
+def cache_dir(synthetic_video, stub_weights, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    detect_and_save_segments(synthetic_video, str(tmp_path / "cached"), ["Billboard"], model=StubModel(),
+                             weights=stub_weights, cache_dir=cache_dir, **RUN_KWARGS)
+    return cache_dir
+
+
+@pytest.mark.parametrize("target_classes, params", [
+    (["Billboard"], dict()),
+    (["drinks"], dict(min_segment_duration=0.1, max_gap_sec=0.2)),
+    (["Billboard", "drinks"], dict(pre_buffer_sec=0.5, post_buffer_sec=0.5, merge_gap_sec=None)),
+    (["drinks"], dict(conf_threshold=0.6)),
+])
+def test_resegment_matches_direct_run(synthetic_video, stub_weights, cache_dir, tmp_path, target_classes, params):
+    expected = detect_and_save_segments(synthetic_video, str(tmp_path / "direct"), target_classes, model=StubModel(),
+                                        **params, **RUN_KWARGS)
+    result = resegment_from_cache(synthetic_video, str(tmp_path / "resegmented"), target_classes,
+                                  cache_dir=cache_dir, weights=stub_weights, return_details=True, **params)
+    assert _summary(result) == _summary(expected)
+
+
+def test_cache_key_includes_backend(synthetic_video, stub_weights, tmp_path):
+    onnx_path = tmp_path / "stub.onnx"
+    onnx_path.write_bytes(b"exported stub")
+    pytorch_key = get_detection_cache_key(synthetic_video, stub_weights)
+    onnx_key = get_detection_cache_key(synthetic_video, stub_weights, backend="onnx")
+    assert pytorch_key != onnx_key and onnx_key.endswith("_onnx")
+    # 导出文件变化时键随之变化
+    onnx_path.write_bytes(b"re-exported stub")
+    assert get_detection_cache_key(synthetic_video, stub_weights, backend="onnx") != onnx_key
+
+
+def test_resegment_rejects_other_backend_and_low_threshold(synthetic_video, stub_weights, cache_dir, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        resegment_from_cache(synthetic_video, str(tmp_path / "out"), ["Billboard"], cache_dir=cache_dir,
+                             weights=stub_weights, backend="onnx")
+    with pytest.raises(ValueError, match="置信度下限"):
+        resegment_from_cache(synthetic_video, str(tmp_path / "out"), ["Billboard"], cache_dir=cache_dir,
+                             weights=stub_weights, conf_threshold=0.01)
+
+
+def test_cache_requires_weights_with_model(synthetic_video, tmp_path):
+    with pytest.raises(ValueError, match="weights"):
+        detect_and_save_segments(synthetic_video, str(tmp_path), ["Billboard"], model=StubModel(),
+                                 cache_dir=str(tmp_path / "cache"), **RUN_KWARGS)
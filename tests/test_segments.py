@@ -0,0 +1,103 @@
+import pytest
+
+from conftest import CLASS_VISIBLE, VIDEO_FPS, StubModel
+from cut import ExposureStats, SegmentTracker, detect_and_save_segments, merge_expanded_segments
+
+FPS = 10.0
+
+
+def _replay(presence, min_segment_duration=0.0, max_gap_sec=0.0):
+    """presence: 逐帧是否有目标（帧率 FPS），返回 (片段, 统计)"""
+    stats = ExposureStats(len(presence) / FPS)
+    tracker = SegmentTracker(min_segment_duration, max_gap_sec, stats)
+    current_time_sec = 0.0
+    for frame_idx, has_target in enumerate(presence):
+        current_time_sec = frame_idx / FPS
+        tracker.update(has_target, current_time_sec)
+    return tracker.finish(current_time_sec), stats
+
+
+def _presence(spans, num_frames):
+    return [any(a <= i < b for a, b in spans) for i in range(num_frames)]
+
+
+def _rounded(segments):
+    return [(round(start, 6), round(end, 6)) for start, end in segments]
+
+
+def test_without_gap_every_dropout_ends_the_segment():
+    segments, stats = _replay(_presence([(2, 5), (6, 9)], 12))
+    assert _rounded(segments) == [(0.2, 0.5), (0.6, 0.9)]
+    assert stats.segment_count == 2
+    assert stats.total_duration == pytest.approx(0.6)
+
+
+def test_short_gap_is_bridged():
+    # 中断 0.1 秒 < max_gap_sec，两段合为一段，结束于最后一次出现之后的第一帧
+    segments, _ = _replay(_presence([(2, 5), (6, 9)], 12), max_gap_sec=0.25)
+    assert _rounded(segments) == [(0.2, 0.9)]
+
+
+def test_long_gap_splits_at_gap_start():
+    segments, _ = _replay(_presence([(2, 5), (9, 12)], 15), max_gap_sec=0.25)
+    assert _rounded(segments) == [(0.2, 0.5), (0.9, 1.2)]
+
+
+def test_min_duration_applies_after_bridging():
+    # 两段各 0.2 秒都短于 min_segment_duration，桥接后 0.5 秒得以保留
+    presence = _presence([(2, 4), (5, 7)], 10)
+    assert _replay(presence, min_segment_duration=0.3)[0] == []
+    assert _rounded(_replay(presence, min_segment_duration=0.3, max_gap_sec=0.15)[0]) == [(0.2, 0.7)]
+
+
+def test_open_gap_at_end_closes_at_gap_start():
+    segments, _ = _replay(_presence([(2, 6)], 8), max_gap_sec=1.0)
+    assert _rounded(segments) == [(0.2, 0.6)]
+
+
+def test_segment_open_at_end_closes_at_last_frame():
+    segments, _ = _replay(_presence([(5, 10)], 10))
+    assert _rounded(segments) == [(0.5, 0.9)]
+
+
+def _seg(start, end):
+    return {"expanded_start": start, "expanded_end": end}
+
+
+def test_merge_overlapping_and_touching():
+    clips = merge_expanded_segments([_seg(0, 5), _seg(4, 8), _seg(8, 10), _seg(12, 14)])
+    assert [(c["expanded_start"], c["expanded_end"], len(c["members"])) for c in clips] == [(0, 10, 3), (12, 14, 1)]
+
+
+def test_merge_gap_bridges_nearby_clips():
+    segments = [_seg(0, 5), _seg(6, 8), _seg(10, 11)]
+    assert len(merge_expanded_segments(segments, merge_gap_sec=1.0)) == 2
+    assert len(merge_expanded_segments(segments, merge_gap_sec=2.0)) == 1
+
+
+def test_merge_disabled_keeps_every_segment():
+    clips = merge_expanded_segments([_seg(0, 5), _seg(1, 6)], merge_gap_sec=None)
+    assert [(c["expanded_start"], c["expanded_end"]) for c in clips] == [(0, 5), (1, 6)]
+
+
+def test_merge_sorts_by_start_and_keeps_members():
+    first, contained, last = _seg(0, 10), _seg(2, 4), _seg(20, 25)
+    clips = merge_expanded_segments([last, contained, first])
+    assert clips[0]["members"] == [first, contained]
+    # 被完全包含的片段不会缩短合并后的结束时间
+    assert clips[0]["expanded_end"] == 10
+    assert clips[1]["members"] == [last]
+
+
+def test_overlapping_exports_share_one_file(synthetic_video, tmp_path):
+    total, segments, _ = detect_and_save_segments(
+        synthetic_video, str(tmp_path), ["Billboard"], model=StubModel(), visualize="none", detection_log=None,
+        timing_report=False, min_segment_duration=0.05, pre_buffer_sec=0.2, post_buffer_sec=0.2)
+    spans = CLASS_VISIBLE[0]
+    assert [(s["original_start"], s["original_end"]) for s in segments] == [
+        pytest.approx((a / VIDEO_FPS, b / VIDEO_FPS)) for a, b in spans]
+    assert total == pytest.approx(sum(b - a for a, b in spans) / VIDEO_FPS)
+    # 前两段扩展后重叠，导出为同一个文件；第三段单独导出
+    assert segments[0]["path"] == segments[1]["path"] != segments[2]["path"]
+    assert segments[0]["expanded_start"] == segments[1]["expanded_start"] == pytest.approx(10 / VIDEO_FPS - 0.2)
+    assert segments[0]["expanded_end"] == segments[1]["expanded_end"] == pytest.approx(45 / VIDEO_FPS + 0.2)
@@ -0,0 +1,101 @@
+import pytest
+
+from conftest import make_result
+from cut import _detect_batch
+
+BOX = {0: [10, 10, 50, 40], 1: [60, 10, 90, 40]}
+
+
+class LabelModel:
+    """帧就是该帧出现的类别元组，记录每次推理调用送入的帧"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, frames, conf=0.25, verbose=False):
+        self.calls.append(list(frames))
+        return [make_result([BOX[cls_id] + [0.9, cls_id] for cls_id in frame]) for frame in frames]
+
+
+def _frames(spans, num_frames):
+    """spans: {类别: [(开始, 结束)]} -> 每帧出现的类别元组"""
+    return [tuple(cls_id for cls_id, ranges in sorted(spans.items()) if any(a <= i < b for a, b in ranges))
+            for i in range(num_frames)]
+
+
+def _run(frames, detect_every_n, last_det=(False, 0, [])):
+    model = LabelModel()
+    frame_dets, last_det, num_inferred = _detect_batch(model, frames, 0.25, [0, 1], detect_every_n, last_det)
+    return model, frame_dets, last_det, num_inferred
+
+
+def _present(frame_dets):
+    return [tuple(sorted({box[4] for box in det[2]})) for det in frame_dets]
+
+
+def test_unchanged_interval_reuses_sample_result():
+    frames = _frames({0: [(0, 12)]}, 12)
+    _, _, previous, _ = _run(frames[:1], 1)
+    model, frame_dets, last_det, num_inferred = _run(frames, 4, previous)
+    # 与上一批结果相同时只推理采样帧（第 4、8、12 帧），且合并为一次调用
+    assert model.calls == [[frames[3], frames[7], frames[11]]]
+    assert num_inferred == 3
+    assert _present(frame_dets) == [(0,)] * 12
+    assert last_det is frame_dets[-1]
+
+
+def test_first_interval_is_refined_when_state_differs():
+    frames = _frames({0: [(0, 12)]}, 12)
+    model, frame_dets, _, num_inferred = _run(frames, 4)
+    # 初始状态为无目标，第一个采样帧翻转，区间内前 3 帧补推理
+    assert model.calls[1] == frames[:3]
+    assert num_inferred == 6
+    assert _present(frame_dets) == [(0,)] * 12
+
+
+def test_transition_is_refined_to_the_frame():
+    frames = _frames({0: [(5, 14)]}, 16)
+    model, frame_dets, _, num_inferred = _run(frames, 4)
+    assert _present(frame_dets) == list(frames)
+    # 4 个采样帧 + 两个发生翻转的区间内各 3 帧补推理
+    assert num_inferred == 4 + 6
+    assert len(model.calls) == 2
+
+
+def test_class_switch_without_gap_is_refined():
+    # 始终有目标，但类别从 0 换成 1，各类别的边界也要精确到帧
+    frames = _frames({0: [(0, 6)], 1: [(6, 12)]}, 12)
+    _, frame_dets, _, _ = _run(frames, 4)
+    assert _present(frame_dets) == list(frames)
+
+
+def test_trailing_partial_step_is_sampled():
+    frames = _frames({0: [(8, 10)]}, 10)
+    model, frame_dets, _, _ = _run(frames, 4)
+    assert model.calls[0] == [frames[3], frames[7], frames[9]]
+    assert _present(frame_dets) == list(frames)
+
+
+def test_blip_between_equal_samples_is_within_documented_error():
+    # 完全落在两个采样帧之间、短于 N 帧的出现会被漏检（文档中的误差范围）
+    frames = _frames({0: [(1, 3)]}, 8)
+    _, frame_dets, _, num_inferred = _run(frames, 4)
+    assert _present(frame_dets) == [()] * 8
+    assert num_inferred == 2
+
+
+def test_last_det_carries_over_between_batches():
+    frames = _frames({0: [(0, 8)]}, 8)
+    _, _, last_det, _ = _run(frames[:4], 4)
+    # 下一批开头与上一批最后的采样结果相同，不补推理
+    model, frame_dets, _, num_inferred = _run(frames[4:], 4, last_det)
+    assert num_inferred == 1
+    assert _present(frame_dets) == [(0,)] * 4
+
+
+@pytest.mark.parametrize("detect_every_n", [1, 2, 3, 5])
+def test_matches_dense_detection(detect_every_n):
+    frames = _frames({0: [(3, 9), (15, 27)], 1: [(7, 20)]}, 30)
+    _, dense, _, _ = _run(frames, 1)
+    _, sparse, _, _ = _run(frames, detect_every_n)
+    assert [det[:2] for det in sparse] == [det[:2] for det in dense]